@@ -201,6 +201,15 @@ class PTICSHDCSLU(SLUInterface):
                     utt2da[unicode(key)] = val
         return utt2da
 
+    def get_parse_key(self, utterance):
+        """
+        Returns a key identifying the parse of the utterance. The utterances from utt2da are parsed
+        before the normalisation, so their key is the original utterance.
+        """
+        if unicode(utterance) in self.utt2da:
+            return 'utt2da', unicode(utterance)
+        return super(PTICSHDCSLU, self).get_parse_key(utterance)
+
     def abstract_utterance(self, utterance):
         """
         Return a list of possible abstractions of the utterance.
@@ -211,34 +220,17 @@ class PTICSHDCSLU(SLUInterface):
         abs_utts = copy.deepcopy(utterance)
         category_labels = set()
         abs_utt_lengths = [1] * len(abs_utts)
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                # print start, end
-                # print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utts = abs_utts.replace(f, (c.upper() + '='+v,))
-                            abs_utt_lengths[start] = len(f)
-                            category_labels.add(c.upper())
-                            break
-                        else:
-                            continue
-
-                        break
-
-                    # print f
-
-                    # skip all substring for this form
-                    start = end
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    abs_utts = abs_utts.replace(f, (c.upper() + '='+v,))
+                    abs_utt_lengths[start] = len(f)
+                    category_labels.add(c.upper())
                     break
-                end -= 1
-            else:
-                start += 1
+                else:
+                    continue
+
+                break
         # normalize abstract utterance lengths
         norm_abs_utt_lengths = []
         i = 0
@@ -16,16 +16,15 @@ The training procedure is as follows:
 if __name__ == '__main__':
     import autopath
 
+import argparse
 import os
-import xml.dom.minidom
-import glob
 import codecs
 import random
 
 
 import alex.corpustools.lm as lm
-import alex.utils.various as various
 
+from alex.corpustools.calllogindex import load_call_logs
 from alex.corpustools.text_norm_cs import normalise_text, exclude_lm
 from alex.corpustools.wavaskey import save_wavaskey
 
@@ -63,6 +62,13 @@ def exit_on_system_fail(cmd, msg=None):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    parser.add_argument('--index', help='the index of the call logs, by default it is stored in ~/.alex_call_log_index')
+
+    args = parser.parse_args()
 
     # Test if SRILM is available.
     require_srilm()
@@ -144,44 +150,28 @@ if __name__ == '__main__':
         print "-"*120
         ###############################################################################################
 
-        files = []
-        files.append(glob.glob(os.path.join(indomain_data_dir, 'asr_transcribed.xml')))
-        files.append(glob.glob(os.path.join(indomain_data_dir, '*', 'asr_transcribed.xml')))
-        files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', 'asr_transcribed.xml')))
-        files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', 'asr_transcribed.xml')))
-        files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', 'asr_transcribed.xml')))
-        files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', '*', 'asr_transcribed.xml')))
-        files = various.flatten(files)
+        call_logs = load_call_logs(indomain_data_dir, 'asr_transcribed.xml', args.index)
 
         tt = []
         pt = []
-        for fn in files:
-#            print "Processing:", fn
-            doc = xml.dom.minidom.parse(fn)
-            turns = doc.getElementsByTagName("turn")
-            
-            for turn in turns:
-                recs_list = turn.getElementsByTagName("rec")
-                trans_list = turn.getElementsByTagName("asr_transcription")
-
-                if trans_list:
-                    trans = trans_list[-1]
+        for fn, turn in call_logs.turns(indomain_data_dir):
+            if turn.transcriptions:
+                t = normalise_text(turn.transcriptions[-1])
 
-                    t = various.get_text_from_xml_node(trans)
-                    t = normalise_text(t)
+                if exclude_lm(t):
+                    continue
 
-                    if exclude_lm(t):
-                        continue
+                # The silence does not have a label in the language model.
+                t = t.replace('_SIL_', '')
 
-                    # The silence does not have a label in the language model.
-                    t = t.replace('_SIL_', '')
+                tt.append(t)
 
-                    tt.append(t)
+                wav_file = turn.recs[0]
+                wav_path = os.path.realpath(os.path.join(os.path.dirname(fn), wav_file))
 
-                    wav_file = recs_list[0].getAttribute('fname')
-                    wav_path = os.path.realpath(os.path.join(os.path.dirname(fn), wav_file))
+                pt.append((wav_path, t))
 
-                    pt.append((wav_path, t))
+        call_logs.close()
 
         random.seed(10)
         sf = [(a, b) for a, b in zip(tt, pt)]
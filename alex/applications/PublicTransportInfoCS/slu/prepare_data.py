@@ -6,16 +6,13 @@ if __name__ == '__main__':
     import autopath
 
 import argparse
-import glob
 import os
-import xml.dom.minidom
 import random
 import sys
 import multiprocessing
 
-import alex.utils.various as various
-
 from alex.utils.config import as_project_path
+from alex.corpustools.calllogindex import CallLogIndex, load_call_logs
 from alex.corpustools.text_norm_cs import normalise_text, exclude_slu
 from alex.corpustools.wavaskey import save_wavaskey
 from alex.components.asr.common import asr_factory
@@ -33,6 +30,10 @@ from alex.utils.config import Config
 
 asr_log = 0
 num_workers = 1
+index_fname = None
+
+# the index of the call logs opened by each worker
+call_log_index = None
 
 
 
@@ -53,7 +54,13 @@ def normalise_semi_words(txt):
 
     return txt
 
+def init_worker(index_fname):
+    global call_log_index
+
+    call_log_index = CallLogIndex(index_fname)
+
 def process_call_log(fn):
+    turns = call_log_index.call_log_turns(fn)
     name = multiprocessing.current_process().name
     asr = []
     nbl = []
@@ -68,22 +75,20 @@ def process_call_log(fn):
     print "File #", fcount
     fcount += 1
     print "Processing:", fn
-    doc = xml.dom.minidom.parse(fn)
-    turns = doc.getElementsByTagName("turn")
     for i, turn in enumerate(turns):
-        if turn.getAttribute('speaker') != 'user':
+        if turn.speaker != 'user':
             continue
 
-        recs = turn.getElementsByTagName("rec")
-        trans = turn.getElementsByTagName("asr_transcription")
-        asrs = turn.getElementsByTagName("asr")
+        recs = turn.recs
+        trans = turn.transcriptions
+        asrs = turn.asrs
 
         if len(recs) != 1:
             print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=i, fn=fn, recs=len(recs))
             continue
 
         if len(asrs) == 0 and (i + 1) < len(turns):
-            next_asrs = turns[i + 1].getElementsByTagName("asr")
+            next_asrs = turns[i + 1].asrs
             if len(next_asrs) != 2:
                 print "Skipping a turn {turn} in file: {fn} - asrs: {asrs} - next_asrs: {next_asrs}".format(turn=i,
                                                                                                             fn=fn,
@@ -94,13 +99,13 @@ def process_call_log(fn):
                 continue
             print "Recovered from missing ASR output by using a delayed ASR output from the following turn of turn {turn}. File: {fn} - next_asrs: {asrs}".format(
                 turn=i, fn=fn, asrs=len(next_asrs))
-            hyps = next_asrs[0].getElementsByTagName("hypothesis")
+            hyps = next_asrs[0]
         elif len(asrs) == 1:
-            hyps = asrs[0].getElementsByTagName("hypothesis")
+            hyps = asrs[0]
         elif len(asrs) == 2:
             print "Recovered from EXTRA ASR outputs by using a the last ASR output from the turn. File: {fn} - asrs: {asrs}".format(
                 fn=fn, asrs=len(asrs))
-            hyps = asrs[-1].getElementsByTagName("hypothesis")
+            hyps = asrs[-1]
         else:
             print "Skipping a turn {turn} in file {fn} - asrs: {asrs}".format(turn=i, fn=fn, asrs=len(asrs))
             continue
@@ -109,19 +114,17 @@ def process_call_log(fn):
             print "Skipping a turn in {fn} - trans: {trans}".format(fn=fn, trans=len(trans))
             continue
 
-        wav_key = recs[0].getAttribute('fname')
+        wav_key = recs[0]
         wav_path = os.path.join(f_dir, wav_key)
 
         # FIXME: Check whether the last transcription is really the best! FJ
-        t = various.get_text_from_xml_node(trans[-1])
-        t = normalise_text(t)
+        t = normalise_text(trans[-1])
 
         if '--asr-log' not in sys.argv:
             asr_rec_nbl = asr_rec.rec_wav_file(wav_path)
             a = unicode(asr_rec_nbl.get_best())
         else:
-            a = various.get_text_from_xml_node(hyps[0])
-            a = normalise_semi_words(a)
+            a = normalise_semi_words(hyps[0][1])
 
         if exclude_slu(t) or 'DOM Element:' in a:
             print "Skipping transcription:", unicode(t)
@@ -154,11 +157,10 @@ def process_call_log(fn):
 
             print 'ASR RECOGNITION NBLIST\n', unicode(n)
         else:
-            for h in hyps:
-                txt = various.get_text_from_xml_node(h)
+            for p, txt in hyps:
                 txt = normalise_semi_words(txt)
 
-                n.add(abs(float(h.getAttribute('p'))), Utterance(txt))
+                n.add(abs(p), Utterance(txt))
 
         n.merge()
         n.normalise()
@@ -174,6 +176,7 @@ def main():
 
     global asr_log
     global num_workers
+    global index_fname
 
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -184,11 +187,14 @@ def main():
                         help='number of workers used for ASR: default %d' % num_workers)
     parser.add_argument('--asr_log', action="store", default=asr_log, type=int,
                         help='use ASR results from logs: default %d' % asr_log)
+    parser.add_argument('--index', action="store", default=index_fname,
+                        help='the index of the call logs: default in ~/.alex_call_log_index')
 
     args = parser.parse_args()
 
     asr_log = args.asr_log
     num_workers = args.num_workers
+    index_fname = args.index
 
     fn_uniq_trn = 'uniq.trn'
     fn_uniq_trn_hdc_sem = 'uniq.trn.hdc.sem'
@@ -224,16 +230,11 @@ def main():
     print "-"*120
     ###############################################################################################
 
-    files = []
-    files.append(glob.glob(os.path.join(indomain_data_dir, 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', '*', 'asr_transcribed.xml')))
-    files = various.flatten(files)
+    # only the file names are passed to the workers, they read the turns from the index themselves
+    index = load_call_logs(indomain_data_dir, 'asr_transcribed.xml', index_fname, num_workers=num_workers)
+    files = index.file_names(indomain_data_dir)[:100000]
+    index.close()
 
-    files = files[:100000]
     asr = []
     nbl = []
     sem = []
@@ -241,7 +242,7 @@ def main():
     trn_hdc_sem = []
 
 
-    p_process_call_logs = multiprocessing.Pool(num_workers)
+    p_process_call_logs = multiprocessing.Pool(num_workers, init_worker, (index.index_fname, ))
     processed_cls = p_process_call_logs.imap_unordered(process_call_log, files)
 
     count = 0
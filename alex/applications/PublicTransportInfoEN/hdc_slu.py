@@ -235,6 +235,15 @@ class PTIENHDCSLU(SLUInterface):
                     utt2da[unicode(key)] = val
         return utt2da
 
+    def get_parse_key(self, utterance):
+        """
+        Returns a key identifying the parse of the utterance. The utterances from utt2da are parsed
+        before the normalisation, so their key is the original utterance.
+        """
+        if unicode(utterance) in self.utt2da:
+            return 'utt2da', unicode(utterance)
+        return super(PTIENHDCSLU, self).get_parse_key(utterance)
+
     def abstract_utterance(self, utterance):
         """
         Return a list of possible abstractions of the utterance.
@@ -245,45 +254,31 @@ class PTIENHDCSLU(SLUInterface):
         abs_utts = copy.deepcopy(utterance)
         category_labels = set()
         abs_utt_lengths = [1] * len(abs_utts)
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                if f in self.cldb.form2value2cl:
-                    entities = self.cldb.form2value2cl[f]
-                    slot_names = [(slot, name) for name in entities for slot in entities[name]]
-                    slots = [slot for slot, _ in slot_names]
-
-                    def replace_slot(abs_utts, slot, slot_names):
-                        name = [n for s, n in slot_names if s == slot].pop()
-                        return abs_utts.replace(f, (slot.upper() + '=' + name,))
-
-                    if 'borough' in slots:
-                        abs_utts = replace_slot(abs_utts, 'borough', slot_names)
-                        category_labels.add('BOROUGH')
-                    elif 'street' in slots:
-                        abs_utts = replace_slot(abs_utts, 'street', slot_names)
-                        category_labels.add('STREET')
-                    elif 'stop' in slots and 'city' in slots:
-                        abs_utts = replace_slot(abs_utts, 'stop', slot_names)
-                        category_labels.add('STOP')
-                    elif 'city' in slots and 'state' in slots:
-                        abs_utts = replace_slot(abs_utts, 'city', slot_names)
-                        category_labels.add('CITY')
-                    else:
-                        slot = slots.pop()
-                        abs_utts = replace_slot(abs_utts, slot, slot_names)
-                        category_labels.add(slot.upper())
-                    abs_utt_lengths[start] = len(f)
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
+        for start, end, f, entities in self.cldb.find_forms(utterance):
+            slot_names = [(slot, name) for name in entities for slot in entities[name]]
+            slots = [slot for slot, _ in slot_names]
+
+            def replace_slot(abs_utts, slot, slot_names):
+                name = [n for s, n in slot_names if s == slot].pop()
+                return abs_utts.replace(f, (slot.upper() + '=' + name,))
+
+            if 'borough' in slots:
+                abs_utts = replace_slot(abs_utts, 'borough', slot_names)
+                category_labels.add('BOROUGH')
+            elif 'street' in slots:
+                abs_utts = replace_slot(abs_utts, 'street', slot_names)
+                category_labels.add('STREET')
+            elif 'stop' in slots and 'city' in slots:
+                abs_utts = replace_slot(abs_utts, 'stop', slot_names)
+                category_labels.add('STOP')
+            elif 'city' in slots and 'state' in slots:
+                abs_utts = replace_slot(abs_utts, 'city', slot_names)
+                category_labels.add('CITY')
             else:
-                start += 1
+                slot = slots.pop()
+                abs_utts = replace_slot(abs_utts, slot, slot_names)
+                category_labels.add(slot.upper())
+            abs_utt_lengths[start] = len(f)
         # normalize abstract utterance lengths
         norm_abs_utt_lengths = []
         i = 0
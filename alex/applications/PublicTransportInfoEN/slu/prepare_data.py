@@ -3,13 +3,13 @@
 
 from __future__ import unicode_literals
 
-import glob
 import os
-import xml.dom.minidom
 import random
 import sys
 
-import alex.utils.various as various
+from itertools import islice
+
+from alex.corpustools.calllogindex import load_call_logs
 from alex.corpustools.text_norm_cs import normalise_text, exclude_slu
 from alex.corpustools.wavaskey import save_wavaskey
 from alex.components.asr.common import asr_factory
@@ -25,6 +25,7 @@ from alex.utils.config import Config
 --fast      it approximates SLU output on N-best lists by SLU output from 1-best
 --uniq      it generates only files with unique texts and their SLU HDC output
 --asr-log   it uses the asr hypotheses from call logs
+--index FILE  it stores the index of the call logs in FILE instead of ~/.alex_call_log_index
 """
 
 def normalise_semi_words(txt):
@@ -88,14 +89,8 @@ def main():
     print "-"*120
     ###############################################################################################
 
-    files = []
-    files.append(glob.glob(os.path.join(indomain_data_dir, 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', 'asr_transcribed.xml')))
-    files.append(glob.glob(os.path.join(indomain_data_dir, '*', '*', '*', '*', '*', 'asr_transcribed.xml')))
-    files = various.flatten(files)
+    index_fname = sys.argv[sys.argv.index('--index') + 1] if '--index' in sys.argv else None
+    call_log_index = load_call_logs(indomain_data_dir, 'asr_transcribed.xml', index_fname)
 
     sem = []
     trn = []
@@ -105,37 +100,35 @@ def main():
     nbl = []
     nbl_hdc_sem = []
 
-    for fn in files[:100000]:
+    for fn, turns in islice(call_log_index.call_logs(indomain_data_dir), 100000):
         f_dir = os.path.dirname(fn)
 
         print "Processing:", fn
-        doc = xml.dom.minidom.parse(fn)
-        turns = doc.getElementsByTagName("turn")
 
         for i, turn in enumerate(turns):
-            if turn.getAttribute('speaker') != 'user':
+            if turn.speaker != 'user':
                 continue
 
-            recs = turn.getElementsByTagName("rec")
-            trans = turn.getElementsByTagName("asr_transcription")
-            asrs = turn.getElementsByTagName("asr")
+            recs = turn.recs
+            trans = turn.transcriptions
+            asrs = turn.asrs
 
             if len(recs) != 1:
                 print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=i,fn=fn, recs=len(recs))
                 continue
 
             if len(asrs) == 0 and (i + 1) < len(turns):
-                next_asrs = turns[i+1].getElementsByTagName("asr")
+                next_asrs = turns[i+1].asrs
                 if len(next_asrs) != 2:
                     print "Skipping a turn {turn} in file: {fn} - asrs: {asrs} - next_asrs: {next_asrs}".format(turn=i, fn=fn, asrs=len(asrs), next_asrs=len(next_asrs))
                     continue
                 print "Recovered from missing ASR output by using a delayed ASR output from the following turn of turn {turn}. File: {fn} - next_asrs: {asrs}".format(turn=i, fn=fn, asrs=len(next_asrs))
-                hyps = next_asrs[0].getElementsByTagName("hypothesis")
+                hyps = next_asrs[0]
             elif len(asrs) == 1:
-                hyps = asrs[0].getElementsByTagName("hypothesis")
+                hyps = asrs[0]
             elif len(asrs) == 2:
                 print "Recovered from EXTRA ASR outputs by using a the last ASR output from the turn. File: {fn} - asrs: {asrs}".format(fn=fn, asrs=len(asrs))
-                hyps = asrs[-1].getElementsByTagName("hypothesis")
+                hyps = asrs[-1]
             else:
                 print "Skipping a turn {turn} in file {fn} - asrs: {asrs}".format(turn=i,fn=fn, asrs=len(asrs))
                 continue
@@ -144,20 +137,18 @@ def main():
                 print "Skipping a turn in {fn} - trans: {trans}".format(fn=fn, trans=len(trans))
                 continue
 
-            wav_key = recs[0].getAttribute('fname')
+            wav_key = recs[0]
             wav_path = os.path.join(f_dir, wav_key)
             
             # FIXME: Check whether the last transcription is really the best! FJ
-            t = various.get_text_from_xml_node(trans[-1])
-            t = normalise_text(t)
+            t = normalise_text(trans[-1])
 
             
             if '--asr-log' not in sys.argv:
                 asr_rec_nbl = asr_rec.rec_wav_file(wav_path)
                 a = unicode(asr_rec_nbl.get_best())
             else:  
-                a = various.get_text_from_xml_node(hyps[0])
-                a = normalise_semi_words(a)
+                a = normalise_semi_words(hyps[0][1])
 
             if exclude_slu(t) or 'DOM Element:' in a:
                 print "Skipping transcription:", unicode(t)
@@ -181,8 +172,7 @@ def main():
                 if '--asr-log' not in sys.argv:
                     a = unicode(asr_rec_nbl.get_best())
                 else:  
-                    a = various.get_text_from_xml_node(hyps[0])
-                    a = normalise_semi_words(a)
+                    a = normalise_semi_words(hyps[0][1])
 
                 asr.append((wav_key, a))
 
@@ -196,11 +186,10 @@ def main():
                    
                    print 'ASR RECOGNITION NBLIST\n',unicode(n)
                 else:
-                    for h in hyps:
-                        txt = various.get_text_from_xml_node(h)
+                    for p, txt in hyps:
                         txt = normalise_semi_words(txt)
 
-                        n.add(abs(float(h.getAttribute('p'))),Utterance(txt))
+                        n.add(abs(p),Utterance(txt))
 
                 n.merge()
                 n.normalise()
@@ -215,6 +204,8 @@ def main():
             sem.append((wav_key, None))
 
 
+    call_log_index.close()
+
     uniq_trn = {}
     uniq_trn_hdc_sem = {}
     uniq_trn_sem = {}
@@ -9,7 +9,7 @@ import os
 if __name__ == '__main__':
     import autopath
 
-from alex.applications.voicehub import VoiceHub
+from alex.applications.voicehub import VoiceHub, MultiSessionVoiceHub
 from alex.components.hub import Hub
 from alex.components.hub.vio import VoipIO
 from alex.components.hub.vad import VAD
@@ -61,6 +61,10 @@ if __name__ == '__main__':
 
     cfg['Logging']['system_logger'].info("Voip Hub\n" + "=" * 120)
 
-    vhub = VoipHub(cfg, args.ncalls)
+    if cfg['Hub']['sessions']:
+        # serve several concurrent calls with shared SLU, NLG and TTS
+        vhub = MultiSessionVoiceHub(VoipHub, cfg, args.ncalls)
+    else:
+        vhub = VoipHub(cfg, args.ncalls)
 
     vhub.run()
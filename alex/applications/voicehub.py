@@ -9,14 +9,22 @@ if __name__ == '__main__':
     pass
 
 from alex.components.hub import Hub
+from alex.components.hub.audiopipe import SharedMemoryPipe
 from alex.components.hub.vad import VAD
 from alex.components.hub.asr import ASR
 from alex.components.hub.slu import SLU
 from alex.components.hub.dm import DM
 from alex.components.hub.nlg import NLG
-from alex.components.hub.tts import TTS
+from alex.components.hub.tts import TTS, precompile_prompts
 from alex.components.hub.messages import Command, DMDA, ASRHyp, TTSText
 from alex.components.hub.calldb import CallDB
+from alex.components.hub.pool import ComponentPool
+from alex.components.slu.common import slu_factory
+from alex.components.nlg.common import nlg_factory, get_nlg_type
+from alex.components.tts.common import tts_factory, get_tts_type
+from alex.utils.config import Config
+from alex.utils.mproc import wait_for_input, SystemLogger
+from alex.utils.sessionlogger import SessionLogger
 
 
 class VoiceHub(Hub):
@@ -36,6 +44,9 @@ class VoiceHub(Hub):
         self.ncalls = ncalls
         self.close_event = multiprocessing.Event()
 
+        # the component processes started by the hub, see create_components()
+        self.processes = None
+
     def write_pid_file(self, pids):
         f = open(self.cfg[self.hubname]['pid_file'], "w+")
 
@@ -44,60 +55,93 @@ class VoiceHub(Hub):
             f.write("%s: %d\n" % (name, pid))
         f.close()
 
-    def run(self):
-        try:
-            cfg = self.cfg
+    def create_components(self, models=None):
+        """Creates the connections and the components of the hub.
+
+        :param models: a dictionary with the already loaded 'slu', 'nlg' and 'tts' shared with other sessions. If it is
+            given, the SLU, NLG and TTS components are not started by the hub, they must be run in a ComponentPool.
+        """
+        cfg = self.cfg
+        if models is None:
+            models = {}
+
+        if cfg['Hub']['audio_transport'] == 'shared_memory':
+            # the recorded audio is passed from VoipIO through VAD to ASR in shared memory
+            audio_pipe = lambda: SharedMemoryPipe(cfg['Hub']['audio_transport_buffer_size'])
+        else:
+            audio_pipe = multiprocessing.Pipe
 
-            vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
-            vio_record, vio_child_record = multiprocessing.Pipe()      # I read from this connection recorded audio
-            vio_play, vio_child_play = multiprocessing.Pipe()          # I write in audio to be played
+        self.vio_commands, vio_child_commands = multiprocessing.Pipe()  # used to send commands to VoipIO
+        vio_record, vio_child_record = audio_pipe()                     # I read from this connection recorded audio
+        vio_play, vio_child_play = multiprocessing.Pipe()               # I write in audio to be played
 
-            vad_commands, vad_child_commands = multiprocessing.Pipe()   # used to send commands to VAD
-            vad_audio_out, vad_child_audio_out = multiprocessing.Pipe() # used to read output audio from VAD
+        self.vad_commands, vad_child_commands = multiprocessing.Pipe()  # used to send commands to VAD
+        vad_audio_out, vad_child_audio_out = audio_pipe()               # used to read output audio from VAD
 
-            asr_commands, asr_child_commands = multiprocessing.Pipe()          # used to send commands to ASR
-            asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()  # used to read ASR hypotheses
+        self.asr_commands, asr_child_commands = multiprocessing.Pipe()     # used to send commands to ASR
+        asr_hypotheses_out, asr_child_hypotheses = multiprocessing.Pipe()  # used to read ASR hypotheses
 
-            slu_commands, slu_child_commands = multiprocessing.Pipe()          # used to send commands to SLU
-            slu_hypotheses_out, slu_child_hypotheses = multiprocessing.Pipe()  # used to read SLU hypotheses
+        self.slu_commands, slu_child_commands = multiprocessing.Pipe()     # used to send commands to SLU
+        slu_hypotheses_out, slu_child_hypotheses = multiprocessing.Pipe()  # used to read SLU hypotheses
 
-            dm_commands, dm_child_commands = multiprocessing.Pipe()            # used to send commands to DM
-            dm_actions_out, dm_child_actions = multiprocessing.Pipe()          # used to read DM actions
+        self.dm_commands, dm_child_commands = multiprocessing.Pipe()       # used to send commands to DM
+        dm_actions_out, dm_child_actions = multiprocessing.Pipe()          # used to read DM actions
 
-            nlg_commands, nlg_child_commands = multiprocessing.Pipe()          # used to send commands to NLG
-            nlg_text_out, nlg_child_text = multiprocessing.Pipe()              # used to read NLG output
+        self.nlg_commands, nlg_child_commands = multiprocessing.Pipe()     # used to send commands to NLG
+        nlg_text_out, nlg_child_text = multiprocessing.Pipe()              # used to read NLG output
 
-            tts_commands, tts_child_commands = multiprocessing.Pipe()          # used to send commands to TTS
+        self.tts_commands, tts_child_commands = multiprocessing.Pipe()     # used to send commands to TTS
 
-            command_connections = [vio_commands, vad_commands, asr_commands, slu_commands,
-                                   dm_commands, nlg_commands, tts_commands]
+        self.command_connections = [self.vio_commands, self.vad_commands, self.asr_commands, self.slu_commands,
+                                    self.dm_commands, self.nlg_commands, self.tts_commands]
 
-            non_command_connections = [vio_record, vio_child_record,
-                                       vio_play, vio_child_play,
-                                       vad_audio_out, vad_child_audio_out,
-                                       asr_hypotheses_out, asr_child_hypotheses,
-                                       slu_hypotheses_out, slu_child_hypotheses,
-                                       dm_actions_out, dm_child_actions,
-                                       nlg_text_out, nlg_child_text]
+        self.non_command_connections = [vio_record, vio_child_record,
+                                        vio_play, vio_child_play,
+                                        vad_audio_out, vad_child_audio_out,
+                                        asr_hypotheses_out, asr_child_hypotheses,
+                                        slu_hypotheses_out, slu_child_hypotheses,
+                                        dm_actions_out, dm_child_actions,
+                                        nlg_text_out, nlg_child_text]
 
-            vio = self.voice_io_cls(self.cfg, vio_child_commands, vio_child_record, vio_child_play, self.close_event)
-            vad = VAD(self.cfg, vad_child_commands, vio_record, vad_child_audio_out, self.close_event)
-            asr = ASR(self.cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, self.close_event)
-            slu = SLU(self.cfg, slu_child_commands, asr_hypotheses_out, slu_child_hypotheses, self.close_event)
-            dm  =  DM(self.cfg,  dm_child_commands, slu_hypotheses_out, dm_child_actions, self.close_event)
-            nlg = NLG(self.cfg, nlg_child_commands, dm_actions_out, nlg_child_text, self.close_event)
-            tts = TTS(self.cfg, tts_child_commands, nlg_text_out, vio_play, self.close_event)
+        self.vio = self.voice_io_cls(cfg, vio_child_commands, vio_child_record, vio_child_play, self.close_event)
+        self.vad = VAD(cfg, vad_child_commands, vio_record, vad_child_audio_out, self.close_event)
+        self.asr = ASR(cfg, asr_child_commands, vad_audio_out, asr_child_hypotheses, self.close_event)
+        self.slu = SLU(cfg, slu_child_commands, asr_hypotheses_out, slu_child_hypotheses, self.close_event,
+                       slu=models.get('slu'))
+        self.dm  =  DM(cfg,  dm_child_commands, slu_hypotheses_out, dm_child_actions, self.close_event)
+        self.nlg = NLG(cfg, nlg_child_commands, dm_actions_out, nlg_child_text, self.close_event,
+                       nlg=models.get('nlg'))
+        self.tts = TTS(cfg, tts_child_commands, nlg_text_out, vio_play, self.close_event,
+                       tts=models.get('tts'))
+
+        self.processes = [['vio', self.vio], ['vad', self.vad], ['asr', self.asr], ['dm', self.dm]]
+        if not models:
+            self.processes.extend([['slu', self.slu], ['nlg', self.nlg], ['tts', self.tts]])
+
+            if cfg['TTS'].get('precompile', False):
+                precompile_prompts(cfg, self.nlg.nlg, self.tts)
+
+    def run(self):
+        try:
+            cfg = self.cfg
 
-            vio.start()
-            vad.start()
-            asr.start()
-            slu.start()
-            dm.start()
-            nlg.start()
-            tts.start()
+            if self.processes is None:
+                self.create_components()
 
-            self.write_pid_file([['vio', vio.pid], ['vad', vad.pid], ['asr', asr.pid],
-                                 ['slu', slu.pid], ['dm', dm.pid], ['nlg', nlg.pid], ['tts', tts.pid]])
+            vio_commands = self.vio_commands
+            vad_commands = self.vad_commands
+            asr_commands = self.asr_commands
+            slu_commands = self.slu_commands
+            dm_commands = self.dm_commands
+            nlg_commands = self.nlg_commands
+            tts_commands = self.tts_commands
+            command_connections = self.command_connections
+            non_command_connections = self.non_command_connections
+
+            for name, process in self.processes:
+                process.start()
+
+            self.write_pid_file([[name, process.pid] for name, process in self.processes])
 
             cfg['Logging']['session_logger'].set_close_event(self.close_event)
             cfg['Logging']['session_logger'].set_cfg(cfg)
@@ -134,7 +178,9 @@ class VoiceHub(Hub):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait for a message from any component, the timeout bounds the delay of the close event
+                # and of the timers below.
+                wait_for_input(command_connections, self.cfg['Hub']['main_loop_wait_timeout'])
 
                 if call_back_time != -1 and call_back_time < time.time():
                     vio_commands.send(Command('make_call(destination="%s")' % call_back_uri, 'HUB', 'VoipIO'))
@@ -470,3 +516,93 @@ class VoiceHub(Hub):
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
 
+
+
+class MultiSessionVoiceHub(object):
+    """
+    MultiSessionVoiceHub serves several concurrent calls with one copy of the SLU, NLG and TTS models.
+
+    Every call (session) has its own hub with its own VoiceIO, VAD, ASR and DM processes because these keep
+    the per-call state, e.g. the VAD smoothing windows, the ASR decoder or the dialogue state. The stateless,
+    model heavy SLU, NLG and TTS components of all the sessions are run in shared ComponentPools. The models
+    are loaded once in this process before the pools and the hubs are forked.
+
+    The sessions are defined by the list cfg['Hub']['sessions'] of configuration overrides, e.g. the VoipIO
+    accounts and the pid files of the hubs. Each session gets its own system and session loggers.
+    """
+
+    def __init__(self, hub_cls, cfg, ncalls):
+        self.hub_cls = hub_cls
+        self.cfg = cfg
+        self.ncalls = ncalls
+        self.close_event = multiprocessing.Event()
+
+    @classmethod
+    def copy_sections(cls, config):
+        """Returns a copy of the nested configuration dictionaries so that they can be updated, the values are
+        shared."""
+        return dict((k, cls.copy_sections(v) if isinstance(v, dict) else v) for k, v in config.iteritems())
+
+    def create_session_config(self, overrides):
+        session_cfg = Config(config=self.copy_sections(self.cfg.config))
+
+        system_logger = self.cfg['Logging']['system_logger']
+        session_cfg['Logging']['system_logger'] = SystemLogger(output_dir=system_logger.output_dir,
+                                                               stdout_log_level=system_logger.stdout_log_level,
+                                                               stdout=system_logger.stdout,
+                                                               file_log_level=system_logger.file_log_level)
+        session_cfg['Logging']['session_logger'] = SessionLogger()
+
+        session_cfg.update(overrides)
+
+        return session_cfg
+
+    def load_models(self):
+        return {
+            'slu': slu_factory(self.cfg),
+            'nlg': nlg_factory(get_nlg_type(self.cfg), self.cfg),
+            'tts': tts_factory(get_tts_type(self.cfg), self.cfg),
+        }
+
+    def run(self):
+        hubs = []
+        try:
+            models = self.load_models()
+
+            for overrides in self.cfg['Hub']['sessions']:
+                hub = self.hub_cls(self.create_session_config(overrides), self.ncalls)
+                hub.create_components(models)
+                hubs.append(hub)
+
+            if self.cfg['TTS'].get('precompile', False) and hubs:
+                # the models are shared, so it is enough to precompile the prompts once
+                precompile_prompts(self.cfg, models['nlg'], hubs[0].tts)
+
+            # the sessions are assigned to the pools in a round robin fashion
+            pool_size = min(self.cfg['Hub']['pool_size'], len(hubs))
+            pools = []
+            for name in ['slu', 'nlg', 'tts']:
+                for i in range(pool_size):
+                    components = [getattr(hub, name) for hub in hubs[i::pool_size]]
+                    pools.append(ComponentPool(self.cfg, '%s%d' % (name.upper(), i), components, self.close_event))
+
+            sessions = [multiprocessing.Process(target=hub.run, name='%s%d' % (hub.hubname, i))
+                        for i, hub in enumerate(hubs)]
+
+            for process in pools + sessions:
+                process.start()
+
+            for process in sessions:
+                process.join()
+
+        except KeyboardInterrupt:
+            print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+        except:
+            self.cfg['Logging']['system_logger'].exception('Uncaught exception in the multi-session hub.')
+            raise
+        finally:
+            for hub in hubs:
+                hub.close_event.set()
+            self.close_event.set()
+
+        print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
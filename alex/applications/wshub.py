@@ -7,7 +7,7 @@ import argparse
 if __name__ == '__main__':
     import autopath
 
-from alex.applications.voicehub import VoiceHub
+from alex.applications.voicehub import VoiceHub, MultiSessionVoiceHub
 from alex.components.hub.wsio import WSIO
 from alex.utils.config import Config
 
@@ -50,6 +50,10 @@ if __name__ == '__main__':
 
     cfg['Logging']['system_logger'].info("Voip Hub\n" + "=" * 120)
 
-    vhub = WSHub(cfg, args.ncalls)
+    if cfg['Hub']['sessions']:
+        # serve several concurrent calls with shared SLU, NLG and TTS
+        vhub = MultiSessionVoiceHub(WSHub, cfg, args.ncalls)
+    else:
+        vhub = WSHub(cfg, args.ncalls)
 
     vhub.run()
\ No newline at end of file
@@ -92,6 +92,8 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
         correct_nblist.add(A1*B1*C3, Utterance("A1 B1 C3"))
         correct_nblist.add(A1*B3*C2, Utterance("A1 B3 C2"))
         correct_nblist.add(A1*B2*C3, Utterance("A1 B2 C3"))
+        correct_nblist.add(A3*B1*C1, Utterance("A3 B1 C1"))
+        correct_nblist.add(A2*B1*C1, Utterance("A2 B1 C1"))
         correct_nblist.merge()
         correct_nblist.add_other()
 
@@ -115,7 +117,10 @@ class TestUtteranceConfusionNetwork(unittest.TestCase):
         s.append(unicode(correct_nblist))
         s.append("")
 
-        self.assertEqual(unicode(gen_nblist), unicode(correct_nblist))
+        self.assertEqual([fact for prob, fact in gen_nblist], [fact for prob, fact in correct_nblist], '\n'.join(s))
+        for (gen_prob, _), (correct_prob, _) in zip(gen_nblist, correct_nblist):
+            self.assertAlmostEqual(gen_prob, correct_prob)
+        self.assertEqual(len(confnet.get_utterance_nblist(40)), 3 * 3 * 3 + 1)
 
     def test_repr_basic(self):
         A1, A2, A3 = 0.90, 0.05, 0.05
@@ -6,14 +6,15 @@
 from __future__ import unicode_literals
 
 import copy
+import math
 import re
 from collections import namedtuple
-from itertools import izip, product
+from itertools import islice, izip, product
 from operator import add, itemgetter, mul
 
 from alex.components.slu.exceptions import SLUException
 from alex.corpustools.wavaskey import load_wavaskey, save_wavaskey
-from alex.ml.hypothesis import Hypothesis, NBList
+from alex.ml.hypothesis import Hypothesis, NBList, kbest_hyp_indexes
 from alex.ml.exceptions import NBListException
 from alex.utils import text
 from alex.utils.text import Escaper
@@ -1471,32 +1472,31 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
 
         return []
 
-    # TODO Test.
-    # TODO Implement the option to keep the original value, just adding the
-    # replacement by its side.
-    def get_next_worse_candidates(self, hyp_index):
-        """
-        Returns such hypotheses that will have lower probability. It assumes
-        that the confusion network is sorted.
+    def get_hyp_index_utterance(self, hyp_index):
+        s = [alts[i][1] for i, alts in zip(hyp_index, self._cn)]
 
-        """
-        worse_hyp = []
+        return Utterance(' '.join(s))
 
-        for i in range(len(hyp_index)):
-            wh = list(hyp_index)
-            wh[i] += 1
-            if wh[i] >= len(self._cn[i]):
-                # this generate inadmissible word hypothesis
-                continue
+    # FIXME Make this method aware of _long_links.
+    def iter_hyp_indexes(self):
+        """Generates the indexes of the hypotheses in the order of decreasing
+        probability.
 
-            worse_hyp.append(tuple(wh))
+        :return: a generator of (probability, hypothesis index) pairs
 
-        return worse_hyp
+        """
+        for logprob, hyp_index in kbest_hyp_indexes([[p for p, w in alts] for alts in self._cn]):
+            yield math.exp(logprob), hyp_index
 
-    def get_hyp_index_utterance(self, hyp_index):
-        s = [alts[i][1] for i, alts in zip(hyp_index, self._cn)]
+    def iter_utterance_hyps(self):
+        """Generates the utterance hypotheses in the order of decreasing
+        probability, e.g. for a caller which needs just a few of them.
 
-        return Utterance(' '.join(s))
+        :return: a generator of (probability, Utterance) pairs
+
+        """
+        for prob, hyp_index in self.iter_hyp_indexes():
+            yield prob, self.get_hyp_index_utterance(hyp_index)
 
     # FIXME Make this method aware of _long_links.
     def get_utterance_nblist(self, n=10, prune_prob=0.005):
@@ -1509,38 +1509,9 @@ class UtteranceConfusionNetwork(ASRHypothesis, Abstracted):
         Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
         """
-
-        open_hyp = []
-        closed_hyp = {}
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0] * len(self._cn))
-        best_prob = self.get_prob(best_hyp)
-        open_hyp.append((best_prob, best_hyp))
-
-        i = 0
-        while open_hyp and i < n:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
-
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
-
-                closed_hyp[current_hyp_index] = current_prob
-
-                # print "current_prob, current_hyp_index:", current_prob,
-                # current_hyp_index
-
-                for hyp_index in self.get_next_worse_candidates(current_hyp_index):
-                    prob = self.get_prob(hyp_index)
-                    open_hyp.append((prob, hyp_index))
-
-                open_hyp.sort(reverse=True)
-
         nblist = UtteranceNBList()
-        for idx in closed_hyp:
-            nblist.add(closed_hyp[idx], self.get_hyp_index_utterance(idx))
+        for prob, hyp_index in islice(self.iter_hyp_indexes(), n):
+            nblist.add(prob, self.get_hyp_index_utterance(hyp_index))
 
         # print nblist
         # print
@@ -14,11 +14,44 @@ class OntologyException(Exception):
     pass
 
 
+_literal_pattern_rx = re.compile(r'^\^(?:([^.^$*+?{}\[\]\\|()]*)|\(([^.^$*+?{}\[\]\\()]*)\))\$$')
+
+
+class PatternMatcher(object):
+    """Matches strings against a regular expression the same way as re.match(pattern, string).
+
+    The patterns of the form ``^literal$`` or ``^(literal|literal|...)$`` are matched by a set lookup, the empty
+    pattern matches any string, and the other patterns are compiled.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.literals = None
+        self.rx = None
+
+        m = _literal_pattern_rx.match(pattern)
+        if m:
+            self.literals = frozenset([m.group(1)]) if m.group(1) is not None else frozenset(m.group(2).split('|'))
+        elif pattern:
+            self.rx = re.compile(pattern)
+
+    def match(self, string):
+        if self.literals is not None:
+            # '$' matches before a final newline as well
+            return string in self.literals or (string.endswith('\n') and string[:-1] in self.literals)
+        if self.rx is not None:
+            return self.rx.match(string) is not None
+        return True
+
+
 class Ontology(object):
     """Represents an ontology for a dialogue domain.
     """
     def __init__(self, file_name=None):
         self.ontology = {}
+        self._lta_index = None
+        self._lta_cache = {}
+        self._roc_index = None
         if file_name:
             self.load(file_name)
 
@@ -33,6 +66,30 @@ class Ontology(object):
         if not hasattr(on_mod, 'ontology'):
             raise OntologyException("The ontology file does not define the 'ontology' object!")
         self.ontology = on_mod.ontology
+        self.compile()
+
+    def compile(self):
+        """Compiles the patterns of 'last_talked_about' and 'reset_on_change' into indices. It must be called
+        again if these parts of the ontology are modified after the first use.
+        """
+        # the last_talked_about rules indexed by the literal source slot names, the rules with other slot name
+        # patterns are under None; the rules are numbered in the order of the ontology
+        self._lta_index = {}
+        self._lta_cache = {}
+        rule_no = 0
+        for target_slot, target_values in self.ontology.get('last_talked_about', {}).iteritems():
+            for target_value, source_patterns in target_values.iteritems():
+                for source_dat, source_name, source_value in source_patterns:
+                    name_matcher = PatternMatcher(source_name)
+                    rule = (rule_no, PatternMatcher(source_dat), name_matcher, PatternMatcher(source_value),
+                            (target_slot, target_value))
+                    for name in name_matcher.literals if name_matcher.literals is not None else [None]:
+                        self._lta_index.setdefault(name, []).append(rule)
+                    rule_no += 1
+
+        self._roc_index = {}
+        for slot, patterns in self.ontology.get('reset_on_change', {}).iteritems():
+            self._roc_index[slot] = [PatternMatcher(pattern) for pattern in patterns]
 
     def slot_has_value(self, name, value):
         """ Check whether the slot and the value are compatible.
@@ -65,38 +122,50 @@ class Ontology(object):
         """
         return [slot for slot in self.ontology['slots'] if 'system_selects' in self.ontology['slot_attributes'][slot]]
 
-    @lru_cache(maxsize=1000)
     def last_talked_about(self, da_type, name, value):
         """Returns a list of slots and values that should be used to for tracking about what was talked about recently,
         given the input dialogue acts.
 
+        The source patterns are matched as regular expressions (by re.match) using the index built by compile(),
+        the results are cached.
+
         :param da_type: the source dialogue act type
         :param name: the source slot name
         :param value: the source slot value
         :return: returns a list of target slot names and values used for tracking
         """
-        lta_tsv = []
+        key = (da_type, name, value)
+        try:
+            return self._lta_cache[key]
+        except KeyError:
+            pass
+
+        if self._lta_index is None:
+            self.compile()
 
         da_type = da_type if da_type else ''
         name = name if name else ''
         value = value if value else ''
 
-        for target_slot, target_values in self.ontology['last_talked_about'].iteritems():
-            for target_value, source_patterns in target_values.iteritems():
-                for source_dat, source_name, source_value in source_patterns:
-                    if re.match(source_dat, da_type) and re.match(source_name, name) and re.match(source_value, value):
-                        lta_tsv.append((target_slot, target_value))
+        rules = self._lta_index.get(name, []) + self._lta_index.get(None, [])
+        if name.endswith('\n'):
+            rules += self._lta_index.get(name[:-1], [])
+
+        matched = sorted(set((rule_no, target) for rule_no, dat_matcher, name_matcher, value_matcher, target in rules
+                             if dat_matcher.match(da_type) and name_matcher.match(name) and value_matcher.match(value)))
+        lta_tsv = [target for rule_no, target in matched]
 
+        self._lta_cache[key] = lta_tsv
         return lta_tsv
 
-    @lru_cache(maxsize=1000)
     def reset_on_change(self, slot, changed_slot):
-        if slot in self.ontology['reset_on_change']:
-            for pattern in self.ontology['reset_on_change'][slot]:
-                if re.match(pattern, changed_slot):
-                    return True
-        else:
-            return False
+        """Returns whether the slot should be reset when the changed slot changes, i.e. whether the changed slot
+        matches any of the patterns of the slot in 'reset_on_change'.
+        """
+        if self._roc_index is None:
+            self.compile()
+
+        return any(matcher.match(changed_slot) for matcher in self._roc_index.get(slot, []))
 
     def get_compatible_vals(self, slot_pair, value):
         """Given a slot pair (key to 'compatible_values' in ontology data), this returns the set of compatible values
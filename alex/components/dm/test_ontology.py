@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import re
+import unittest
+
+from alex.components.dm.ontology import Ontology, PatternMatcher
+
+# the rules of the PublicTransportInfoCS ontology
+ONTOLOGY = {
+    'slots': dict((slot, set()) for slot in [
+        'from_stop', 'to_stop', 'via_stop', 'from_city', 'to_city', 'via_city', 'in_city', 'time', 'time_rel', 'date',
+        'date_rel', 'departure_time', 'departure_time_rel', 'arrival_time', 'arrival_time_rel', 'duration', 'task',
+        'route_alternative', 'lta_time', 'lta_task']),
+    'reset_on_change': {
+        'route_alternative': [
+            '^from_stop$', '^to_stop$', '^via_stop$',
+            '^departure_time$', '^departure_time_rel$',
+            '^arrival_time$', '^arrival_time_rel$',
+            '^to_city$', '^from_city$', '^via_city$',
+        ],
+        'from_stop': ['^from_', 'city$'],
+    },
+    'last_talked_about': {
+        'lta_time': {
+            'time': [('^(inform|confirm|request|select)$', '^time$', ''), ],
+            'time_rel': [('', '^time_rel$', ''), ],
+            'date_rel': [('', '^date_rel$', '')],
+        },
+        'lta_bye': {
+            'true': [('^bye$', '', ''), ],
+        },
+        'lta_date': {
+            'date': [('', '^date$', ''), ],
+            'date_rel': [('', '^date_rel$', ''), ],
+        },
+        'lta_departure_time': {
+            'departure_time': [('', '^departure_time$', ''), ],
+            'departure_time_rel': [('', '^departure_time_rel$', ''), ],
+            'time': [('^(inform|confirm|request|select)$', '^time$', ''), ],
+            'time_rel': [('', '^time_rel$', ''), ],
+            'date_rel': [('', '^date_rel$', '')],
+        },
+        'lta_arrival_time': {
+            'arrival_time': [('', '^arrival_time$', ''), ],
+            'arrival_time_rel': [('', '^arrival_time_rel$', ''), ],
+            'date_rel': [('', '^date_rel$', '')],
+        },
+        'lta_task': {
+            'weather': [('', '^task$', '^weather$'), ],
+            'find_connection': [('', '^task$', '^find_connection$'), ('', '^departure_', ''), ('', '^arrival_', ''),
+                                ('', '^duration$', '')],
+            'find_platform': [('', '^task$', '^find_platform$'),],
+        },
+    },
+}
+
+
+def create_ontology():
+    ontology = Ontology()
+    ontology.ontology = ONTOLOGY
+    ontology.compile()
+    return ontology
+
+
+def reference_last_talked_about(ontology, da_type, name, value):
+    """Matches all the patterns one by one as the ontology did before they were indexed."""
+    lta_tsv = []
+
+    da_type = da_type if da_type else ''
+    name = name if name else ''
+    value = value if value else ''
+
+    for target_slot, target_values in ontology['last_talked_about'].iteritems():
+        for target_value, source_patterns in target_values.iteritems():
+            for source_dat, source_name, source_value in source_patterns:
+                if re.match(source_dat, da_type) and re.match(source_name, name) and re.match(source_value, value):
+                    lta_tsv.append((target_slot, target_value))
+
+    return lta_tsv
+
+
+class TestOntology(unittest.TestCase):
+    def test_pattern_matcher(self):
+        patterns = ['', '^time$', '^(inform|confirm)$', '^departure_', 'time', '^$', '^a.c$', '^(a|b)c$', '^x|y$']
+        strings = ['', 'time', 'time\n', 'time_rel', 'inform', 'confirm', 'inform\n', 'informconfirm',
+                   'departure_time', 'abc', 'bc', 'y', 'x', '\n']
+
+        for pattern in patterns:
+            matcher = PatternMatcher(pattern)
+            for string in strings:
+                self.assertEqual(matcher.match(string), re.match(pattern, string) is not None, (pattern, string))
+
+        self.assertEqual(PatternMatcher('^(inform|confirm)$').literals, frozenset(['inform', 'confirm']))
+        self.assertIsNotNone(PatternMatcher('^a.c$').rx)
+
+    def test_last_talked_about(self):
+        ontology = create_ontology()
+
+        names = set(['', None, 'time\n', 'departure_x', 'arrival_', 'task'])
+        values = set(['', None, 'weather', 'find_connection', 'find_platform', 'weather\n', 'Anděl'])
+        for target_values in ontology['last_talked_about'].itervalues():
+            for source_patterns in target_values.itervalues():
+                for source_dat, source_name, source_value in source_patterns:
+                    names.add(source_name.strip('^$'))
+                    values.add(source_value.strip('^$'))
+        names.update(ontology['slots'])
+        das = ['inform', 'confirm', 'request', 'select', 'bye', 'deny', 'inform\n', '', None]
+
+        for da_type in das:
+            for name in names:
+                for value in values:
+                    self.assertEqual(ontology.last_talked_about(da_type, name, value),
+                                     reference_last_talked_about(ontology, da_type, name, value),
+                                     (da_type, name, value))
+
+        # the results are cached
+        self.assertIs(ontology.last_talked_about('inform', 'task', 'weather'),
+                      ontology.last_talked_about('inform', 'task', 'weather'))
+
+    def test_reset_on_change(self):
+        ontology = create_ontology()
+
+        slots = list(ontology['slots']) + ['route_alternative', 'xxx']
+        for slot in slots:
+            for changed_slot in slots + ['from_stop\n', '']:
+                expected = any(re.match(pattern, changed_slot)
+                               for pattern in ontology['reset_on_change'].get(slot, []))
+                self.assertEqual(ontology.reset_on_change(slot, changed_slot), expected, (slot, changed_slot))
+
+
+if __name__ == '__main__':
+    unittest.main()
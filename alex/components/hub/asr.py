@@ -16,6 +16,7 @@ from alex.components.asr.exceptions import ASRException
 from alex.components.asr.utterance import UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.hub.messages import Command, Frame, ASRHyp
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 
 
 class ASR(multiprocessing.Process):
@@ -241,7 +242,9 @@ class ASR(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                if not self.local_audio_in:
+                    # Wait for the input, check the close event at least once per the timeout.
+                    wait_for_input([self.commands, self.audio_in], self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cPickle as pickle
+import ctypes
+import multiprocessing
+import struct
+
+from datetime import datetime
+
+from alex.components.hub.exceptions import HubException
+from alex.components.hub.messages import Frame
+
+
+class SharedMemoryConnection(object):
+    """ One end of a one-way audio connection between two hub components.
+
+    The payloads of the sent frames are copied into a ring buffer in shared memory and only small descriptors
+    (seq, offset, length, id, time) packed by struct are sent through the underlying pipe, which is cheaper than
+    pickling the frames. All other messages, e.g. the speech_start() and speech_end() commands, are pickled and sent
+    through the same pipe, so their order relative to the frames is preserved.
+
+    The receiver copies the payload of a frame out of the ring buffer into a string and releases its space right
+    away. The frames are kept in buffers and forwarded to other components by the receivers, e.g. by VAD, so they
+    cannot refer to the ring buffer, which is overwritten by the next frames. If the ring buffer is full, the frame
+    is sent through the pipe as a pickled object as usual.
+
+    The connection must be created before the processes using it are forked.
+    """
+
+    # the marker, seq, offset, length, id and time (year, month, day, hour, minute, second, microsecond) of a frame
+    frame_descriptor = struct.Struct(b'<cQQIqHBBBBBI')
+    frame_marker = b'F'
+    pickle_marker = b'P'
+
+    def __init__(self, connection, buffer, read_count):
+        self.connection = connection
+        self.buffer = buffer
+        self.size = len(buffer)
+        # the shared memory is mapped at the same address in the forked processes
+        self.address = ctypes.addressof(buffer)
+
+        # the total number of bytes released by the receiver, it is shared by both ends
+        self.read_count = read_count
+        # the total number of bytes written by the sender
+        self.write_count = 0
+
+        self.send_seq = 0
+        self.recv_seq = 0
+
+    def _copy(self, dst_offset, src, length):
+        ctypes.memmove(self.address + dst_offset, src, length)
+
+    def _write(self, data):
+        offset = self.write_count % self.size
+        head = min(len(data), self.size - offset)
+
+        self._copy(offset, data, head)
+        if head < len(data):
+            self._copy(0, data[head:], len(data) - head)
+
+        self.write_count += len(data)
+
+        return offset
+
+    def _read(self, offset, length):
+        head = min(length, self.size - offset)
+
+        # slicing the shared array copies the bytes directly into a string
+        data = self.buffer[offset:offset + head]
+        if head < length:
+            data += self.buffer[:length - head]
+
+        return data
+
+    def send(self, obj):
+        if isinstance(obj, Frame) and isinstance(obj.payload, str):
+            length = len(obj.payload)
+            if self.write_count + length - self.read_count.value <= self.size:
+                offset = self._write(obj.payload)
+                t = obj.time
+                data = self.frame_descriptor.pack(self.frame_marker, self.send_seq, offset, length, obj.id,
+                                                  t.year, t.month, t.day, t.hour, t.minute, t.second, t.microsecond)
+                if obj.source is not None or obj.target is not None:
+                    data += pickle.dumps((obj.source, obj.target), pickle.HIGHEST_PROTOCOL)
+                self.connection.send_bytes(data)
+                self.send_seq += 1
+                return
+
+        self.connection.send_bytes(self.pickle_marker + pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+    def recv(self):
+        data = self.connection.recv_bytes()
+
+        if data[0] == self.frame_marker:
+            descriptor = self.frame_descriptor.unpack_from(data)
+            seq, offset, length, id = descriptor[1:5]
+            if seq != self.recv_seq:
+                raise HubException('Shared memory audio connection: expected frame %d, received frame %d' %
+                                   (self.recv_seq, seq))
+            self.recv_seq += 1
+
+            payload = self._read(offset, length)
+            self.read_count.value += length
+
+            if len(data) > self.frame_descriptor.size:
+                source, target = pickle.loads(data[self.frame_descriptor.size:])
+            else:
+                source = target = None
+
+            return Frame(payload, source, target, id, datetime(*descriptor[5:]))
+
+        return pickle.loads(data[1:])
+
+    def poll(self, timeout=0.0):
+        return self.connection.poll(timeout)
+
+    def fileno(self):
+        return self.connection.fileno()
+
+    def close(self):
+        self.connection.close()
+
+
+def SharedMemoryPipe(size):
+    """ Returns a pair (receiver, sender) of connected SharedMemoryConnection objects.
+
+    The order of the ends is the same as of multiprocessing.Pipe(duplex=False). The frames can be sent only from
+    the sender to the receiver.
+
+    :param size: size of the shared ring buffer in bytes
+    """
+    receiver, sender = multiprocessing.Pipe()
+    buffer = multiprocessing.RawArray(ctypes.c_char, size)
+    read_count = multiprocessing.RawValue(ctypes.c_ulonglong, 0)
+
+    return SharedMemoryConnection(receiver, buffer, read_count), SharedMemoryConnection(sender, buffer, read_count)
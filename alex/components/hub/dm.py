@@ -4,7 +4,6 @@
 from __future__ import unicode_literals
 
 import multiprocessing
-import select
 import time
 import random
 import urllib2
@@ -16,6 +15,7 @@ from alex.components.hub.messages import Command, SLUHyp, DMDA
 from alex.components.dm.common import dm_factory, get_dm_type
 from alex.components.dm.exceptions import DMException
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 
 
 class DM(multiprocessing.Process):
@@ -284,7 +284,8 @@ class DM(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                select.select([self.commands, self.slu_hypotheses_in], [], [], 1)
+                # Wait for the input, check the close event at least once per the timeout.
+                wait_for_input([self.commands, self.slu_hypotheses_in], self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
@@ -17,9 +17,9 @@ from alex.utils.mproc import InstanceID
 class Message(InstanceID):
     """ Abstract class which implements basic functionality for messages passed between components in the alex.
     """
-    def __init__(self, source, target):
-        self.id = self.get_instance_id()
-        self.time = datetime.now()
+    def __init__(self, source, target, id=None, time=None):
+        self.id = id if id is not None else self.get_instance_id()
+        self.time = time if time is not None else datetime.now()
         self.source = source
         self.target = target
 
@@ -91,8 +91,8 @@ class TTSText(Message):
 
 
 class Frame(Message):
-    def __init__(self, payload, source=None, target=None):
-        Message.__init__(self, source, target)
+    def __init__(self, payload, source=None, target=None, id=None, time=None):
+        Message.__init__(self, source, target, id, time)
 
         self.payload = payload
 
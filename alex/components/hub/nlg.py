@@ -10,6 +10,7 @@ from alex.components.hub.messages import Command, DMDA, TTSText
 from alex.components.dm.exceptions import DMException
 
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 
 
 class NLG(multiprocessing.Process):
@@ -20,7 +21,7 @@ class NLG(multiprocessing.Process):
     communication.
     """
 
-    def __init__(self, cfg, commands, dialogue_act_in, text_out, close_event):
+    def __init__(self, cfg, commands, dialogue_act_in, text_out, close_event, nlg=None):
         multiprocessing.Process.__init__(self)
 
         self.cfg = cfg
@@ -29,8 +30,12 @@ class NLG(multiprocessing.Process):
         self.text_out = text_out
         self.close_event = close_event
 
-        nlg_type = get_nlg_type(cfg)
-        self.nlg = nlg_factory(nlg_type, cfg)
+        if nlg is not None:
+            # the NLG is shared with other sessions
+            self.nlg = nlg
+        else:
+            nlg_type = get_nlg_type(cfg)
+            self.nlg = nlg_factory(nlg_type, cfg)
 
     def process_da(self, da):
         if da != "silence()":
@@ -112,6 +117,23 @@ class NLG(multiprocessing.Process):
             else:
                 raise DMException('Unsupported input.')
 
+    def get_input_connections(self):
+        return [self.commands, self.dialogue_act_in]
+
+    def process_input(self):
+        """Process all pending commands and one dialogue act.
+
+        Return True if the process should terminate.
+        """
+        # process all pending commands
+        if self.process_pending_commands():
+            return True
+
+        # process the incoming DM dialogue acts
+        self.read_dialogue_act_write_text()
+
+        return False
+
     def run(self):
         try:
             set_proc_name("Alex_NLG")
@@ -123,17 +145,14 @@ class NLG(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait for the input, check the close event at least once per the timeout.
+                wait_for_input(self.get_input_connections(), self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
-                # process all pending commands
-                if self.process_pending_commands():
+                if self.process_input():
                     return
 
-                # process the incoming DM dialogue acts
-                self.read_dialogue_act_write_text()
-
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: NLG t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import threading
+import time
+
+from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
+
+
+class ComponentPool(multiprocessing.Process):
+    """ Runs the components of several concurrent sessions in one process.
+
+    The components are instances of the stateless, model heavy hub components (SLU, NLG, TTS) created with
+    a model shared by all sessions. Each of them keeps its own connections, configuration (i.e. its own session logger)
+    and close event, so the pool serves every session exactly as a dedicated process would.
+
+    Every component is run by its own thread, which waits for the input of its session and passes it
+    to process_input(). A slow call, e.g. a long synthesis or the TTS waiting until the audio is played, therefore
+    delays only its own session. The threads share the single copy of the model in the process, so the models must
+    not keep any state of a call (the TTS engines are already used by several threads, see TTS['prefetch_segments']).
+
+    A component is removed from the pool when it receives the stop() command, when the close event of its session
+    is set, or when it raises an exception. In the last case, only its session is closed. The pool exits when all
+    the components are removed or when its own close event is set.
+    """
+
+    def __init__(self, cfg, name, components, close_event):
+        multiprocessing.Process.__init__(self, name=name)
+
+        self.cfg = cfg
+        self.components = list(components)
+        self.close_event = close_event
+
+    def serve(self, component):
+        """ Processes the input of the component until it is removed from the pool or the pool is closed. """
+        try:
+            while not self.close_event.is_set() and not component.close_event.is_set():
+                # check the close events at least once per the timeout
+                if not wait_for_input(component.get_input_connections(), self.cfg['Hub']['main_loop_wait_timeout']):
+                    continue
+
+                s = (time.time(), time.clock())
+
+                if component.process_input():
+                    component.close_event.set()
+                    return
+
+                d = (time.time() - s[0], time.clock() - s[1])
+                if d[0] > 0.200:
+                    print "EXEC Time inner loop: {name} t = {t:0.4f} c = {c:0.4f}\n".format(name=self.name, t=d[0], c=d[1])
+        except Exception:
+            component.cfg['Logging']['system_logger'].exception(
+                'Uncaught exception in the %s process, closing the session.' % self.name)
+            component.close_event.set()
+
+    def run(self):
+        try:
+            set_proc_name("Alex_" + self.name)
+            for component in self.components:
+                component.cfg['Logging']['session_logger'].cancel_join_thread()
+
+            threads = []
+            for i, component in enumerate(self.components):
+                thread = threading.Thread(target=self.serve, args=(component, ), name='%s_%d' % (self.name, i))
+                # the threads blocked in process_input() must not keep the process alive after the close event
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+            while any(thread.is_alive() for thread in threads):
+                # Check the close event, the wait with a timeout lets KeyboardInterrupt be delivered.
+                if self.close_event.wait(self.cfg['Hub']['main_loop_wait_timeout']):
+                    print 'Received close event in: %s' % multiprocessing.current_process().name
+                    return
+
+        except KeyboardInterrupt:
+            print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+            self.close_event.set()
+            return
+        except:
+            self.cfg['Logging']['system_logger'].exception('Uncaught exception in the %s process.' % self.name)
+            self.close_event.set()
+            raise
+
+        print 'Exiting: %s.' % multiprocessing.current_process().name
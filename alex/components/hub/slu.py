@@ -10,6 +10,7 @@ from alex.components.hub.messages import Command, ASRHyp, SLUHyp
 from alex.components.slu.common import slu_factory
 from alex.components.slu.exceptions import SLUException
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 
 
 class SLU(multiprocessing.Process):
@@ -23,7 +24,7 @@ class SLU(multiprocessing.Process):
     """
 
     def __init__(self, cfg, commands, asr_hypotheses_in, slu_hypotheses_out,
-                 close_event):
+                 close_event, slu=None):
         """
         Initialises an SLU object according to the configuration (cfg['SLU']
         is the relevant section), and stores ends of pipes to other processes.
@@ -36,6 +37,7 @@ class SLU(multiprocessing.Process):
                 receiving audio frames (from ASR)
             slu_hypotheses_out: our end of a pipe (multiprocessing.Pipe) for
                 sending SLU hypotheses
+            slu: an already loaded SLU shared with other sessions (optional)
 
         """
 
@@ -51,7 +53,7 @@ class SLU(multiprocessing.Process):
         self.close_event = close_event
 
         # Load the SLU.
-        self.slu = slu_factory(cfg)
+        self.slu = slu if slu is not None else slu_factory(cfg)
 
     def process_pending_commands(self):
         """
@@ -129,6 +131,24 @@ class SLU(multiprocessing.Process):
             else:
                 raise SLUException('Unsupported input.')
 
+    def get_input_connections(self):
+        return [self.commands, self.asr_hypotheses_in]
+
+    def process_input(self):
+        """
+        Processes all pending commands and one ASR hypothesis.
+
+        Returns True iff the component should terminate.
+        """
+        # process all pending commands
+        if self.process_pending_commands():
+            return True
+
+        # process the incoming ASR hypotheses
+        self.read_asr_hypotheses_write_slu_hypotheses()
+
+        return False
+
     def run(self):
         try:
             set_proc_name("Alex_SLU")
@@ -140,17 +160,14 @@ class SLU(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait for the input, check the close event at least once per the timeout.
+                wait_for_input(self.get_input_connections(), self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
-                # process all pending commands
-                if self.process_pending_commands():
+                if self.process_input():
                     return
 
-                # process the incoming ASR hypotheses
-                self.read_asr_hypotheses_write_slu_hypotheses()
-
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: SLU t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import multiprocessing
+import unittest
+
+from alex.components.hub.audiopipe import SharedMemoryPipe
+from alex.components.hub.messages import Command, Frame
+
+
+def send_messages(connection, messages):
+    for message in messages:
+        if isinstance(message, str):
+            connection.send(Frame(message))
+        else:
+            connection.send(Command(message))
+
+
+class TestSharedMemoryPipe(unittest.TestCase):
+    def check_received(self, receiver, messages):
+        for message in messages:
+            self.assertTrue(receiver.poll(5.0))
+            received = receiver.recv()
+            if isinstance(message, str):
+                self.assertTrue(isinstance(received, Frame))
+                self.assertEqual(received.payload, message)
+            else:
+                self.assertTrue(isinstance(received, Command))
+                self.assertEqual(received.command, message)
+
+        self.assertFalse(receiver.poll())
+
+    def test_order(self):
+        # frames and commands must be received in the order in which they were sent, the ring buffer wraps around
+        messages = []
+        for i in range(20):
+            messages.append(u'speech_start(fname="%d.wav")' % i)
+            messages.extend([chr(65 + i) * (30 + i) for j in range(5)])
+            messages.append(u'speech_end(fname="%d.wav")' % i)
+
+        receiver, sender = SharedMemoryPipe(100)
+        process = multiprocessing.Process(target=send_messages, args=(sender, messages))
+        process.start()
+        self.check_received(receiver, messages)
+        process.join()
+
+    def test_full_buffer(self):
+        # when the buffer is full, the frames are sent through the pipe
+        messages = ['a' * 40, 'b' * 40, 'c' * 40, u'speech_end()', 'd' * 40]
+
+        receiver, sender = SharedMemoryPipe(100)
+        send_messages(sender, messages)
+        self.check_received(receiver, messages)
+
+    def test_frame_attributes(self):
+        # the received frames keep the identity and the time of the sent ones
+        receiver, sender = SharedMemoryPipe(100)
+        frames = [Frame(b'a' * 10), Frame(b'b' * 10, 'VAD', 'ASR'), Frame(b'c' * 200)]
+        for frame in frames:
+            sender.send(frame)
+
+        for frame in frames:
+            received = receiver.recv()
+            self.assertEqual(received.payload, frame.payload)
+            self.assertEqual((received.id, received.time, received.source, received.target),
+                             (frame.id, frame.time, frame.source, frame.target))
+
+
+if __name__ == '__main__':
+    unittest.main()
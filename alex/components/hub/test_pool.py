@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import multiprocessing
+import unittest
+
+from alex.components.hub.pool import ComponentPool
+
+
+class Logger(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class EchoComponent(object):
+    """Replies to every input with its upper case version, fails on 'fail', terminates on 'stop', waits for
+    the release event on 'block'."""
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.close_event = multiprocessing.Event()
+        self.release = multiprocessing.Event()
+        self.text_in, self.text_out = multiprocessing.Pipe()
+
+    def get_input_connections(self):
+        return [self.text_in]
+
+    def process_input(self):
+        text = self.text_in.recv()
+        if text == 'stop':
+            return True
+        if text == 'fail':
+            raise ValueError(text)
+        if text == 'block':
+            self.release.wait()
+
+        self.text_in.send(text.upper())
+        return False
+
+
+class TestComponentPool(unittest.TestCase):
+    def setUp(self):
+        self.cfg = {
+            'Hub': {'main_loop_wait_timeout': 0.1},
+            'Logging': {'system_logger': Logger(), 'session_logger': Logger()},
+        }
+        self.close_event = multiprocessing.Event()
+        self.components = [EchoComponent(self.cfg) for i in range(3)]
+        self.pool = ComponentPool(self.cfg, 'ECHO', self.components, self.close_event)
+        self.pool.start()
+
+    def tearDown(self):
+        self.close_event.set()
+        self.pool.join()
+
+    def assertServed(self, component, text):
+        component.text_out.send(text)
+        self.assertTrue(component.text_out.poll(10.0))
+        self.assertEqual(component.text_out.recv(), text.upper())
+
+    def test_sessions(self):
+        for i in range(5):
+            for c in self.components:
+                self.assertServed(c, 'hello %d' % i)
+
+    def test_blocked_session(self):
+        a, b, c = self.components
+
+        # a session blocked in process_input() does not delay the other sessions
+        a.text_out.send('block')
+        self.assertServed(b, 'hello')
+        self.assertServed(c, 'hello')
+        self.assertFalse(a.text_out.poll(0.1))
+
+        a.release.set()
+        self.assertTrue(a.text_out.poll(10.0))
+        self.assertEqual(a.text_out.recv(), 'BLOCK')
+        self.assertServed(a, 'hello')
+
+    def test_stop_and_failure(self):
+        a, b, c = self.components
+
+        a.text_out.send('stop')
+        b.text_out.send('fail')
+        self.assertTrue(a.close_event.wait(10.0))
+        self.assertTrue(b.close_event.wait(10.0))
+
+        # the other sessions are still served
+        self.assertServed(c, 'hello')
+        self.assertFalse(c.close_event.is_set())
+
+        # the pool exits when all the sessions are closed
+        c.close_event.set()
+        self.pool.join(10.0)
+        self.assertFalse(self.pool.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
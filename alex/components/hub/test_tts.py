@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import threading
+import time
+import unittest
+
+from alex.components.hub.messages import Frame
+from alex.components.hub.tts import TTS
+
+
+class SlowTTS(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        # the synthesized texts, the audio of the texts in the cache is not synthesized again as by the TTS engines
+        self.synthesized = []
+        self.cache = {}
+
+    def synthesize(self, text):
+        if not text:
+            # as the TTS engines
+            return b""
+
+        with self.lock:
+            if text in self.cache:
+                return self.cache[text]
+            self.synthesized.append(text)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(0.1)
+
+        # the length of the audio identifies the segment
+        wav = b'\x00\x00' * 3 + b'\x01\x00' * len(text) + b'\x00\x00' * 5
+
+        with self.lock:
+            self.running -= 1
+            self.cache[text] = wav
+
+        return wav
+
+
+class Connection(object):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, obj):
+        self.sent.append(obj)
+
+
+class TestTTS(unittest.TestCase):
+    text = "Jeďte autobusem. Vystupte na zastávce Anděl. Přestupte na tramvaj. Vystupte na Karlově náměstí."
+
+    def create_tts(self, prefetch_segments):
+        cfg = {
+            'TTS': {
+                'debug': False,
+                'in_between_segments_silence': 0.0,
+                'prefetch_segments': prefetch_segments,
+            },
+            'Audio': {
+                'sample_rate': 16000,
+                'samples_per_frame': 1000,
+            },
+        }
+        return TTS(cfg, Connection(), None, Connection(), None, tts=SlowTTS())
+
+    def synthesized_audio(self, tts):
+        return b''.join(f.payload for f in tts.audio_out.sent if isinstance(f, Frame))
+
+    def test_remove_start_and_final_silence(self):
+        tts = self.create_tts(0)
+
+        self.assertEqual(tts.remove_start_and_final_silence(b'\x00\x00\x00\x01\x02\x00\x00\x00'), b'\x00\x01\x02\x00')
+        self.assertEqual(tts.remove_start_and_final_silence(b'\x01\x00\x00\x00\x01\x00'), b'\x01\x00\x00\x00\x01\x00')
+        self.assertEqual(tts.remove_start_and_final_silence(b'\x00\x00\x00\x00'), b'')
+        self.assertEqual(tts.remove_start_and_final_silence(b''), b'')
+
+    def test_prefetch(self):
+        sequential = self.create_tts(0)
+        sequential.synthesize(None, self.text)
+
+        prefetching = self.create_tts(2)
+        prefetching.synthesize(None, self.text)
+
+        self.assertEqual(self.synthesized_audio(prefetching), self.synthesized_audio(sequential))
+        self.assertEqual(prefetching.tts.synthesized, sequential.tts.synthesized)
+        # the four segments are synthesized two at a time
+        self.assertEqual(sequential.tts.max_running, 1)
+        self.assertEqual(prefetching.tts.max_running, 2)
+
+    def test_precompile(self):
+        tts = self.create_tts(2)
+        texts = [self.text, "Vystupte na zastávce Anděl.", "Vystupte na Můstku.", ""]
+
+        self.assertEqual(tts.precompile(texts), 5)
+        self.assertEqual(sorted(tts.tts.synthesized), sorted(set(tts.tts.synthesized)))
+        self.assertEqual(len(tts.tts.synthesized), 5)
+        self.assertEqual(tts.tts.max_running, 2)
+        self.assertEqual(tts.audio_out.sent, [])
+
+        # the precompiled prompts are not synthesized again
+        reference = self.create_tts(0)
+        for text in texts:
+            reference.synthesize(None, text)
+            tts.synthesize(None, text)
+        self.assertEqual(len(tts.tts.synthesized), 5)
+        self.assertEqual(self.synthesized_audio(tts), self.synthesized_audio(reference))
+
+
+if __name__ == '__main__':
+    unittest.main()
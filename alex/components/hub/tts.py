@@ -11,13 +11,20 @@ import os
 import string
 import struct
 
+from collections import deque
 from datetime import datetime
+from itertools import islice
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
 
 from alex.components.hub.messages import Command, Frame, TTSText
 from alex.components.tts.common import get_tts_type, tts_factory
 
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 from alex.utils.audio import save_wav
+from alex.utils.cache import get_persistent_cache
 import alex.utils.various as various
 
 
@@ -28,7 +35,7 @@ class TTS(multiprocessing.Process):
     communication.
     """
 
-    def __init__(self, cfg, commands, text_in, audio_out, close_event):
+    def __init__(self, cfg, commands, text_in, audio_out, close_event, tts=None):
         multiprocessing.Process.__init__(self)
 
         self.cfg = cfg
@@ -37,8 +44,14 @@ class TTS(multiprocessing.Process):
         self.audio_out = audio_out
         self.close_event = close_event
 
-        tts_type = get_tts_type(cfg)
-        self.tts = tts_factory(tts_type, cfg)
+        if tts is not None:
+            # the TTS engine is shared with other sessions
+            self.tts = tts
+        else:
+            tts_type = get_tts_type(cfg)
+            self.tts = tts_factory(tts_type, cfg)
+
+        self.pool = None
 
     def parse_into_segments(self, text):
         segments = []
@@ -67,18 +80,13 @@ class TTS(multiprocessing.Process):
         :return: wave audio signal without the silence at  the beginning and the end
         """
 
-        if len(wav) > 0:
-            for i, x in enumerate(wav):
-                if ord(x) != 0:
-                    break
+        samples = np.frombuffer(wav, dtype=np.int16, count=len(wav) // 2)
+        non_zero = np.flatnonzero(samples)
 
-            for j, x in enumerate(reversed(wav)):
-                if ord(x) != 0:
-                    break
+        if len(non_zero) == 0:
+            return b""
 
-            return wav[2*int(i/2):-2*int(j/2+1)]
-        else:
-            return wav
+        return wav[2 * non_zero[0]:2 * (non_zero[-1] + 1)]
 
     def gen_silence(self):
         """ Generates the silence wave audio signal with the length given by the global TTS config.
@@ -90,6 +98,62 @@ class TTS(multiprocessing.Process):
 
         return struct.pack('h',0)*length
 
+    def synthesize_segments(self, segments):
+        """ Yields the synthesized audio of the segments in their order.
+
+        The next TTS['prefetch_segments'] segments are synthesized by a pool of threads while the audio of
+        the current segment is being sent, so that the first segment can be played as soon as it is ready and
+        the following ones are ready by the time it is played. If prefetch_segments is 0, the segments are
+        synthesized one by one.
+        """
+        prefetch = self.cfg['TTS'].get('prefetch_segments', 0)
+
+        if prefetch <= 0 or len(segments) == 1:
+            for segment_text in segments:
+                yield self.tts.synthesize(segment_text)
+            return
+
+        if self.pool is None:
+            # the threads are started in the process which uses them
+            self.pool = ThreadPool(prefetch)
+
+        segments = iter(segments)
+        pending = deque(self.pool.apply_async(self.tts.synthesize, (segment_text, ))
+                        for segment_text in islice(segments, prefetch))
+        while pending:
+            result = pending.popleft()
+            for segment_text in islice(segments, 1):
+                pending.append(self.pool.apply_async(self.tts.synthesize, (segment_text, )))
+
+            yield result.get()
+
+    def precompile(self, texts):
+        """ Synthesizes the segments of the texts in advance, so that their audio is in the TTS cache when they are
+        needed for the first time.
+
+        The segments are synthesized by TTS['prefetch_segments'] threads (at least one). It should be called before
+        the component is started, e.g. with the texts from the precompile() method of the template NLG.
+
+        :param texts: the texts of the prompts
+        :return: the number of the distinct synthesized segments
+        """
+        segments = []
+        for text in texts:
+            segments.extend(self.parse_into_segments(text))
+        segments = sorted(set(segment for segment in segments if segment))
+
+        pool = ThreadPool(max(1, self.cfg['TTS'].get('prefetch_segments', 0)))
+        try:
+            pool.map(self.tts.synthesize, segments)
+        finally:
+            pool.close()
+            pool.join()
+
+        if self.cfg['TTS']['debug']:
+            self.cfg['Logging']['system_logger'].debug('TTS cache: %s' % get_persistent_cache().stats())
+
+        return len(segments)
+
     def synthesize(self, user_id, text, log="true"):
         if text == "_silence_" or text == "silence()":
             # just let the TTS generate an empty wav
@@ -105,8 +169,7 @@ class TTS(multiprocessing.Process):
 
         segments = self.parse_into_segments(text)
 
-        for i, segment_text in enumerate(segments):
-            segment_wav = self.tts.synthesize(segment_text)
+        for i, segment_wav in enumerate(self.synthesize_segments(segments)):
             segment_wav = self.remove_start_and_final_silence(segment_wav)
             if i <  len(segments) - 1:
                 # add silence only for non-final segments
@@ -119,6 +182,9 @@ class TTS(multiprocessing.Process):
             for frame in segment_wav:
                 self.audio_out.send(Frame(frame))
 
+        if self.cfg['TTS']['debug']:
+            self.cfg['Logging']['system_logger'].debug('TTS cache: %s' % get_persistent_cache().stats())
+
         self.commands.send(Command('tts_end(user_id="%s",text="%s",fname="%s")' % (user_id,text,fname), 'TTS', 'HUB'))
         self.audio_out.send(Command('utterance_end(user_id="%s",text="%s",fname="%s",log="%s")' %
                             (user_id, text, fname, log), 'TTS', 'AudioOut'))
@@ -169,6 +235,23 @@ class TTS(multiprocessing.Process):
             if isinstance(data_tts, TTSText):
                 self.synthesize(None, data_tts.text)
 
+    def get_input_connections(self):
+        return [self.commands, self.text_in]
+
+    def process_input(self):
+        """Process all pending commands and one text to be synthesized.
+
+        Return True if the process should terminate.
+        """
+        # process all pending commands
+        if self.process_pending_commands():
+            return True
+
+        # process audio data
+        self.read_text_write_audio()
+
+        return False
+
     def run(self):
         try:
             set_proc_name("Alex_TTS")
@@ -180,17 +263,14 @@ class TTS(multiprocessing.Process):
                     print 'Received close event in: %s' % multiprocessing.current_process().name
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait for the input, check the close event at least once per the timeout.
+                wait_for_input(self.get_input_connections(), self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
-                # process all pending commands
-                if self.process_pending_commands():
+                if self.process_input():
                     return
 
-                # process audio data
-                self.read_text_write_audio()
-
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
                     print "EXEC Time inner loop: TTS t = {t:0.4f} c = {c:0.4f}\n".format(t=d[0], c=d[1])
@@ -206,3 +286,25 @@ class TTS(multiprocessing.Process):
 
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
+
+
+def precompile_prompts(cfg, nlg, tts):
+    """ Renders the prompts of all the concrete dialogue acts of the template NLG and synthesizes them into
+    the TTS cache, so that the first call after a start is as fast as the following ones.
+
+    :param cfg: the configuration
+    :param nlg: a template NLG, see AbstractTemplateNLG.precompile()
+    :param tts: a TTS component
+    :return: the list of (dialogue act, text) of the rendered prompts
+    """
+    if not hasattr(nlg, 'precompile'):
+        return []
+
+    s = time.time()
+    utterances = nlg.precompile()
+    n_segments = tts.precompile(text for da, text in utterances)
+
+    cfg['Logging']['system_logger'].info('Precompiled %d prompts (%d TTS segments) in %.1f s' %
+                                         (len(utterances), n_segments, time.time() - s))
+
+    return utterances
@@ -10,6 +10,7 @@ from datetime import datetime
 from alex.components.asr.exceptions import ASRException
 from alex.components.hub.messages import Command, Frame
 from alex.utils.procname import set_proc_name
+from alex.utils.mproc import wait_for_input
 from alex.utils.exceptions import SessionClosedException
 
 import alex.components.vad.power as PVAD
@@ -224,7 +225,8 @@ class VAD(multiprocessing.Process):
                     return
 
                 if not self.local_audio_in:
-                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                    # Wait for the input, check the close event at least once per the timeout.
+                    wait_for_input([self.commands, self.audio_in], self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
@@ -12,6 +12,8 @@ from alex.components.nlg.tectotpl.core import Document
 from alex.components.nlg.tectotpl.core.exception import LoadingException
 from alex.components.nlg.tectotpl.core.util import file_stream
 import re
+import string
+from io import StringIO
 from alex.components.nlg.tectotpl.core.log import log_info
 
 __author__ = "Ondřej Dušek"
@@ -58,6 +60,85 @@ class TectoTemplates(Block):
         fh.close()
         return doc
 
+    def parse_template(self, template):
+        """\
+        Parse a template with unfilled slot placeholders, such as
+        '{from_stop}', so that it can be filled in with values later by
+        create_document() without parsing it again.
+
+        Returns a list of the nodes of the t-tree for each line of the
+        template; each of them is a tuple of the index of its parent (0 is
+        the root), its attributes, and whether its t-lemma contains
+        placeholders. Returns None if the placeholders are not only in the
+        t-lemmas, so that the template must be filled in before parsing.
+        """
+        doc = self.process_document(StringIO(template))
+        formatter = string.Formatter()
+        parsed = []
+        for bundle in doc.bundles:
+            troot = bundle.get_zone(self.language, self.selector).ttree
+            tnodes = troot.get_descendants()
+            indexes = dict((tnode.id, idx) for idx, tnode in enumerate(tnodes, start=1))
+            indexes[troot.id] = 0
+            nodes = []
+            for tnode in tnodes:
+                data = {}
+                for attr in tnode.get_attr_list():
+                    value = tnode.get_attr(attr)
+                    if value is None:
+                        continue
+                    if attr != 't_lemma' and self.has_braces(value):
+                        return None
+                    data[attr] = value
+                has_placeholders = self.has_braces(tnode.t_lemma)
+                if has_placeholders:
+                    try:
+                        list(formatter.parse(tnode.t_lemma))
+                    except ValueError:
+                        # a placeholder split by the treelet syntax
+                        return None
+                nodes.append((indexes[tnode.parent.id], data, has_placeholders))
+            parsed.append(nodes)
+        return parsed
+
+    def has_braces(self, value):
+        "Return True if the attribute value (or any of its items) contains braces."
+        if isinstance(value, dict):
+            value = value.values()
+        if isinstance(value, list):
+            return any(self.has_braces(item) for item in value)
+        return isinstance(value, basestring) and ('{' in value or '}' in value)
+
+    def create_document(self, parsed, values):
+        """\
+        Create a document from a template parsed by parse_template(), filling
+        in the given slot values.
+
+        Returns None if a filled-in t-lemma would be parsed differently had
+        the values been filled in before parsing (i.e. if it contains
+        the treelet syntax or line breaks, or starts with a space).
+        """
+        filled = []
+        for nodes in parsed:
+            filled_nodes = []
+            for parent_idx, data, has_placeholders in nodes:
+                if has_placeholders:
+                    t_lemma = data['t_lemma'].format(**values)
+                    if not t_lemma or t_lemma[0].isspace() or re.search(r'[\[\]|\r\n]', t_lemma):
+                        return None
+                    data = dict(data, t_lemma=t_lemma)
+                filled_nodes.append((parent_idx, data))
+            filled.append(filled_nodes)
+
+        doc = Document()
+        for filled_nodes in filled:
+            bundle = doc.create_bundle()
+            zone = bundle.create_zone(self.language, self.selector)
+            tnodes = [zone.create_ttree()]
+            for parent_idx, data in filled_nodes:
+                tnodes.append(tnodes[parent_idx].create_child(data=data))
+        return doc
+
     def parse_line(self, text, troot):
         """\
         Parse a template to a t-tree.
@@ -26,6 +26,8 @@ class GeneratePossessiveAdjectives(Block):
         selector: the selector of the target tree
     """
 
+    node_local = True
+
     def __init__(self, scenario, args):
         """\
         Constructor, just checking the argument values.
@@ -21,11 +21,22 @@ class GenerateWordForms(Block):
     """
     Inflect word forms according to filled-in tags.
 
+    All the a-trees of a document are inflected in one batch by the model,
+    and the inflections are cached, keyed by the lemma and the tag.
+
     Arguments:
         language: the language of the target tree
         selector: the selector of the target tree
+        model: the model file (relative to the data directory)
+        cache_size: the maximum number of cached inflections
+            (default: 100000, the cache is emptied when it is full)
     """
 
+    # the categories of the tags which determine the features
+    TAG_CATEGORIES = ['pos', 'subpos', 'gender', 'number', 'case',
+                      'possgender', 'possnumber', 'person', 'tense', 'grade',
+                      'negation', 'voice']
+
     BACK_REGEX = re.compile(r'^>([0-9]+)(.*)$')
 
     def __init__(self, scenario, args):
@@ -37,6 +48,8 @@ class GenerateWordForms(Block):
             raise LoadingException('Language must be defined!')
         self.model = None
         self.model_file = args['model']
+        self.cache = {}
+        self.cache_size = args.get('cache_size', 100000)
 
     def load(self):
         """\
@@ -44,54 +57,99 @@ class GenerateWordForms(Block):
         """
         self.model = Model.load_from_file(os.path.join(self.scenario.data_dir,
                                                        self.model_file))
+        self.model.compile_features()
+
+    def process_document(self, doc):
+        """\
+        Inflect word forms in all a-trees of the document at once.
+        """
+        zones = [bundle.get_zone(self.language, self.selector)
+                 for bundle in doc.bundles]
+        self.process_atrees([zone.atree for zone in zones
+                             if zone.has_atree()])
 
     def process_atree(self, aroot):
         """\
         Inflect word forms in the given a-tree.
         """
-        anodes = aroot.get_descendants(ordered=True)
-        # set hard form = lemma for non-inflected words
-        for anode in [anode for anode in anodes
-                      if anode.morphcat_pos in ['Z', 'J', 'R', '!']]:
-            anode.form = anode.lemma
+        self.process_atrees([aroot])
+
+    def process_atrees(self, aroots):
+        """\
+        Inflect word forms in the given a-trees, classifying all the words
+        whose inflection is not cached in one batch.
+        """
+        to_process = []
+        for aroot in aroots:
+            for anode in aroot.get_descendants(ordered=True):
+                # set hard form = lemma for non-inflected words
+                if anode.morphcat_pos in ['Z', 'J', 'R', '!']:
+                    anode.form = anode.lemma
+                else:
+                    to_process.append(anode)
         # inflect the rest
-        to_process = [anode for anode in anodes
-                      if anode.morphcat_pos not in ['Z', 'J', 'R', '!']]
-        instances = [self.__get_features(anode) for anode in to_process]
-        inflections = self.model.classify(instances)
-        for anode, inflection in zip(to_process, inflections):
-            self.__inflect(anode, inflection)
-
-    def __get_features(self, anode):
+        keys = [self.__get_key(anode) for anode in to_process]
+        inflections = {}
+        new_keys = []
+        for key in keys:
+            if key in inflections:
+                continue
+            if key in self.cache:
+                inflections[key] = self.cache[key]
+            else:
+                inflections[key] = None
+                new_keys.append(key)
+        if new_keys:
+            instances = [self.__get_features(key) for key in new_keys]
+            new_inflections = zip(new_keys, self.model.classify(instances))
+            inflections.update(new_inflections)
+            if len(self.cache) + len(new_keys) > self.cache_size:
+                self.cache.clear()
+            if len(new_keys) <= self.cache_size:
+                self.cache.update(new_inflections)
+        for anode, key in zip(to_process, keys):
+            self.__inflect(anode, inflections[key])
+
+    def __get_key(self, anode):
+        """\
+        Return the lemma and the tag of the a-node, which determine all the
+        features for morphological inflection.
+        """
+        return (anode.lemma,) + tuple(anode.get_attr('morphcat/' + category)
+                                      for category in self.TAG_CATEGORIES)
+
+    def __get_features(self, key):
         """\
         Retrieve all the features needed for morphological inflection
-        and store them as a dictionary.
+        (given the lemma and the tag) and store them as a dictionary.
         """
+        (lemma, pos, subpos, gender, number, case, possgender, possnumber,
+         person, tense, grade, negation, voice) = key
         # add lemma and morphological information
-        feats = {'Lemma': anode.lemma,
-                 'Tag_POS': anode.morphcat_pos,
-                 'Tag_SubPOS': anode.morphcat_subpos,
-                 'Tag_Gen': anode.morphcat_gender,
-                 'Tag_Num': anode.morphcat_number,
-                 'Tag_Cas': anode.morphcat_case,
-                 'Tag_PGe': anode.morphcat_possgender,
-                 'Tag_PNu': anode.morphcat_possnumber,
-                 'Tag_Per': anode.morphcat_person,
-                 'Tag_Ten': anode.morphcat_tense,
-                 'Tag_Gra': anode.morphcat_grade,
-                 'Tag_Neg': anode.morphcat_negation,
-                 'Tag_Voi': anode.morphcat_voice}
+        feats = {'Lemma': lemma,
+                 'Tag_POS': pos,
+                 'Tag_SubPOS': subpos,
+                 'Tag_Gen': gender,
+                 'Tag_Num': number,
+                 'Tag_Cas': case,
+                 'Tag_PGe': possgender,
+                 'Tag_PNu': possnumber,
+                 'Tag_Per': person,
+                 'Tag_Ten': tense,
+                 'Tag_Gra': grade,
+                 'Tag_Neg': negation,
+                 'Tag_Voi': voice}
         # concatenated features
-        cas = anode.morphcat_case or '?'
-        num = anode.morphcat_number or '?'
-        gen = anode.morphcat_gender or '?'
+        cas = case or '?'
+        num = number or '?'
+        gen = gender or '?'
         feats['Tag_Cas-Num-Gen'] = cas + num + gen
         feats['Tag_Num-Gen'] = num + gen
         feats['Tag_Cas-Gen'] = cas + gen
         feats['Tag_Cas-Num'] = cas + num
         # add suffixes of length 1 - 8 (inclusive)
         for suff_len in xrange(1, 9):
-            feats['LemmaSuff_' + str(suff_len)] = anode.lemma[-suff_len:]
+            feats['LemmaSuff_' + str(suff_len)] = lemma[-suff_len:]
         return feats
 
     def __inflect(self, anode, inflection):
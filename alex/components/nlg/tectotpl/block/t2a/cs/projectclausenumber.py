@@ -21,6 +21,8 @@ class ProjectClauseNumber(Block):
         selector: the selector of the target tree
     """
 
+    node_local = True
+
     def __init__(self, scenario, args):
         "Constructor, just checking the argument values"
         Block.__init__(self, scenario, args)
@@ -13,6 +13,13 @@ __date__ = "2012"
 class Block(object):
     "A common ancestor to all Treex processing blocks."
 
+    # Blocks which only implement process_Xnode, change only the given node
+    # and its a-nodes, and do not depend on what the other node-local blocks
+    # change in other nodes may set this to True. A compiled scenario then
+    # applies consecutive node-local blocks to each node in a single
+    # traversal (see FusedBlocks).
+    node_local = False
+
     def __init__(self, scenario, args):
         "Constructor, to be overridden by child blocks."
         self.scenario = scenario
@@ -77,3 +84,41 @@ class Block(object):
         # found process_Xtree - exec it
         proc(zone.get_tree(layer))
         return True
+
+    def node_layer(self):
+        """\
+        Return the layer processed by a node-local block, or None if the
+        block is not node-local.
+        """
+        if not self.node_local:
+            return None
+        layers = [layer for layer in 'a', 't', 'n', 'p'
+                  if hasattr(self, 'process_' + layer + 'node')]
+        return layers[0] if len(layers) == 1 else None
+
+
+class FusedBlocks(Block):
+    """\
+    Applies a sequence of node-local blocks for the same layer, language and
+    selector to each node in a single traversal of the tree, instead of
+    traversing the tree once for each of them.
+    """
+
+    def __init__(self, scenario, blocks):
+        "Constructor, taking the blocks to be applied."
+        Block.__init__(self, scenario, {'language': blocks[0].language,
+                                        'selector': blocks[0].selector})
+        self.blocks = blocks
+        self.layer = blocks[0].node_layer()
+        self.procs = [getattr(block, 'process_' + self.layer + 'node')
+                      for block in blocks]
+
+    def process_zone(self, zone):
+        "Apply all the blocks to each node of the tree of the given layer."
+        if not zone.has_tree(self.layer):
+            return
+        nodes = zone.get_tree(self.layer).get_descendants(
+            add_self=(self.layer == 'p'))
+        for node in nodes:
+            for proc in self.procs:
+                proc(node)
@@ -130,8 +130,9 @@ class Node(object):
         (gathering all attributes of base classes)"""
         # Caching for classes
         # (since the output is always the same for the same class)
+        # (the cache must be looked up in the class itself, not in its bases)
         myclass = self.__class__
-        if not hasattr(myclass, '__attr_list_cache'):
+        if not '_Node__attr_list_cache' in myclass.__dict__:
             myclass.__attr_list_cache = {}
         # Not in cache -- must compute
         if not (include_types, safe) in myclass.__attr_list_cache:
@@ -151,8 +152,9 @@ class Node(object):
         contain references (splitting nested ones, if needed)"""
         # Caching for classes
         # (since the output is always the same for the same class)
+        # (the cache must be looked up in the class itself, not in its bases)
         myclass = self.__class__
-        if not hasattr(myclass, '__ref_attr_cache'):
+        if not '_Node__ref_attr_cache' in myclass.__dict__:
             myclass.__ref_attr_cache = {}
         # Not in cache -- must compute
         if not split_nested in self.__class__.__ref_attr_cache:
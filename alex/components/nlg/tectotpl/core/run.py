@@ -6,7 +6,10 @@
 from __future__ import unicode_literals
 import sys
 import codecs
+import itertools
+from collections import OrderedDict
 from alex.components.nlg.tectotpl.core import ScenarioException
+from alex.components.nlg.tectotpl.core.block import FusedBlocks
 from alex.components.nlg.tectotpl.core.log import log_info
 from io import StringIO
 
@@ -16,7 +19,16 @@ __date__ = "2012"
 
 class Scenario(object):
     """This represents a scenario, i.e. a sequence of
-    blocks to be run on the data"""
+    blocks to be run on the data.
+
+    Besides the blocks, the configuration may contain:
+        cache_size: the number of the results of apply_to() and
+            apply_to_template() kept in an LRU cache, keyed by the input
+            string (default: 0, no cache)
+        compile: if True, apply_to_template() parses every template only
+            once and fills in copies of its tree, and consecutive node-local
+            blocks are applied in a single traversal (default: False)
+    """
 
     def __init__(self, config):
         "Initialize (parse YAML scenario from a file)"
@@ -24,6 +36,10 @@ class Scenario(object):
         self.global_args = config.get('global_args', {})
         self.scenario_data = config.get('scenario')
         self.data_dir = config.get('data_dir')
+        self.cache_size = config.get('cache_size', 0)
+        self.compile = config.get('compile', False)
+        self.results = OrderedDict()
+        self.parsed_templates = {}
         # check whether scenario contains blocks
         if not self.scenario_data:
             raise ScenarioException('No blocks in scenario')
@@ -52,6 +68,32 @@ class Scenario(object):
             self.blocks.append(class_obj(self, args))
             # load models etc.
             self.blocks[-1].load()
+        if self.compile:
+            self.compile_blocks()
+
+    def compile_blocks(self):
+        """\
+        Prepare the blocks applied after the reader in the compiled mode,
+        fusing consecutive node-local blocks.
+        """
+        self.compiled_blocks = []
+        for key, group in itertools.groupby(self.blocks[1:], self.fusion_key):
+            group = list(group)
+            if key is None or len(group) == 1:
+                self.compiled_blocks.extend(group)
+            else:
+                self.compiled_blocks.append(FusedBlocks(self, group))
+
+    def fusion_key(self, block):
+        """\
+        Return the layer, language and selector of a node-local block (the
+        consecutive blocks with the same key may be fused), or None if the
+        block is not node-local.
+        """
+        layer = block.node_layer()
+        if layer is None:
+            return None
+        return layer, block.language, block.selector
 
     def apply_to(self, string, language=None, selector=None):
         """
@@ -59,17 +101,71 @@ class Scenario(object):
         the first block of the scenario), return the sentence(s) of the
         given target language and selector.
         """
+        return self.apply_to_template(string, None, language, selector)
+
+    def apply_to_template(self, template, values, language=None,
+                          selector=None):
+        """
+        Fill in the slot values (a dictionary) into a template (with
+        placeholders such as '{from_stop}') and apply the whole scenario to
+        the result, just like apply_to(template.format(**values)).
+
+        If values is None, the template is taken as already filled in.
+        """
+        string = template.format(**values) if values is not None else template
         # check if we know the target language and selector
         language = language or self.global_args['language']
         selector = selector or self.global_args.get('selector', '')
+        # look for the result in the cache
+        key = (string, language, selector)
+        if key in self.results:
+            result = self.results.pop(key)
+            self.results[key] = result
+            return result
         # the first block is supposed to be a reader which creates the document
-        fh = StringIO(string)
-        doc = self.blocks[0].process_document(fh)
+        doc = None
+        if self.compile and values is not None:
+            doc = self.read_template(template, values)
+        if doc is None:
+            fh = StringIO(string)
+            doc = self.blocks[0].process_document(fh)
         # apply all other blocks
-        for block_no, block in enumerate(self.blocks[1:], start=2):
-            log_info('Applying block ' + str(block_no) + '/' +
-                     str(len(self.blocks)) + ': ' + block.__class__.__name__)
-            block.process_document(doc)
+        if self.compile:
+            for block in self.compiled_blocks:
+                block.process_document(doc)
+        else:
+            for block_no, block in enumerate(self.blocks[1:], start=2):
+                log_info('Applying block ' + str(block_no) + '/' +
+                         str(len(self.blocks)) + ': ' +
+                         block.__class__.__name__)
+                block.process_document(doc)
         # return the text of all bundles for the specified sentence
-        return "\n".join([b.get_zone(language, selector).sentence
-                          for b in doc.bundles])
+        result = "\n".join([b.get_zone(language, selector).sentence
+                            for b in doc.bundles])
+        if self.cache_size:
+            self.results[key] = result
+            if len(self.results) > self.cache_size:
+                self.results.popitem(last=False)
+        return result
+
+    def read_template(self, template, values):
+        """\
+        Create a document from a copy of the parsed template with the values
+        filled in, if the reader supports it; return None otherwise.
+        """
+        parsed = self.parse_template(template)
+        if parsed is None:
+            return None
+        return self.blocks[0].create_document(parsed, values)
+
+    def parse_template(self, template):
+        """\
+        Parse the template with the reader and cache the result; return None
+        if the reader does not support it or the template cannot be parsed.
+        """
+        reader = self.blocks[0]
+        if not hasattr(reader, 'parse_template'):
+            return None
+        if template not in self.parsed_templates:
+            self.parsed_templates[template] = reader.parse_template(template)
+        return self.parsed_templates[template]
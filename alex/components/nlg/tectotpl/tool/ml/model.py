@@ -20,6 +20,8 @@ except:
     from sklearn.metrics import zero_one_loss as zero_one_score
 from alex.components.nlg.tectotpl.tool.ml.dataset import DataSet
 from sklearn.dummy import DummyClassifier
+from sklearn.feature_extraction import DictVectorizer
+import scipy.sparse as sp
 from alex.components.nlg.tectotpl.core.exception import RuntimeException
 from alex.components.nlg.tectotpl.tool.cluster import Job
 import numpy as np
@@ -121,6 +123,13 @@ class AbstractModel(object):
         """
         raise NotImplementedError()
 
+    def compile_features(self):
+        """\
+        Precompile the feature extraction for faster classification, if
+        supported by the model. Return True if the features were compiled.
+        """
+        return False
+
     def check_classification_input(self, instances):
         """\
         Check classification input data format, convert to list if needed.
@@ -153,6 +162,8 @@ class Model(AbstractModel):
         self.vectorizer_trained = False
         self.feature_filter = config.get('feature_filter')
         self.feature_filter_trained = False
+        # vectorization and filtering compiled into a single index
+        self.feature_index = None
         self.use_weights = config.get('use_weights', False)
         # classification settings
         self.classifier = self.construct_classifier(config)
@@ -224,6 +235,7 @@ class Model(AbstractModel):
         """
         log_info('Preparing data set...')
         self.data_headers = train.get_headers()
+        self.feature_index = None
         train_vect = self.__vectorize(train)
         train_classes = self.get_classes(train)
         # if all the training data have the same class, use a dummy classifier
@@ -258,11 +270,15 @@ class Model(AbstractModel):
         if not instances:
             return instances
         # vectorize and filter the instances
-        inst_vect = self.__vectorize(instances)
-        if self.feature_filter is not None:
-            inst_filt = self.__filter_features(inst_vect)
+        if self.feature_index is not None and \
+                not isinstance(instances, DataSet):
+            inst_filt = self.__vectorize_compiled(instances)
         else:
-            inst_filt = inst_vect
+            inst_vect = self.__vectorize(instances)
+            if self.feature_filter is not None:
+                inst_filt = self.__filter_features(inst_vect)
+            else:
+                inst_filt = inst_vect
         # classify
         values = self.classifier.predict(inst_filt)
         # return the result
@@ -309,6 +325,70 @@ class Model(AbstractModel):
             self.vectorizer_trained = True
         return self.vectorizer.transform(data).tocsr()
 
+    def compile_features(self):
+        """\
+        Compile the trained DictVectorizer and feature filter into a single
+        index from the feature names to the columns of the filtered feature
+        matrix, so that classify() builds the matrix directly from the
+        instance dictionaries. The feature filter must be a selector with
+        the get_support() method (or None).
+
+        Return True if the features were compiled, False if the vectorizer
+        or the feature filter do not support it.
+        """
+        self.feature_index = None
+        if not isinstance(self.vectorizer, DictVectorizer) or \
+                not self.vectorizer_trained:
+            return False
+        columns = np.arange(len(self.vectorizer.vocabulary_))
+        if self.feature_filter is not None:
+            if not hasattr(self.feature_filter, 'get_support') or \
+                    not self.feature_filter_trained:
+                return False
+            support = self.feature_filter.get_support()
+            # columns of the features after filtering, -1 for removed ones
+            columns = np.where(support, np.cumsum(support) - 1, -1)
+        self.feature_index = {feat: columns[col] for feat, col
+                              in self.vectorizer.vocabulary_.iteritems()
+                              if columns[col] >= 0}
+        self.feature_index_width = (columns.max() + 1) if len(columns) else 0
+        return True
+
+    def __vectorize_compiled(self, data):
+        """\
+        Vectorize and filter a list of dictionaries using the compiled
+        feature index, equivalent to __vectorize and __filter_features.
+        """
+        select_attr = set(self.select_attr)
+        index = self.feature_index
+        separator = self.vectorizer.separator
+        dtype = self.vectorizer.dtype
+        indices = []
+        indptr = [0]
+        values = []
+        for inst in data:
+            for key, val in inst.iteritems():
+                if key == self.class_attr or key not in select_attr:
+                    continue
+                if self.filter_attr and not self.filter_attr(key, val):
+                    continue
+                # the same feature names as in DictVectorizer
+                if isinstance(val, basestring):
+                    key = b'%s%s%s' % (key, separator, val)
+                    val = 1
+                col = index.get(key)
+                if col is not None:
+                    indices.append(col)
+                    values.append(dtype(val))
+            indptr.append(len(indices))
+        result = sp.csr_matrix((values, indices, indptr),
+                               shape=(len(data), self.feature_index_width),
+                               dtype=dtype)
+        result.sort_indices()
+        if not self.vectorizer.sparse:
+            return result.toarray()
+        return result
+
     def __filter_features(self, data, classes=None):
         """\
         Filter features according to the pre-selected filter. Return the
@@ -367,6 +447,8 @@ class Model(AbstractModel):
         self.__demarshal_member(state, 'postprocess')
         if 'postprocess' not in state:
             state['postprocess'] = None
+        if 'feature_index' not in state:
+            state['feature_index'] = None
         self.__dict__ = state
 
 
@@ -435,21 +517,35 @@ class SplitModel(AbstractModel):
         instances, nolist = self.check_classification_input(instances)
         if not instances:
             return instances
-        # classify each instance with the respective model
-        # TODO: bulk classify
-        results = []
+        # classify the instances of each respective model in bulk
         divide_func = eval(self.divide_func)
-        for instance in instances:
+        batches = {}
+        for inst_no, instance in enumerate(instances):
             model_key = divide_func(0, instance)
-            if model_key in self.models:
-                results.append(self.models[model_key].classify(instance))
-            else:
-                results.append(self.backoff_model.classify(instance))
+            if model_key not in self.models:
+                model_key = None
+            batches.setdefault(model_key, []).append((inst_no, instance))
+        results = [None] * len(instances)
+        for model_key, batch in batches.iteritems():
+            model = self.models[model_key] if model_key is not None \
+                else self.backoff_model
+            values = model.classify([instance for _, instance in batch])
+            for (inst_no, _), value in zip(batch, values):
+                results[inst_no] = value
         # return the results
         if nolist:
             return results[0]
         return results
 
+    def compile_features(self):
+        """\
+        Compile the features of all the models (see Model.compile_features).
+        Return True if the features of all of them were compiled.
+        """
+        compiled = [model.compile_features()
+                    for model in self.models.values() + [self.backoff_model]]
+        return all(compiled)
+
     def __train_backoff_model(self, train):
         """\
         Train a DummyClassifier back-off on the given training data.
@@ -62,11 +62,17 @@ class AbstractTemplateNLG(object):
             self.templates = {}
             # generalised templates
             self.gtemplates = {}
+            # generalised templates indexed by the act types and slot names of their items, and then by the tuples
+            # of the stringified items
+            self.gtemplates_index = {}
             for k, v in templates.iteritems():
                 da = DialogueAct(k)
                 # k.sort()
                 self.templates[unicode(da)] = v
-                self.gtemplates[unicode(self.get_generic_da(da))] = (da, v)
+                generic_da = self.get_generic_da(da)
+                self.gtemplates[unicode(generic_da)] = (da, v)
+                self.gtemplates_index.setdefault(self.get_da_signature(generic_da), {})[
+                    tuple(unicode(dai) for dai in generic_da)] = (da, v)
 
         except Exception as e:
             raise TemplateNLGException('No templates loaded from %s -- %s!' % (file_name, e))
@@ -100,6 +106,13 @@ class AbstractTemplateNLG(object):
                     dai.value = "{%s}" % dai.name
         return da
 
+    def get_da_signature(self, da):
+        """\
+        Return the act types and slot names of the items of a dialogue act.
+        They are the same for the dialogue act and all its generic versions.
+        """
+        return tuple((dai.dat, dai.name or '') for dai in da)
+
     def match_generic_templates(self, da, svs):
         """\
         Find a matching template for a dialogue act using substitutions
@@ -107,8 +120,26 @@ class AbstractTemplateNLG(object):
 
         Returns a matching template and a dialogue act where values of some
         of the slots are substituted with a generic value.
+
+        The generic versions of the dialogue act are not built; they are
+        looked up as tuples of the stringified concrete or generic items among
+        the templates with the same act types and slot names.
         """
-        tpl = None
+        gtemplates = self.gtemplates_index.get(self.get_da_signature(da))
+        if not gtemplates:
+            raise TemplateNLGException("No match with generic templates.")
+
+        # the items matching any of the slots and values can be substituted
+        svs_set = set((name, value) for name, value in svs)
+        items = []
+        for dai in da:
+            if (dai.name, dai.value) in svs_set:
+                generic_dai = copy.copy(dai)
+                generic_dai.value = "{%s}" % dai.name
+                items.append(((dai.name, dai.value), unicode(dai), unicode(generic_dai)))
+            else:
+                items.append((None, unicode(dai), None))
+
         # try to find increasingly generic templates
         # limit the complexity of the search
         if len(svs) == 0:
@@ -122,13 +153,13 @@ class AbstractTemplateNLG(object):
 
         for r in rng:
             for cmb in itertools.combinations(svs, r):
-                generic_da = self.get_generic_da_given_svs(da, cmb)
+                cmb = set((name, value) for name, value in cmb)
+                key = tuple(generic_str if sv in cmb else dai_str for sv, dai_str, generic_str in items)
                 try:
-                    gda, tpls = self.gtemplates[unicode(generic_da)]
-                    tpl = self.random_select(tpls)
+                    gda, tpls = gtemplates[key]
                 except KeyError:
                     continue
-                return tpl, gda
+                return self.random_select(tpls), gda
 
         # I did not find anything
         raise TemplateNLGException("No match with generic templates.")
@@ -215,6 +246,43 @@ class AbstractTemplateNLG(object):
         else:
             raise TemplateNLGException("Unsupported generation type.")
 
+    def get_alternatives(self, tpl):
+        """\
+        Return a list of all the strings which random_select() may select
+        for the given template.
+        """
+        if isinstance(tpl, basestring):
+            return [tpl]
+        elif isinstance(tpl, tuple):
+            alternatives = []
+            for tpl_rc_or in tpl:
+                if isinstance(tpl_rc_or, basestring):
+                    alternatives.append(tpl_rc_or)
+                elif isinstance(tpl_rc_or, list):
+                    for tpl_rc_and in itertools.product(*[self.get_alternatives(t) for t in tpl_rc_or]):
+                        alternatives.append(u" ".join(tpl_rc_and).replace(u'  ', u' '))
+                else:
+                    raise TemplateNLGException("Unsupported generation type: template = %s" % unicode(tpl))
+            return alternatives
+        else:
+            raise TemplateNLGException("Unsupported generation type: template = %s" % unicode(tpl))
+
+    def precompile(self):
+        """\
+        Prepare the generation of all the templates in advance and return
+        the list of (dialogue act, text) of all the possible outputs for
+        the concrete dialogue acts (those without generic values), e.g.
+        to synthesize them before the first call.
+        """
+        utterances = []
+        for da_str, tpl in sorted(self.templates.iteritems()):
+            da = DialogueAct(da_str)
+            if da_str == 'irepeat()' or any(dai.value and dai.value.startswith('{') for dai in da):
+                continue
+            for text in self.get_alternatives(tpl):
+                utterances.append((da_str, text))
+        return utterances
+
     def match_and_fill_generic(self, da, svs):
         """\
         Match a generic template and fill in the proper values for the slots
@@ -436,6 +504,9 @@ class TemplateNLGPostprocessing(object):
 class TectoTemplateNLG(AbstractTemplateNLG):
     """\
     Template generation using tecto-trees and NLG rules.
+
+    Besides the templates and the scenario, the TectoTemplate configuration
+    may set 'cache_size' and 'compile' for the scenario (see Scenario).
     """
 
     def __init__(self, cfg):
@@ -458,11 +529,23 @@ class TectoTemplateNLG(AbstractTemplateNLG):
         self.nlg_rules = Scenario(mycfg)
         self.nlg_rules.load_blocks()
 
+    def precompile(self):
+        """\
+        Parse all the generic tecto-templates in advance (if the scenario
+        is compiled, see Scenario.parse_template) and return the outputs
+        for the concrete dialogue acts (see AbstractTemplateNLG.precompile).
+        """
+        if self.nlg_rules.compile:
+            for da_str, tpl in sorted(self.templates.iteritems()):
+                if '{' in da_str:
+                    for text in self.get_alternatives(tpl):
+                        self.nlg_rules.parse_template(unicode(text))
+        return super(TectoTemplateNLG, self).precompile()
+
     def fill_in_template(self, tpl, svs):
         """\
         Filling in tecto-templates, i.e. filling-in strings to templates
         and using rules to generate the result.
         """
         tpl = unicode(tpl)
-        filled_tpl = tpl.format(**dict(svs))
-        return self.nlg_rules.apply_to(filled_tpl)
+        return self.nlg_rules.apply_to_template(tpl, dict(svs))
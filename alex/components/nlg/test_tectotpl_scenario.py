@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+if __name__ == "__main__":
+    import autopath
+import __init__
+
+from alex.components.nlg.tectotpl.block.t2a.cs.generatewordforms import GenerateWordForms
+from alex.components.nlg.tectotpl.core.run import Scenario
+from alex.components.nlg.tectotpl.tool.ml.dataset import DataSet
+from alex.components.nlg.tectotpl.tool.ml.model import Model
+from alex.utils.config import as_project_path
+from sklearn.feature_extraction import DictVectorizer
+from sklearn.feature_selection import SelectKBest, chi2
+from sklearn.linear_model import LogisticRegression
+
+# the scenario of test_tectotpl.py, the tests below do not need the word form generation model to be downloaded
+CONFIG_DICT = {
+    'NLG': {
+        'debug': True,
+        'type': 'TectoTemplate',
+        'TectoTemplate': {
+            'model': as_project_path('applications/TectoTplTest/nlgtemplates.cfg'),
+            'scenario': [
+                {'block': 'read.TectoTemplates', 'args': {'encoding': None}},
+                {'block': 't2a.CopyTTree'},
+                {'block': 't2a.cs.ReverseNumberNounDependency'},
+                {'block': 't2a.cs.InitMorphcat'},
+                {'block': 't2a.cs.GeneratePossessiveAdjectives'},
+                {'block': 't2a.cs.MarkSubject'},
+                {'block': 't2a.cs.ImposePronZAgr'},
+                {'block': 't2a.cs.ImposeRelPronAgr'},
+                {'block': 't2a.cs.ImposeSubjPredAgr'},
+                {'block': 't2a.cs.ImposeAttrAgr'},
+                {'block': 't2a.cs.ImposeComplAgr'},
+                {'block': 't2a.cs.DropSubjPersProns'},
+                {'block': 't2a.cs.AddPrepositions'},
+                {'block': 't2a.cs.AddSubconjs'},
+                {'block': 't2a.cs.GenerateWordForms', 'args': {'model': 'flect/model-t253-l1_10_00001-alex.pickle.gz'}},
+                {'block': 't2a.cs.VocalizePrepos'},
+                {'block': 't2a.cs.CapitalizeSentStart'},
+                {'block': 'a2w.cs.ConcatenateTokens'},
+                {'block': 'a2w.cs.RemoveRepeatedTokens'},
+            ],
+            'global_args': {'language': 'cs', 'selector': ''},
+            'data_dir': as_project_path('applications/TectoTplTest/data/'),
+        },
+    }
+}
+
+
+class TestScenario(unittest.TestCase):
+
+    def get_scenario(self, **kwargs):
+        """\
+        Load the scenario from the configuration, replacing the word form
+        generation (which needs a model to be downloaded) with copying lemmas.
+        """
+        config = dict(CONFIG_DICT['NLG']['TectoTemplate'], **kwargs)
+        config['scenario'] = [block if block['block'] != 't2a.cs.GenerateWordForms'
+                              else {'block': 'util.Eval',
+                                    'args': {'anode': 'anode.form = anode.lemma'}}
+                              for block in config['scenario']]
+        scenario = Scenario(config)
+        scenario.load_blocks()
+        return scenario
+
+    def test_compiled_scenario(self):
+        scenario = self.get_scenario()
+        compiled = self.get_scenario(compile=True, cache_size=10)
+
+        self.assertIn('FusedBlocks', [block.__class__.__name__ for block in compiled.compiled_blocks])
+
+        templates = ['Dobře, takže hledáte nějaký [[{pricerange}|adj:attr] podnik|n:4|gender:inan,number:sg] '
+                     '[[{food}|adj:attr] jídlo|n:s+7|gender:neut,number:sg].',
+                     '{food} a {pricerange} [v [{food}|n:poss] domě|n:v+6]\n[{{food}}|n:1] je [tam|adv].',
+                     # a placeholder out of the t-lemmas
+                     '[{food}|n:{pricerange}] x']
+        # values which cannot be filled in to the parsed templates are included
+        values = ['levný', 'Jiří', '', ' a', 'x|y', '[z]', 'a\nb']
+
+        def apply_to(method, *args):
+            # some of the values make the templates invalid
+            try:
+                return method(*args)
+            except Exception as e:
+                return e.__class__
+
+        for template in templates:
+            for pricerange in values:
+                for food in values:
+                    svs = {'pricerange': pricerange, 'food': food}
+                    self.assertEqual(apply_to(compiled.apply_to_template, template, svs),
+                                     apply_to(scenario.apply_to, template.format(**svs)))
+
+        self.assertIsNone(compiled.parsed_templates[templates[2]])
+        self.assertEqual(len(compiled.results), 10)
+
+
+class TestGenerateWordForms(unittest.TestCase):
+
+    def train_model(self):
+        """\
+        Train a small inflection model on synthetic data (the real one
+        needs to be downloaded).
+        """
+        lemmas = ['hrad', 'žena', 'město', 'jídlo', 'podnik', 'Anděl', 'dobrý',
+                  'levný', 'Jiří', 'ulice', 'kámen', 'moře']
+        endings = {'1': '', '2': '>1u', '3': '>0u', '4': '>1ou', '6': '>0ě',
+                   '7': '>0em'}
+        data = []
+        for lemma in lemmas:
+            for case, ending in sorted(endings.items()):
+                for number in 'SP':
+                    inst = {'Lemma': lemma, 'Tag_Cas': case, 'Tag_Num': number,
+                            'Inflection': ending if number == 'S' else '>0y'}
+                    for suff_len in xrange(1, 4):
+                        inst['LemmaSuff_' + str(suff_len)] = lemma[-suff_len:]
+                    data.append(inst)
+        train = DataSet()
+        train.load_from_dict(data)
+        model = Model({'class_attr': 'Inflection',
+                       'select_attr': ['Lemma', 'Tag_Cas', 'Tag_Num',
+                                       'LemmaSuff_1', 'LemmaSuff_2',
+                                       'LemmaSuff_3'],
+                       'filter_attr': lambda key, val: key != 'Lemma',
+                       'vectorizer': DictVectorizer(),
+                       'feature_filter': SelectKBest(chi2, k=20),
+                       'classifier_class': LogisticRegression})
+        model.train_on_data(train)
+        return model, data
+
+    def get_block(self, scenario):
+        return [block for block in scenario.blocks
+                if isinstance(block, GenerateWordForms)][0]
+
+    def test_compiled_features(self):
+        model, data = self.train_model()
+        instances = data + [{'Lemma': 'nový', 'Tag_Cas': '5', 'Tag_Num': 'S',
+                             'Tag_POS': 'N', 'LemmaSuff_1': 'ý'},
+                            {'Tag_Cas': 2}]
+        expected = model.classify(instances)
+
+        self.assertTrue(model.compile_features())
+        self.assertEqual(model.classify(instances), expected)
+        self.assertEqual(model.classify(instances[0]), expected[0])
+
+    def test_generate_word_forms(self):
+        model, _ = self.train_model()
+        model_dir = tempfile.mkdtemp()
+        try:
+            model_file = os.path.join(model_dir, 'model.pickle.gz')
+            model.save_to_file(model_file)
+            config = dict(CONFIG_DICT['NLG']['TectoTemplate'])
+            config['scenario'] = [block if block['block'] != 't2a.cs.GenerateWordForms'
+                                  else {'block': 't2a.cs.GenerateWordForms',
+                                        'args': {'model': model_file}}
+                                  for block in config['scenario']]
+            scenario = Scenario(config)
+            scenario.load_blocks()
+            block = self.get_block(scenario)
+            self.assertIsNotNone(block.model.feature_index)
+
+            # reference: uncompiled features and no cache
+            reference = Scenario(config)
+            reference.load_blocks()
+            self.get_block(reference).cache_size = 0
+            self.get_block(reference).model.feature_index = None
+        finally:
+            shutil.rmtree(model_dir)
+
+        sentences = ['[[levný|adj:attr] podnik|n:4|gender:inan,number:sg] '
+                     '[[dobrý|adj:attr] jídlo|n:s+7|gender:neut,number:sg].',
+                     '[Jiří|n:1] je [v [Anděl|n:poss] domě|n:v+6].',
+                     '[ulice|n:2|number:pl] a [kámen|n:4|gender:inan,number:sg].']
+        # all sentences in one document and each of them separately
+        text = '\n'.join(sentences)
+        self.assertEqual(scenario.apply_to(text), reference.apply_to(text))
+        self.assertEqual([scenario.apply_to(sentence) for sentence in sentences],
+                         [reference.apply_to(sentence) for sentence in sentences])
+        self.assertTrue(block.cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import itertools
+import random
 import unittest
 
 if __name__ == "__main__":
@@ -9,6 +11,7 @@ if __name__ == "__main__":
 import __init__
 
 from alex.components.slu.da import DialogueAct
+from alex.components.nlg.exceptions import TemplateNLGException
 from alex.components.nlg.template import TemplateNLG
 from alex.utils.config import Config, as_project_path
 
@@ -73,5 +76,69 @@ class TestTemplateNLG(unittest.TestCase):
 
         self.assertEqual(unicode(correct_text), unicode(generated_text))
 
+    def test_match_generic_templates(self):
+        nlg = TemplateNLG(self.cfg)
+
+        def reference_match_generic_templates(da, svs):
+            # builds the generic dialogue acts as the matching did before the templates were indexed
+            rng = [1, 2][:len(svs)] if len(svs) <= 2 else [1, len(svs) - 1, len(svs)]
+            for r in rng:
+                for cmb in itertools.combinations(svs, r):
+                    try:
+                        gda, tpls = nlg.gtemplates[unicode(nlg.get_generic_da_given_svs(da, cmb))]
+                    except KeyError:
+                        continue
+                    return nlg.random_select(tpls), gda
+            raise TemplateNLGException("No match with generic templates.")
+
+        def match(match_generic_templates, da):
+            try:
+                tpl, gda = match_generic_templates(da, da.get_slots_and_values())
+                return tpl, unicode(gda)
+            except TemplateNLGException:
+                return None
+
+        # the template DAs with generic values filled in, some of them concatenated
+        rng = random.Random(0)
+        values = ['Anděl', 'Zličín', '22', 'bus', 'true', '10:22']
+        das = [DialogueAct(k.replace('"{', '"X{')) for k in nlg.templates if '{' in k]
+        das += [DialogueAct('&'.join(unicode(rng.choice(das)) for j in range(rng.randint(2, 4)))) for i in range(200)]
+        for da in das:
+            for dai in da:
+                if dai.value and dai.value.startswith('X{'):
+                    dai.value = rng.choice(values)
+
+            random.seed(1)
+            expected = match(reference_match_generic_templates, da)
+            random.seed(1)
+            self.assertEqual(match(nlg.match_generic_templates, da), expected, unicode(da))
+
+        da = DialogueAct('inform(vehicle=tram)&inform(line=22)&inform(departure_time=10:22)&inform(enter_at=Anděl)'
+                         '&inform(headsign=Bílá Hora)&inform(exit_at=Malostranská)&inform(transfer=true)'
+                         '&inform(vehicle=bus)&inform(line=176)&inform(departure_time=10:40)'
+                         '&inform(headsign=Karlovo náměstí)&inform(exit_at=Národní divadlo)')
+        self.assertEqual(nlg.generate(da), "Jeďte tram číslo 22 v 10:22 ze zastávky Anděl směrem Bílá Hora. "
+                                           "Na zastávce Malostranská přestupte na autobus číslo 176, "
+                                           "který jede v 10:40 směrem Karlovo náměstí. "
+                                           "Vystupte na zastávce Národní divadlo.")
+
+    def test_precompile(self):
+        nlg = TemplateNLG(self.cfg)
+
+        self.assertEqual(nlg.get_alternatives(("A", ["B", ("C", "D"), "E"], "F")), ["A", "B C E", "B D E", "F"])
+
+        utterances = {}
+        for da, text in nlg.precompile():
+            utterances.setdefault(da, set()).add(text)
+
+        self.assertNotIn('say(text={text})', utterances)
+        self.assertEqual(utterances['bye()'], set(['Na shledanou.', 'Děkujeme za zavolání. Na shledanou.']))
+
+        # all the outputs of the concrete dialogue acts are precompiled
+        random.seed(0)
+        for da in utterances:
+            for i in range(20):
+                self.assertIn(nlg.generate(DialogueAct(da)), utterances[da], da)
+
 if __name__ == '__main__':
     unittest.main()
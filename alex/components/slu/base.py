@@ -4,6 +4,8 @@
 # http://www.python.org/dev/peps/pep-0008.
 
 import copy
+import gc
+import os
 
 from collections import defaultdict, namedtuple
 from itertools import product
@@ -12,6 +14,7 @@ from alex.components.asr.utterance import AbstractedUtterance, Utterance, \
     UtteranceConfusionNetwork, UtteranceHyp, UtteranceNBList, \
     UtteranceFeatures, UtteranceNBListFeatures, \
     UtteranceConfusionNetworkFeatures
+from alex.components.slu.cldbsnapshot import CLDBSnapshot, snapshot_file_name, write_snapshot
 from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, merge_slu_confnets
 from alex.components.slu.exceptions import SLUException
 from alex.utils.config import load_as_module
@@ -40,15 +43,33 @@ class CategoryLabelDatabase(object):
 
        - instead of testing all surface forms from the CLDB from the longest to the shortest in the utterance, we test
          all the substrings in the utterance from the longest to the shortest
+       - the substrings are tested by walking a word level trie of all the surface forms, see find_forms()
 
+    Snapshots
+    ---------
+
+    If snapshot_dir is given, a compiled snapshot of the database is stored in it when the database is loaded from
+    a file, and the next time the snapshot is loaded instead of the database.py module, see cldbsnapshot. The snapshot
+    is used only until the database file or any other file in its directory changes. Note that the code of
+    the database module is not executed when the snapshot is used, e.g. it does not check for updates of its data files
+    with online_update(). Therefore the snapshots are disabled by default, see SLU['cldb_snapshot_dir'].
+
+    When loaded from a snapshot, find_forms() works directly with the snapshot and the other attributes, e.g.
+    database or form2value2cl, are built on the first access.
 
     """
-    def __init__(self, file_name=None):
+    derived_attributes = ['database', 'synonym_value_category', 'forms', 'form_value_cl', 'form2value2cl', 'form_trie']
+
+    def __init__(self, file_name=None, snapshot_dir=None):
         self.database = {}
         self.synonym_value_category = []
         self.forms = []
         self.form_value_cl = []
         self.form2value2cl = nesteddict()
+        self.form_trie = {}
+
+        self.snapshot_dir = snapshot_dir
+        self.snapshot = None
 
         if file_name:
             self.load(file_name)
@@ -57,6 +78,13 @@ class CategoryLabelDatabase(object):
         self._form_val_upname = None
         self._form_upnames_vals = None
 
+    def __getattr__(self, name):
+        # called only for the attributes which are missing, i.e. not built yet after loading a snapshot
+        if name in CategoryLabelDatabase.derived_attributes and self.__dict__.get('snapshot') is not None:
+            self.load_snapshot_database()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
     def __iter__(self):
         """Yields tuples (form, value, category) from the database."""
         for tup in self.synonym_value_category:
@@ -89,20 +117,67 @@ class CategoryLabelDatabase(object):
         return self._form_upnames_vals
 
     def load(self, file_name=None, db_mod=None):
+        self.snapshot = None
+        self._form_val_upname = None
+        self._form_upnames_vals = None
+
+        snapshot_fname = None
+        if not db_mod and self.snapshot_dir:
+            snapshot_fname = snapshot_file_name(self.snapshot_dir, file_name)
+            if os.path.exists(snapshot_fname):
+                self.snapshot = CLDBSnapshot(snapshot_fname)
+                for name in CategoryLabelDatabase.derived_attributes:
+                    self.__dict__.pop(name, None)
+                return
+
         if not db_mod:
             db_mod = load_as_module(file_name, force=True)
             if not hasattr(db_mod, 'database'):
                 raise SLUException("The category label database does not define the `database' object!")
         self.database = db_mod.database
 
-        self.normalise_database()
-        # Update derived data structures.
+        # The structures are built from hundreds of thousands of small objects, the garbage collector would only
+        # repeatedly traverse them.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.normalise_database()
+            self.gen_derived_data()
+
+            if snapshot_fname:
+                try:
+                    write_snapshot(snapshot_fname, self.database, db_mod.database)
+                except (IOError, OSError, ValueError):
+                    # the snapshot only speeds up the next load
+                    pass
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def load_snapshot_database(self):
+        """Builds the database and the derived data structures from the loaded snapshot."""
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.database = self.snapshot.database()
+            self.gen_derived_data()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        self.snapshot = None
+
+    def gen_derived_data(self):
+        """Generates all the data structures derived from the normalised database."""
+        self.synonym_value_category = []
+        self.forms = []
+        self.form_value_cl = []
+        self.form2value2cl = nesteddict()
+
         self.gen_synonym_value_category()
         self.gen_form_value_cl_list()
         self.gen_mapping_form2value2cl()
-
-        self._form_val_upname = None
-        self._form_upnames_vals = None
+        self.gen_form_trie()
 
     def normalise_database(self):
         """Normalise database. E.g., split utterances into sequences of words.
@@ -154,6 +229,65 @@ class CategoryLabelDatabase(object):
 
         self.forms.sort(key=lambda f: len(f), reverse=True)
 
+    def gen_form_trie(self):
+        """
+        Generates a word level trie of all surface forms. Each node is a dictionary mapping the next word to the child
+        node. The key None marks the end of a surface form and it holds the form.
+
+        :return: none
+        """
+        self.form_trie = {}
+
+        for form in self.form2value2cl:
+            if not form:
+                continue
+
+            node = self.form_trie
+            for word in form:
+                node = node.setdefault(word, {})
+            node[None] = form
+
+    def find_forms(self, utterance):
+        """
+        Finds the surface forms from the database in the utterance.
+
+        The utterance is scanned from left to right. At each position, the longest surface form starting there is
+        matched and the scan continues after its end. If there is no such surface form, the scan continues at the next
+        word. This is the same as testing all the substrings starting at the position from the longest to
+        the shortest, however, only the words on the path in the trie are looked at.
+
+        :param utterance: a sequence of words, e.g. an Utterance instance
+        :return: a list of (start, end, form, value2cl) tuples, where utterance[start:end] is the form
+                 and value2cl is form2value2cl[form], i.e. a mapping value -> category label -> 1
+        """
+        if self.snapshot is not None:
+            return self.snapshot.find_forms(utterance)
+
+        matches = []
+
+        words = utterance[:]
+        n = len(words)
+        start = 0
+        while start < n:
+            node = self.form_trie
+            form = None
+            i = start
+            while i < n:
+                node = node.get(words[i])
+                if node is None:
+                    break
+                i += 1
+                if None in node:
+                    form, end = node[None], i
+
+            if form is None:
+                start += 1
+            else:
+                matches.append((start, end, form, self.form2value2cl[form]))
+                start = end
+
+        return matches
+
 
 class SLUPreprocessing(object):
     """Implements preprocessing of utterances or utterances and dialogue acts.
@@ -289,10 +423,54 @@ class SLUInterface(object):
         # TODO Document.
         raise SLUException("Not implemented")
 
+    def get_parse_key(self, utterance):
+        """
+        Returns a key identifying the parse of the utterance. The utterances with the same key must be parsed by
+        the parse_1_best method into the same dialogue act confusion network.
+
+        The default key is the normalised utterance since the parsers work only with the normalised input. The parsers
+        which use the original utterance should override this method.
+
+        :param utterance: an Utterance instance
+        :return: a hashable key
+        """
+        if not self.preprocessing:
+            return tuple(utterance)
+
+        # the normalisation may change the utterance in place
+        return tuple(self.preprocessing.normalise_utterance(Utterance(' '.join(utterance))))
+
+    def parse_1_best_batch(self, obs, utterances, *args, **kwargs):
+        """
+        Parses several utterances using the parse_1_best method. The parsers that can share some work among
+        the utterances should override it.
+
+        Arguments:
+            obs -- a dictionary of observations without the utterance
+            utterances -- a list of utterances to be parsed
+            args -- further positional arguments that should be passed to the
+                `parse_1_best' method call
+            kwargs -- further keyword arguments that should be passed to the
+                `parse_1_best' method call
+
+        Returns a list of dialogue act confusion networks, one for each utterance.
+
+        """
+        dacns = []
+        for utt in utterances:
+            obs_utt = dict(obs)
+            obs_utt['utt'] = utt
+            dacns.append(self.parse_1_best(obs_utt, *args, **kwargs))
+
+        return dacns
+
     def parse_nblist(self, obs, *args, **kwargs):
         """
         Parses an observation featuring an utterance n-best list using the
-        parse_1_best method.
+        parse_1_best_batch method.
+
+        The hypotheses with the same parse key (see get_parse_key) are parsed
+        only once and their probabilities are summed.
 
         Arguments:
             obs -- a dictionary of observations
@@ -310,21 +488,43 @@ class SLUInterface(object):
         if len(nblist) == 0:
             return DialogueActConfusionNetwork()
 
-        obs_wo_nblist = copy.deepcopy(obs)
+        obs_wo_nblist = dict(obs)
         del obs_wo_nblist['utt_nbl']
-        dacn_list = []
+
+        # the parse keys in the order of their first occurrence
+        keys = []
+        key_probs = {}
+        key_utts = {}
         for prob, utt in nblist:
-            if "_other_" == utt:
+            if "_other_" == utt or "_silence_" == utt:
+                key = unicode(utt)
+            else:
+                key = self.get_parse_key(utt)
+
+            if key in key_probs:
+                key_probs[key] += prob
+            else:
+                keys.append(key)
+                key_probs[key] = prob
+                key_utts[key] = utt
+
+        parsed_keys = [key for key in keys if key not in ("_other_", "_silence_")]
+        dacns = dict(zip(parsed_keys,
+                         self.parse_1_best_batch(obs_wo_nblist, [key_utts[key] for key in parsed_keys],
+                                                 *args, **kwargs)))
+
+        dacn_list = []
+        for key in keys:
+            if key == "_other_":
                 dacn = DialogueActConfusionNetwork()
                 dacn.add(1.0, DialogueActItem("other"))
-            elif "_silence_" == utt:
+            elif key == "_silence_":
                 dacn = DialogueActConfusionNetwork()
                 dacn.add(1.0, DialogueActItem("silence"))
             else:
-                obs_wo_nblist['utt'] = utt
-                dacn = self.parse_1_best(obs_wo_nblist, *args, **kwargs)
+                dacn = dacns[key]
 
-            dacn_list.append((prob, dacn))
+            dacn_list.append((key_probs[key], dacn))
 
         dacn = merge_slu_confnets(dacn_list)
         dacn.prune()
@@ -353,7 +553,7 @@ class SLUInterface(object):
 
         # Separate the confnet from the observations.
         confnet = obs['utt_cn']
-        obs_wo_cn = copy.deepcopy(obs)
+        obs_wo_cn = dict(obs)
         del obs_wo_cn['utt_cn']
 
         # Generate the n-best list from the confnet.
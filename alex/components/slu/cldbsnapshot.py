@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A compiled binary snapshot of a category label database.
+
+Loading a database.py module and building the derived data structures of CategoryLabelDatabase takes several seconds
+for the large databases, e.g. the Czech PTI database with all the stops and cities. The snapshot stores the database
+and a word level trie of its surface forms as flat integer arrays plus a table of all strings. It is loaded by
+memory mapping the file, so the arrays are not copied and the SLU processes on one machine share their pages.
+Only the string table is decoded when the snapshot is loaded.
+
+The snapshot file is named after a hash of the source file and of the names, sizes and modification times of the
+files in its directory (the database modules usually read lists of stops, cities, etc. stored next to them).
+Therefore, it is not used once the database changes, and a new one is written instead.
+
+The layout of the file is:
+
+  - MAGIC
+  - the length of the header (a little endian 32 bit integer)
+  - the header: a marshalled dictionary mapping the names of the arrays to (offset, length)
+  - the arrays aligned to 8 bytes
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+
+from itertools import izip
+
+import numpy as np
+
+from alex.utils.various import nesteddict
+
+MAGIC = b'ALEX-CLDB-SNAPSHOT-1\n'
+HEADER_LENGTH = struct.Struct(b'<I')
+
+
+def snapshot_key(file_name):
+    """Returns a hash of the database source file and of the other files in its directory."""
+    file_name = os.path.abspath(file_name)
+    dir_name = os.path.dirname(file_name)
+
+    h = hashlib.sha1(MAGIC)
+    with open(file_name, 'rb') as f:
+        h.update(f.read())
+
+    for name in sorted(os.listdir(dir_name)):
+        path = os.path.join(dir_name, name)
+        if name.endswith(('.pyc', '.pyo')) or path == file_name or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        h.update(repr((name, st.st_size, st.st_mtime)))
+
+    return h.hexdigest()
+
+
+def snapshot_file_name(snapshot_dir, file_name):
+    """Returns the name of the snapshot of the given database file."""
+    file_name = os.path.abspath(file_name)
+    prefix = 'cldb_' + hashlib.sha1(file_name).hexdigest()[:8] + '_'
+
+    return os.path.join(os.path.expanduser(snapshot_dir), prefix + snapshot_key(file_name) + '.snapshot')
+
+
+class StringTable(dict):
+    """Maps strings to their indices in the list of all the added strings."""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.strings = []
+
+    def __missing__(self, s):
+        if not isinstance(s, basestring) or '\n' in s:
+            raise ValueError('Cannot store %r in a CLDB snapshot.' % (s, ))
+        self[s] = len(self.strings)
+        self.strings.append(s)
+        return self[s]
+
+
+def write_snapshot(snapshot_fname, database, order):
+    """Writes the snapshot of a normalised database.
+
+    :param snapshot_fname: the name of the snapshot file
+    :param database: the normalised database, i.e. a mapping category label -> value -> a list of forms (word tuples)
+    :param order: the original database before the normalisation, its iteration order is stored in the snapshot
+                  so that the database is restored exactly
+    :raise ValueError: if the database contains something else than strings
+    """
+    strings = StringTable()
+
+    forms = []
+    form_entries = []
+
+    class FormTable(dict):
+        def __missing__(self, form):
+            self[form] = len(forms)
+            forms.append([strings[w] for w in form])
+            form_entries.append([])
+            return self[form]
+
+    form_ids = FormTable()
+
+    # the database in the order of insertion into the normalised database
+    db_name, db_name_ptr, db_value, db_value_ptr, db_form = [], [0], [], [0], []
+    for name in order:
+        db_name.append(strings[name])
+        for value in order[name]:
+            db_value.append(strings[value])
+            db_form.extend(form_ids[form] for form in database[name][value])
+            db_value_ptr.append(len(db_form))
+        db_name_ptr.append(len(db_value))
+
+    # the (value, category label) pairs of every form in the order of insertion into form2value2cl
+    for name in database:
+        for value in database[name]:
+            for form in database[name][value]:
+                form_entries[form_ids[form]].append((strings[value], strings[name]))
+
+    # the trie, the children of every node are sorted by the word ids
+    children = [{}]
+    node_form = [-1]
+    for i, form in enumerate(forms):
+        if not form:
+            continue
+        node = 0
+        for w in form:
+            if w not in children[node]:
+                children[node][w] = len(children)
+                children.append({})
+                node_form.append(-1)
+            node = children[node][w]
+        node_form[node] = i
+
+    node_child_ptr, child_word, child_node = [0], [], []
+    for c in children:
+        for w in sorted(c):
+            child_word.append(w)
+            child_node.append(c[w])
+        node_child_ptr.append(len(child_word))
+
+    def ptr(lists):
+        p = [0]
+        for l in lists:
+            p.append(p[-1] + len(l))
+        return p
+
+    is_unicode = [isinstance(s, unicode) for s in strings.strings]
+    string_data = u'\n'.join(s if u else s.decode('utf-8') for s, u in izip(strings.strings, is_unicode))
+
+    arrays = [
+        ('strings', np.frombuffer(string_data.encode('utf-8'), dtype=np.uint8)),
+        ('string_is_unicode', np.array(is_unicode, dtype=np.uint8)),
+        ('db_name', db_name),
+        ('db_name_ptr', db_name_ptr),
+        ('db_value', db_value),
+        ('db_value_ptr', db_value_ptr),
+        ('db_form', db_form),
+        ('form_ptr', ptr(forms)),
+        ('form_words', [w for f in forms for w in f]),
+        ('form_entry_ptr', ptr(form_entries)),
+        ('entry_value', [v for e in form_entries for v, c in e]),
+        ('entry_label', [c for e in form_entries for v, c in e]),
+        ('node_child_ptr', node_child_ptr),
+        ('child_word', child_word),
+        ('child_node', child_node),
+        ('node_form', node_form),
+    ]
+
+    header = {}
+    data = []
+    offset = 0
+    for name, a in arrays:
+        a = np.asarray(a, dtype=a.dtype if isinstance(a, np.ndarray) else np.int32)
+        header[name] = (offset, len(a))
+        b = a.tostring()
+        data.append(b + b'\0' * (-len(b) % 8))
+        offset += len(data[-1])
+
+    header = marshal.dumps(header)
+    header += b' ' * (-(len(MAGIC) + HEADER_LENGTH.size + len(header)) % 8)
+
+    snapshot_dir = os.path.dirname(snapshot_fname)
+    if not os.path.isdir(snapshot_dir):
+        os.makedirs(snapshot_dir)
+
+    # write into a temporary file first so that the other processes never read an incomplete snapshot
+    fd, tmp_fname = tempfile.mkstemp(dir=snapshot_dir, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            for b in data:
+                f.write(b)
+        os.rename(tmp_fname, snapshot_fname)
+    except:
+        os.remove(tmp_fname)
+        raise
+
+    # remove the outdated snapshots of the same database
+    prefix = os.path.basename(snapshot_fname).rsplit('_', 1)[0] + '_'
+    for name in os.listdir(snapshot_dir):
+        if name.startswith(prefix) and name != os.path.basename(snapshot_fname):
+            try:
+                os.remove(os.path.join(snapshot_dir, name))
+            except OSError:
+                pass
+
+
+class CLDBSnapshot(object):
+    """ A category label database loaded from a snapshot file.
+
+    It finds the surface forms in utterances directly in the memory mapped trie. The database itself is restored
+    by database() only when it is needed.
+    """
+
+    def __init__(self, snapshot_fname):
+        with open(snapshot_fname, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is not a CLDB snapshot.' % snapshot_fname)
+
+        header_start = len(MAGIC) + HEADER_LENGTH.size
+        header_length, = HEADER_LENGTH.unpack(self.mmap[len(MAGIC):header_start])
+        data_start = header_start + header_length
+        header = marshal.loads(self.mmap[header_start:data_start])
+
+        for name, (offset, length) in header.iteritems():
+            dtype = np.uint8 if name in ('strings', 'string_is_unicode') else np.int32
+            setattr(self, name, np.frombuffer(self.mmap, dtype=dtype, count=length, offset=data_start + offset))
+
+        self.strings = self.strings.tostring().decode('utf-8').split(u'\n')
+        for i in np.flatnonzero(self.string_is_unicode == 0):
+            self.strings[i] = self.strings[i].encode('utf-8')
+
+        # the decoded nodes of the trie, only the visited nodes are decoded
+        self.nodes = {}
+        self.root = self.node(0)
+
+        # (form, form2value2cl[form]) of the found forms
+        self.form_cache = {}
+
+    def form(self, i):
+        return tuple(self.strings[w] for w in self.form_words[self.form_ptr[i]:self.form_ptr[i + 1]].tolist())
+
+    def form_value2cl(self, i):
+        """Returns the i-th form and form2value2cl[form]."""
+        try:
+            return self.form_cache[i]
+        except KeyError:
+            value2cl = nesteddict()
+            start, end = self.form_entry_ptr[i], self.form_entry_ptr[i + 1]
+            for v, c in izip(self.entry_value[start:end].tolist(), self.entry_label[start:end].tolist()):
+                value2cl[self.strings[v]][self.strings[c]] = 1
+            self.form_cache[i] = self.form(i), value2cl
+            return self.form_cache[i]
+
+    def node(self, i):
+        """Returns the i-th node of the trie in the same format as CategoryLabelDatabase.form_trie, except that
+        the words are mapped to the indices of the child nodes and None is mapped to the index of the form."""
+        try:
+            return self.nodes[i]
+        except KeyError:
+            start, end = self.node_child_ptr[i], self.node_child_ptr[i + 1]
+            node = dict(izip((self.strings[w] for w in self.child_word[start:end].tolist()),
+                             self.child_node[start:end].tolist()))
+            if self.node_form[i] >= 0:
+                node[None] = int(self.node_form[i])
+            self.nodes[i] = node
+            return node
+
+    def find_forms(self, utterance):
+        """The same as CategoryLabelDatabase.find_forms()."""
+        matches = []
+
+        words = utterance[:]
+        n = len(words)
+        start = 0
+        while start < n:
+            node = self.root
+            form = None
+            i = start
+            while i < n:
+                child = node.get(words[i])
+                if child is None:
+                    break
+                node = self.node(child)
+                i += 1
+                if None in node:
+                    form, end = node[None], i
+
+            if form is None:
+                start += 1
+            else:
+                matches.append((start, end) + self.form_value2cl(form))
+                start = end
+
+        return matches
+
+    def database(self):
+        """Returns the normalised database."""
+        strings = self.strings
+        forms = [self.form(i) for i in xrange(len(self.form_ptr) - 1)]
+        db_name_ptr = self.db_name_ptr.tolist()
+        db_value = self.db_value.tolist()
+        db_value_ptr = self.db_value_ptr.tolist()
+        db_form = self.db_form.tolist()
+
+        database = dict()
+        for i, name in enumerate(self.db_name.tolist()):
+            database[strings[name]] = values = dict()
+            for j in xrange(db_name_ptr[i], db_name_ptr[i + 1]):
+                values[strings[db_value[j]]] = [forms[k] for k in db_form[db_value_ptr[j]:db_value_ptr[j + 1]]]
+
+        return database
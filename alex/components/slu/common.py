@@ -31,14 +31,16 @@ def slu_factory(cfg, slu_type=None):
     if slu_type is None:
         slu_type = get_slu_type(cfg)
 
+    snapshot_dir = cfg['SLU'].get('cldb_snapshot_dir', None)
+
     if inspect.isclass(slu_type) and issubclass(slu_type, DAILogRegClassifier):
-        cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'])
+        cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'], snapshot_dir)
         preprocessing = cfg['SLU'][slu_type]['preprocessing_cls'](cldb)
         slu = slu_type(cldb, preprocessing)
         slu.load_model(cfg['SLU'][slu_type]['model_fname'])
         return slu
     elif inspect.isclass(slu_type) and issubclass(slu_type, SLUInterface):
-        cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'])
+        cldb = CategoryLabelDatabase(cfg['SLU'][slu_type]['cldb_fname'], snapshot_dir)
         preprocessing = cfg['SLU'][slu_type]['preprocessing_cls'](cldb)
         slu = slu_type(preprocessing, cfg)
         return slu
@@ -6,7 +6,9 @@ from __future__ import unicode_literals
 
 import copy
 import codecs
+import math
 
+from itertools import islice
 from operator import xor
 from collections import defaultdict
 
@@ -15,7 +17,7 @@ from alex.components.slu.exceptions import SLUException, DialogueActException, D
     DialogueActConfusionNetworkException
 from alex.ml.exceptions import NBListException
 from alex.ml.features import Abstracted
-from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork
+from alex.ml.hypothesis import Hypothesis, NBList, ConfusionNetwork, kbest_hyp_indexes
 from alex.utils.text import split_by
 
 
@@ -842,31 +844,6 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         return prob
 
-    def _get_next_worse_candidates(self, hyp_index, cn=None):
-        """
-        Returns such hypotheses that will have lower probability.
-
-        """
-        if not cn:
-            cn = list(self)
-        worse_hyp = []
-
-        for i in range(len(hyp_index)):
-            wh = list(hyp_index)
-            wh[i] += 1
-            if cn[i][0] < 0.5 and wh[i] >= 2:
-                wh[i] = 0
-
-            if wh[i] >= 2:
-                # this generate inadmissible da hypothesis
-                # because there are only two alternatives - the DAI and the
-                # null() dialogue act
-                continue
-
-            worse_hyp.append(tuple(wh))
-
-        return worse_hyp
-
     def _get_hyp_index_dialogue_act(self, hyp_index, cn=None):
         if not cn:
             cn = self
@@ -881,78 +858,40 @@ class DialogueActConfusionNetwork(SLUHypothesis, ConfusionNetwork):
 
         return da
 
-    def get_da_nblist(self, n=10, prune_prob=0.005):
-        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
+    def iter_da_hyps(self):
+        """Generates the dialogue act hypotheses in the order of decreasing
+        probability, e.g. for a caller which needs just a few of them.
 
-        The result is a list of dialogue act hypotheses each with a with
-        assigned probability.  The list also include a dialogue act for not
-        having the correct dialogue act in the list - other().
+        Each dialogue act item is either present in the hypothesis with its
+        probability p or missing with the probability 1 - p.
 
-        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
+        :return: a generator of (probability, DialogueAct) pairs
 
         """
-
-        #print "cn", [(p, unicode(dai)) for p, dai in self.cn]
-
-        open_hyp = []
-        closed_hyp = {}
-
         cn = sorted(self, reverse=True)
 
-        for j, (p, dai) in enumerate(cn):
-            if p < 0.5:
-                i = j
-                break
-        else:
-            i = len(cn)
-
-        # create index for the best hypothesis
-        best_hyp = tuple([0,] * i + [1,] * (len(cn) - i))
-        best_prob = self._get_prob(best_hyp, cn=cn)
-        open_hyp.append((best_prob, best_hyp))
-        #print "i, bp, bh", i, best_prob, best_hyp
-
-        i = 0
-        while open_hyp and i < n*100:
-            i += 1
-
-            current_prob, current_hyp_index = open_hyp.pop(0)
-
-            if current_hyp_index not in closed_hyp:
-                # process only those hypotheses which were not processed so far
+        for logprob, hyp_index in kbest_hyp_indexes([[p, 1.0 - p] for p, dai in cn]):
+            yield math.exp(logprob), self._get_hyp_index_dialogue_act(hyp_index, cn=cn)
 
-                closed_hyp[current_hyp_index] = current_prob
-                # print "current_prob, current_hyp_index:", current_prob, current_hyp_index
-
-                for hyp_index in self._get_next_worse_candidates(current_hyp_index, cn=cn):
-                    # print hyp_index
-                    prob = self._get_prob(hyp_index, cn=cn)
-                    open_hyp.append((prob, hyp_index))
+    def get_da_nblist(self, n=10, prune_prob=0.005):
+        """Parses the input dialogue act item confusion network and generates N-best hypotheses.
 
-                open_hyp.sort(reverse=True)
+        The result is a list of dialogue act hypotheses each with a with
+        assigned probability.  The list also include a dialogue act for not
+        having the correct dialogue act in the list - other().
 
-            if len(closed_hyp) >= n:
-                break
+        Generation of hypotheses will stop when the probability of the hypotheses is smaller then the ``prune_prob``.
 
+        """
         nblist = DialogueActNBList()
-        for idx in closed_hyp:
-            # print "p = ",closed_hyp[idx], "hyp = ", self._get_hyp_index_dialogue_act(idx)
-            nblist.add(closed_hyp[idx], self._get_hyp_index_dialogue_act(idx, cn=cn))
-
-        #print nblist
-        #print
+        for prob, da in islice(self.iter_da_hyps(), n):
+            nblist.add(prob, da)
 
         nblist.merge()
         nblist.add_other()
 
-        #print nblist
-        #print
-
         return nblist
 
-
-
-
     @classmethod
     def make_from_da(self, da):
         cn = DialogueActConfusionNetwork()
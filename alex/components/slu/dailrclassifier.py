@@ -13,7 +13,7 @@ import cPickle as pickle
 
 from collections import defaultdict
 from sklearn.linear_model import LogisticRegression
-from scipy.sparse import lil_matrix
+from scipy.sparse import lil_matrix, csr_matrix
 
 from alex.components.asr.utterance import Utterance, UtteranceHyp, UtteranceNBList, UtteranceConfusionNetwork
 from alex.components.slu.exceptions import DAILRException
@@ -200,31 +200,13 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    u = copy.deepcopy(utterance)
+                    u = u.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -273,25 +255,10 @@ class DAILogRegClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -325,26 +292,13 @@ class DAILogRegClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -359,8 +313,11 @@ class DAILogRegClassifier(SLUInterface):
         #return self.get_fvc_in_utterance(nblist[0][1])
 
         fvcs = set()
+        parsed = set()
         for p, u in nblist:
-            fvcs.update(self.get_fvc_in_utterance(u))
+            if tuple(u) not in parsed:
+                parsed.add(tuple(u))
+                fvcs.update(self.get_fvc_in_utterance(u))
 
         return fvcs
 
@@ -430,8 +387,12 @@ class DAILogRegClassifier(SLUInterface):
         scale_p = [p for p, u in nblist]
         #scale_p[0] = 1.0
 
+        # the normalised hypotheses are often the same, their features are extracted only once
+        utterance_features = {}
         for i, (p, u) in enumerate(nblist):
-            feat.merge(self.get_features_in_utterance(u, fvc, fvcs), weight=scale_p[i])
+            if tuple(u) not in utterance_features:
+                utterance_features[tuple(u)] = self.get_features_in_utterance(u, fvc, fvcs)
+            feat.merge(utterance_features[tuple(u)], weight=scale_p[i])
 
         nbl_global = dict([ ("nbl_prob_{i}".format(i=i), p) for i, (p, h) in enumerate(nblist)])
         nbl_global["nbl_len"] = len(nblist)
@@ -692,6 +653,81 @@ class DAILogRegClassifier(SLUInterface):
                 print "  Prediction mean accuracy on the training data: %6.2f" % (100.0 * mean_accuracy, )
                 print "  Size of the params:", lr.coef_.shape
 
+        self.compile_model()
+
+    def compile_model(self):
+        """
+        Stacks the weights of the trained classifiers into sparse matrices so that all classifiers sharing the same
+        input can be evaluated by a single sparse matrix product.
+
+        All features of all classifiers are mapped into one global feature index. The concrete classifiers share
+        the features of the non-abstracted utterance, so their weights form one matrix. The abstracted classifiers
+        are grouped by their category label (e.g. CL_STOP) and each group gets its own matrix, which is multiplied
+        with the features of all instantiations of the category label found in the utterance.
+        """
+        self.features_index = {}
+        for clser in sorted(self.trained_classifiers):
+            for f in self.classifiers_features_mapping[clser]:
+                if f not in self.features_index:
+                    self.features_index[f] = len(self.features_index)
+
+        groups = defaultdict(list)
+        for clser in sorted(self.trained_classifiers):
+            value = self.parsed_classifiers[clser].value
+            if value and value.startswith('CL_'):
+                groups[value].append(clser)
+            else:
+                groups[None].append(clser)
+
+        self.compiled_classifiers = {}
+        for group, clsers in groups.iteritems():
+            data, rows, cols = [], [], []
+            intercepts = np.zeros(len(clsers))
+            for i, clser in enumerate(clsers):
+                lr = self.trained_classifiers[clser]
+                coef = lr.coef_[0]
+                for f, j in self.classifiers_features_mapping[clser].iteritems():
+                    if coef[j]:
+                        data.append(coef[j])
+                        rows.append(i)
+                        cols.append(self.features_index[f])
+                intercepts[i] = lr.intercept_[0]
+
+            weights = csr_matrix((data, (rows, cols)), shape=(len(clsers), len(self.features_index)))
+            self.compiled_classifiers[group] = (clsers, weights, intercepts)
+
+    def get_features_matrix(self, features_list):
+        """
+        Returns a sparse matrix with one row of features in the global feature index for each Features instance.
+
+        :param features_list: a list of Features instances
+        :return: a CSR matrix of the shape (len(features_list), len(self.features_index))
+        """
+        data, cols, indptr = [], [], [0]
+        for feat in features_list:
+            for f in feat:
+                j = self.features_index.get(f)
+                if j is not None:
+                    data.append(feat[f])
+                    cols.append(j)
+            indptr.append(len(cols))
+
+        return csr_matrix((data, cols, indptr), shape=(len(features_list), len(self.features_index)))
+
+    def predict_proba(self, group, features_list):
+        """
+        Returns the probabilities of the presence of the dialogue act items predicted by the classifiers in the group
+        for each of the features. It gives the same probabilities as predict_proba()[:, 1] of the classifiers.
+
+        :param group: a category label of the abstracted classifiers or None for the concrete classifiers
+        :param features_list: a list of Features instances
+        :return: the list of classifiers in the group and a matrix of the shape (len(features_list), len(classifiers))
+        """
+        clsers, weights, intercepts = self.compiled_classifiers[group]
+        scores = self.get_features_matrix(features_list).dot(weights.T).toarray() + intercepts
+
+        return clsers, 1.0 / (1.0 + np.exp(-scores))
+
 
     def save_model(self, file_name, gzip=None):
         data = [self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
@@ -721,6 +757,8 @@ class DAILogRegClassifier(SLUInterface):
             (self.classifiers_features_list, self.classifiers_features_mapping, self.trained_classifiers,
              self.parsed_classifiers, self.features_size) = pickle.load(model_file)
 
+        self.compile_model()
+
     def parse_X(self, utterance, verbose=False):
         if verbose:
             print '='*120
@@ -737,6 +775,27 @@ class DAILogRegClassifier(SLUInterface):
             print unicode(utterance_fvcs)
 
 
+        # evaluate all classifiers of each group at once
+        probs = {}
+        if None in self.compiled_classifiers:
+            classifiers_features = self.get_features(utterance, (None, None, None), utterance_fvcs)
+            clsers, p = self.predict_proba(None, [classifiers_features])
+            for clser, pc in zip(clsers, p[0]):
+                probs[clser, None] = pc
+
+        instantiations = defaultdict(list)
+        for f, v, c in utterance_fvcs:
+            cc = "CL_" + c.upper()
+            if cc in self.compiled_classifiers:
+                instantiations[cc].append((f, v, c))
+
+        for cc, fvcs in instantiations.iteritems():
+            classifiers_features = [self.get_features(utterance, (f, v, cc), utterance_fvcs) for f, v, c in fvcs]
+            clsers, p = self.predict_proba(cc, classifiers_features)
+            for (f, v, c), pf in zip(fvcs, p):
+                for clser, pc in zip(clsers, pf):
+                    probs[clser, (f, v, c)] = pc
+
         da_confnet = DialogueActConfusionNetwork()
         for clser in self.trained_classifiers:
             if verbose:
@@ -744,45 +803,24 @@ class DAILogRegClassifier(SLUInterface):
 
             if self.parsed_classifiers[clser].value and self.parsed_classifiers[clser].value.startswith('CL_'):
                 # process abstracted classifiers
-
                 for f, v, c in utterance_fvcs:
-                    cc = "CL_" + c.upper()
-
-                    if self.parsed_classifiers[clser].value == cc:
-                        #print clser, f, v, c
-
-                        classifiers_features = self.get_features(utterance, (f, v, cc), utterance_fvcs)
-                        classifiers_inputs = np.zeros((1, len(self.classifiers_features_mapping[clser])))
-                        classifiers_inputs[0] = classifiers_features.get_feature_vector(self.classifiers_features_mapping[clser])
-
-                        #if verbose:
-                        #    print classifiers_features
-                        #    print self.classifiers_features_mapping[clser]
-
-                        p = self.trained_classifiers[clser].predict_proba(classifiers_inputs)
+                    if (clser, (f, v, c)) in probs:
+                        p = probs[clser, (f, v, c)]
 
                         if verbose:
                             print '  Probability:', p
 
                         dai = DialogueActItem(self.parsed_classifiers[clser].dat, self.parsed_classifiers[clser].name, v)
-                        da_confnet.add_merge(p[0][1], dai, combine='max')
+                        da_confnet.add_merge(p, dai, combine='max')
             else:
                 # process concrete classifiers
-                classifiers_features = self.get_features(utterance, (None, None, None), utterance_fvcs)
-                classifiers_inputs = np.zeros((1, len(self.classifiers_features_mapping[clser])))
-                classifiers_inputs[0] = classifiers_features.get_feature_vector(self.classifiers_features_mapping[clser])
-
-                #if verbose:
-                #    print classifiers_features
-                #    print self.classifiers_features_mapping[clser]
-
-                p = self.trained_classifiers[clser].predict_proba(classifiers_inputs)
+                p = probs[clser, None]
 
                 if verbose:
                     print '  Probability:', p
 
                 dai = self.parsed_classifiers[clser]
-                da_confnet.add_merge(p[0][1], dai, combine='max')
+                da_confnet.add_merge(p, dai, combine='max')
 
         da_confnet.sort().prune()
 
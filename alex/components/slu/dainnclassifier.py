@@ -198,31 +198,13 @@ class DAINNClassifier(SLUInterface):
 
         abs_utts = []
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            u = copy.deepcopy(utterance)
-                            u = u.replace2(start, end, 'CL_' + c.upper())
-
-                            abs_utts.append((u, f, v, c))
-
-                    #print f
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    u = copy.deepcopy(utterance)
+                    u = u.replace2(start, end, 'CL_' + c.upper())
 
+                    abs_utts.append((u, f, v, c))
 
         return abs_utts
 
@@ -271,25 +253,10 @@ class DAINNClassifier(SLUInterface):
 
         abs_utt = copy.deepcopy(utterance)
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-                #print start, end
-                #print f
-
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    abs_utt = abs_utt.replace2(start, end, 'CL_OTHER_' + c.upper())
 
         return abs_utt
 
@@ -323,26 +290,13 @@ class DAINNClassifier(SLUInterface):
 
         fvcs = set()
 
-        start = 0
-        while start < len(utterance):
-            end = len(utterance)
-            while end > start:
-                f = tuple(utterance[start:end])
-
-                # this looks for an exact surface form in the CLDB
-                # however, we could also search for those withing a some distance from the exact surface form,
-                # for example using a string edit distance
-                if f in self.cldb.form2value2cl:
-                    for v in self.cldb.form2value2cl[f]:
-                        for c in self.cldb.form2value2cl[f][v]:
-                            fvcs.add((f, v, c))
-
-                    # skip all substring for this form
-                    start = end
-                    break
-                end -= 1
-            else:
-                start += 1
+        # this looks for an exact surface form in the CLDB
+        # however, we could also search for those withing a some distance from the exact surface form,
+        # for example using a string edit distance
+        for start, end, f, value2cl in self.cldb.find_forms(utterance):
+            for v in value2cl:
+                for c in value2cl[v]:
+                    fvcs.add((f, v, c))
 
         return fvcs
 
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import codecs
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from alex.components.asr.utterance import Utterance, UtteranceNBList, UtteranceConfusionNetwork
+from alex.components.slu.base import CategoryLabelDatabase, SLUInterface, SLUPreprocessing
+from alex.components.slu.da import DialogueActItem, DialogueActConfusionNetwork, merge_slu_confnets
+
+
+class TestCategoryLabelDatabase(unittest.TestCase):
+    def setUp(self):
+        class db:
+            database = {
+                "stop": {
+                    "Anděl": ["anděl", "na anděl"],
+                    "Malostranské náměstí": ["malostranské náměstí", "malostranská"],
+                    "Náměstí Míru": ["náměstí míru"],
+                },
+                "city": {
+                    "Praha": ["praha", "v praze"],
+                },
+                "time": {
+                    "now": ["teď", "v tuto chvíli"],
+                },
+                "number": {
+                    "1": ["jedna"],
+                },
+            }
+
+        self.cldb = CategoryLabelDatabase()
+        self.cldb.load(db_mod=db)
+
+    def find_forms_exhaustively(self, utterance):
+        # tests all substrings from the longest to the shortest
+        matches = []
+        start = 0
+        while start < len(utterance):
+            end = len(utterance)
+            while end > start:
+                f = tuple(utterance[start:end])
+                if f in self.cldb.form2value2cl:
+                    matches.append((start, end, f, self.cldb.form2value2cl[f]))
+                    start = end
+                    break
+                end -= 1
+            else:
+                start += 1
+
+        return matches
+
+    def test_find_forms(self):
+        utterance = Utterance("jedu na anděl v tuto chvíli a pak na malostranské náměstí míru")
+        matches = self.cldb.find_forms(utterance)
+
+        self.assertEqual([(start, end, f) for start, end, f, value2cl in matches],
+                         [(1, 3, ("na", "anděl")),
+                          (3, 6, ("v", "tuto", "chvíli")),
+                          (9, 11, ("malostranské", "náměstí"))])
+        self.assertEqual(matches[0][3], {"Anděl": {"stop": 1}})
+
+    def test_find_forms_random(self):
+        rng = random.Random(0)
+        words = "na anděl malostranské náměstí míru malostranská praha v praze teď tuto chvíli jedna a".split()
+
+        for i in range(500):
+            utterance = Utterance(" ".join(rng.choice(words) for j in range(rng.randint(0, 12))))
+            self.assertEqual(self.cldb.find_forms(utterance), self.find_forms_exhaustively(utterance))
+
+
+
+class TestCategoryLabelDatabaseSnapshot(unittest.TestCase):
+    database = """# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import codecs
+import os
+
+database = {
+    "stop": {
+        "Anděl": ["anděl", "na anděl"],
+        "Malostranské náměstí": ["malostranské náměstí", "malostranská"],
+    },
+    "city": {
+        "Praha": ["praha", "v praze"],
+    },
+    "time": {
+        "now": ["teď", "v tuto chvíli"],
+    },
+}
+
+with codecs.open(os.path.join(os.path.dirname(__file__), 'stops.txt'), encoding='utf-8') as f:
+    for line in f:
+        database["stop"].setdefault(line.strip(), []).append(line.strip().lower())
+"""
+
+    def setUp(self):
+        # load_as_module() imports the database as the module `database'
+        sys.modules.pop('database', None)
+
+        self.data_dir = tempfile.mkdtemp()
+        self.snapshot_dir = os.path.join(self.data_dir, 'snapshots')
+
+        self.db_fname = os.path.join(self.data_dir, 'database.py')
+        with codecs.open(self.db_fname, 'w', encoding='utf-8') as f:
+            f.write(self.database)
+        self.write_stops(["Náměstí Míru", "Praha"])
+
+    def tearDown(self):
+        sys.modules.pop('database', None)
+        shutil.rmtree(self.data_dir)
+
+    def write_stops(self, stops):
+        with codecs.open(os.path.join(self.data_dir, 'stops.txt'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(stops))
+
+    def snapshots(self):
+        return [f for f in os.listdir(self.snapshot_dir) if f.endswith('.snapshot')]
+
+    def test_snapshot(self):
+        cldb = CategoryLabelDatabase(self.db_fname, self.snapshot_dir)
+        self.assertIsNone(cldb.snapshot)
+        self.assertEqual(len(self.snapshots()), 1)
+
+        cldb_snapshot = CategoryLabelDatabase(self.db_fname, self.snapshot_dir)
+        self.assertIsNotNone(cldb_snapshot.snapshot)
+
+        utterance = Utterance("jedu z praha na anděl v tuto chvíli a pak na náměstí míru")
+        self.assertEqual(cldb_snapshot.find_forms(utterance), cldb.find_forms(utterance))
+
+        # the database is built on the first access
+        self.assertEqual(cldb_snapshot.database, cldb.database)
+        self.assertIsNone(cldb_snapshot.snapshot)
+        self.assertEqual(cldb_snapshot.form2value2cl, cldb.form2value2cl)
+        self.assertEqual(cldb_snapshot.form_value_cl, cldb.form_value_cl)
+        self.assertEqual(list(cldb_snapshot), list(cldb))
+        self.assertEqual(cldb_snapshot.find_forms(utterance), cldb.find_forms(utterance))
+
+    def test_snapshot_invalidation(self):
+        CategoryLabelDatabase(self.db_fname, self.snapshot_dir)
+        snapshots = self.snapshots()
+
+        # the modification times must differ
+        time.sleep(0.01)
+        self.write_stops(["Náměstí Míru", "Praha", "Hradčanská"])
+        sys.modules.pop('database', None)
+
+        cldb = CategoryLabelDatabase(self.db_fname, self.snapshot_dir)
+        self.assertIsNone(cldb.snapshot)
+        self.assertIn(("hradčanská", ), cldb.form2value2cl)
+
+        # the outdated snapshot is replaced
+        self.assertEqual(len(self.snapshots()), 1)
+        self.assertNotEqual(self.snapshots(), snapshots)
+
+        cldb = CategoryLabelDatabase(self.db_fname, self.snapshot_dir)
+        self.assertIsNotNone(cldb.snapshot)
+        self.assertEqual(cldb.find_forms(Utterance("na hradčanská"))[0][2], ("hradčanská", ))
+
+
+class CountingSLU(SLUInterface):
+    """Parses the utterances with "anděl" as inform(to_stop=Anděl) and counts the parsed utterances."""
+
+    def __init__(self, preprocessing):
+        super(CountingSLU, self).__init__(preprocessing, {})
+        self.parsed = []
+
+    def parse_1_best(self, obs):
+        utterance = self.preprocessing.normalise_utterance(obs['utt'])
+        self.parsed.append(unicode(utterance))
+
+        dacn = DialogueActConfusionNetwork()
+        if 'anděl' in utterance.utterance:
+            dacn.add(0.9, DialogueActItem('inform', 'to_stop', 'Anděl'))
+        else:
+            dacn.add(0.8, DialogueActItem('null'))
+        return dacn
+
+
+class TestSLUInterface(unittest.TestCase):
+    def setUp(self):
+        self.slu = CountingSLU(SLUPreprocessing(None))
+
+    def test_parse_nblist(self):
+        nblist = UtteranceNBList()
+        nblist.add(0.4, Utterance('na anděl'))
+        nblist.add(0.2, Utterance('Na Anděl'))
+        nblist.add(0.1, Utterance('na uhm anděl'))
+        nblist.add(0.1, Utterance('na andělu'))
+        nblist.add(0.1, Utterance('_other_'))
+        nblist.add(0.1, Utterance('_other_'))
+        obs = {'utt_nbl': nblist}
+
+        dacn = self.slu.parse_nblist(obs)
+
+        # the hypotheses are parsed once per the normalised utterance
+        self.assertEqual(self.slu.parsed, ['na anděl', 'na andělu'])
+        self.assertIn('utt_nbl', obs)
+
+        slu = CountingSLU(SLUPreprocessing(None))
+        andel = slu.parse_1_best({'utt': Utterance('na anděl')})
+        andelu = slu.parse_1_best({'utt': Utterance('na andělu')})
+        other = DialogueActConfusionNetwork()
+        other.add(1.0, DialogueActItem('other'))
+        expected = merge_slu_confnets([(0.4, andel), (0.2, andel), (0.1, andel), (0.1, andelu),
+                                       (0.1, other), (0.1, other)])
+        expected.prune()
+        expected.sort()
+
+        self.assertEqual(len(dacn), len(expected))
+        for prob, dai in expected:
+            self.assertAlmostEqual(dacn.get_prob(dai), prob)
+
+    def test_parse_confnet(self):
+        confnet = UtteranceConfusionNetwork()
+        confnet.add([[0.6, 'na'], [0.4, 'Na']])
+        confnet.add([[0.7, 'anděl'], [0.3, 'Anděl']])
+        obs = {'utt_cn': confnet}
+
+        dacn = self.slu.parse_confnet(obs)
+
+        self.assertEqual(self.slu.parsed, ['na anděl'])
+        self.assertIn('utt_cn', obs)
+        self.assertAlmostEqual(dacn.get_prob(DialogueActItem('inform', 'to_stop', 'Anděl')), 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
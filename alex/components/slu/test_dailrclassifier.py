@@ -1,5 +1,7 @@
 # encoding: utf8
 import os
+import shutil
+import tempfile
 
 from unittest import TestCase
 from alex.components.slu.dailrclassifier import DAILogRegClassifier
@@ -9,7 +11,7 @@ from alex.components.asr.utterance import Utterance, UtteranceNBList
 from alex.components.slu.da import DialogueAct, DialogueActItem
 
 class TestDAILogRegClassifier(TestCase):
-    def test_parse_X(self):
+    def train_classifier(self):
         cldb = CategoryLabelDatabase()
         class db:
             database = {
@@ -52,6 +54,11 @@ class TestDAILogRegClassifier(TestCase):
 
         clf.train(inverse_regularisation=1e1, verbose=False)
 
+        return clf
+
+    def test_parse_X(self):
+        clf = self.train_classifier()
+
         # Parse some sentences.
         utterance_list = UtteranceNBList()
         utterance_list.add(0.7, Utterance('pocasi'))
@@ -62,4 +69,37 @@ class TestDAILogRegClassifier(TestCase):
 
 
         self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(task=weather)')) > 0.5)
-        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
\ No newline at end of file
+        self.assertTrue(da_confnet.get_prob(DialogueActItem(dai='inform(time=now)')) < 0.5)
+
+    def test_compiled_model(self):
+        clf = self.train_classifier()
+
+        utterance = Utterance('pocasi jak bude hned')
+        fvcs = clf.get_fvc(utterance)
+        features = [clf.get_features(utterance, (f, v, 'CL_' + c.upper()), fvcs) for f, v, c in fvcs]
+        features.append(clf.get_features(utterance, (None, None, None), fvcs))
+
+        # the compiled classifiers give the same probabilities as the trained ones
+        for group in clf.compiled_classifiers:
+            clsers, p = clf.predict_proba(group, features)
+            for i, clser in enumerate(clsers):
+                for j, feat in enumerate(features):
+                    fv = feat.get_feature_vector(clf.classifiers_features_mapping[clser])
+                    expected = clf.trained_classifiers[clser].predict_proba(fv.reshape(1, -1))[0][1]
+                    self.assertAlmostEqual(p[j, i], expected)
+
+        # the model is compiled when loaded
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir)
+        model_fname = os.path.join(model_dir, 'model.slu')
+        clf.save_model(model_fname)
+
+        clf2 = DAILogRegClassifier(clf.cldb, clf.preprocessing, features_size=4)
+        clf2.load_model(model_fname)
+
+        self.assertEqual(clf2.features_index, clf.features_index)
+        da_confnet = clf.parse_X(utterance)
+        da_confnet2 = clf2.parse_X(utterance)
+        self.assertEqual(len(da_confnet), len(da_confnet2))
+        for p, dai in da_confnet:
+            self.assertAlmostEqual(da_confnet2.get_prob(dai), p)
@@ -4,6 +4,7 @@ import alex.components.tts.google as GTTS
 import alex.components.tts.flite as FTTS
 import alex.components.tts.speechtech as STTS
 import alex.components.tts.voicerss as VTTS
+import alex.utils.cache as cache
 from alex.components.tts import TTSInterface
 from alex.components.tts.exceptions import TTSException
 
@@ -14,6 +15,9 @@ def get_tts_type(cfg):
 
 
 def tts_factory(tts_type, cfg):
+    if 'cache' in cfg['TTS']:
+        cache.configure_persistent_cache(**cfg['TTS']['cache'])
+
     if inspect.isclass(tts_type) and issubclass(tts_type, TTSInterface):
         slu = tts_type(cfg=cfg)
         return slu
@@ -3,14 +3,11 @@
 
 from collections import deque
 import numpy as np
-from scipy.misc import logsumexp
-import struct
-
-from math import log
 
 from alex.components.asr.exceptions import ASRException
-from alex.ml.tffnn import TheanoFFNN
+from alex.ml.ffnn import TheanoFFNNPredictor
 from alex.utils.mfcc import MFCCFrontEnd
+from alex.utils.ringbuffer import RingBuffer
 
 
 class FFNNVADGeneral(object):
@@ -24,13 +21,16 @@ class FFNNVADGeneral(object):
                  enormalise, zmeansource, usepower, usec0, usecmn, usedelta,
                  useacc, n_last_frames, n_prev_frames, lofreq, hifreq,
                  mel_banks_only):
-        self.audio_recorded_in = []
+        self.audio_recorded_in = RingBuffer(4 * framesize, dtype=np.int16)
 
-        self.ffnn = TheanoFFNN()
+        self.ffnn = TheanoFFNNPredictor()
         self.ffnn.load(model)
 
+        # log posteriors of speech for the last filter_length frames and their running sum
         self.log_probs_speech = deque(maxlen=filter_length)
-        self.log_probs_sil = deque(maxlen=filter_length)
+        self.log_probs_speech_sum = 0.0
+        # the number of frames added to the running sum since it was last recomputed
+        self.log_probs_speech_sum_age = 0
 
         self.last_decision = 0.0
 
@@ -57,32 +57,40 @@ class FFNNVADGeneral(object):
         It returns 1.0 for 100% speech segment and 0.0 for 100% non speech segment.
         """
 
-        data = struct.unpack('%dh' % (len(data) / 2, ), data)
-        self.audio_recorded_in.extend(data)
-
-        while len(self.audio_recorded_in) > self.framesize:
-            frame = self.audio_recorded_in[:self.framesize]
-            self.audio_recorded_in = self.audio_recorded_in[self.frameshift:]
+        self.audio_recorded_in.write(np.frombuffer(data, dtype=np.int16))
 
-            mfcc = self.front_end.param(frame)
+        if len(self.audio_recorded_in) <= self.framesize:
+            return self.last_decision
 
-            prob_sil, prob_speech = self.ffnn.predict_normalise(mfcc.reshape(1,len(mfcc)))[0]
+        # process all frames available in the buffer at once
+        n_frames = (len(self.audio_recorded_in) - self.framesize - 1) / self.frameshift + 1
+        mfccs = self.front_end.param_batch(
+            self.audio_recorded_in.peek((n_frames - 1) * self.frameshift + self.framesize), self.frameshift)
+        self.audio_recorded_in.consume(n_frames * self.frameshift)
 
-            # print prob_sil, prob_speech
+        # the probabilities are clamped so that the running sum never gets infinite
+        probs = np.maximum(self.ffnn.predict_normalise(mfccs).astype(np.float64), 1e-30)
+        log_probs_sil, log_probs_speech = np.log(probs[:, 0]), np.log(probs[:, 1])
+        log_posteriors_speech = log_probs_speech - np.logaddexp(log_probs_speech, log_probs_sil)
 
-            self.log_probs_speech.append(log(prob_speech))
-            self.log_probs_sil.append(log(prob_sil))
+        for log_posterior_speech in log_posteriors_speech:
+            if len(self.log_probs_speech) == self.log_probs_speech.maxlen:
+                self.log_probs_speech_sum -= self.log_probs_speech[0]
+            self.log_probs_speech.append(log_posterior_speech)
+            self.log_probs_speech_sum += log_posterior_speech
+            self.log_probs_speech_sum_age += 1
 
-            log_prob_speech_avg = 0.0
-            for log_prob_speech, log_prob_sil in zip(self.log_probs_speech, self.log_probs_sil):
-                log_prob_speech_avg += log_prob_speech - logsumexp([log_prob_speech, log_prob_sil])
-            log_prob_speech_avg /= len(self.log_probs_speech)
+        if self.log_probs_speech_sum_age >= self.log_probs_speech.maxlen:
+            # recompute the sum from time to time so that the rounding errors do not accumulate
+            self.log_probs_speech_sum = sum(self.log_probs_speech)
+            self.log_probs_speech_sum_age = 0
 
-            prob_speech_avg = np.exp(log_prob_speech_avg)
+        log_prob_speech_avg = self.log_probs_speech_sum / len(self.log_probs_speech)
+        prob_speech_avg = np.exp(log_prob_speech_avg)
 
-            # print 'prob_speech_avg: %5.3f' % prob_speech_avg
+        # print 'prob_speech_avg: %5.3f' % prob_speech_avg
 
-            self.last_decision = prob_speech_avg
+        self.last_decision = prob_speech_avg
 
         # returns a speech / non-speech decisions
         return self.last_decision
@@ -5,24 +5,26 @@ from __future__ import unicode_literals
 """
 Extracts wavs from call logs
 and runs the Kaldi decoding using the AM and HCLG graph from models directory
+
+The wavs are decoded by a pool of worker processes, each of them with its own decoder. The list of the wavs
+and their reference transcriptions is saved into work_list.txt in the output directory and the result of every
+decoded wav is appended to results.txt as soon as it is available. The decoding interrupted by a crash can be
+continued by running the same command with --resume, then only the wavs missing in results.txt are decoded.
 """
 if __name__ == '__main__':
     import autopath
 
 import os
 import errno
-import xml.dom.minidom
-import fnmatch
+import json
 import argparse
 import time
 import multiprocessing
-import random
-
-import alex.utils.various as various
 
 from alex.components.asr.common import asr_factory
 from alex.components.asr.utterance import Utterance
 from alex.components.hub.messages import Frame
+from alex.corpustools.calllogindex import load_call_logs
 from alex.corpustools.text_norm_cs import normalise_text, exclude_lm
 from alex.corpustools.wavaskey import save_wavaskey, load_wavaskey
 from alex.corpustools.asrscore import score
@@ -35,9 +37,22 @@ cfg = None
 def save_lattice(lat, output_dir, wav_path):
     lat.write(os.path.join(output_dir, os.path.basename(wav_path).replace('wav','fst')))
 
+def init_worker(config):
+    """ Creates the decoder of the current process.
+
+    Args:
+        config (dict): Alex configuration with setting for speech recognition
+    """
+    global asr, cfg
+
+    cfg = config
+    asr = asr_factory(cfg)
+
+
 def rec_wav_file(output_dir, wav_path):
     """ Recognise speech in wav file and profile speech recognition.
 
+    The audio is passed to the decoder in frames of the same size as in the hub.
     The decoding and ASR output extraction times are estimated.
 
     Args:
@@ -48,10 +63,11 @@ def rec_wav_file(output_dir, wav_path):
         Tuple of decodeded ASR hypothesis, time of decoding, time of hypothesis extraction
     """
     pcm = load_wav(cfg, wav_path)
-    frame = Frame(pcm)
+    frame_size = 2 * cfg['Audio']['samples_per_frame']
 
     start = time.time()
-    asr.rec_in(frame)
+    for i in xrange(0, len(pcm), frame_size):
+        asr.rec_in(Frame(pcm[i:i + frame_size]))
     rec_in_end = time.time()
     res = asr.hyp_out()
     hyp_out_end = time.time()
@@ -108,6 +124,64 @@ def decode_info(p):
     return best, dec_dur, fw_dur, wav_dur, wav_path
 
 
+def decode_wav(p):
+    """ Decodes one wav in a worker process.
+
+    Returns:
+        The result of decode_info() extended by the name of the worker process.
+    """
+    return decode_info(p) + (multiprocessing.current_process().name, )
+
+
+def decoded_wavs(params, config, num_workers):
+    """ Decodes the wavs by num_workers processes and generates the results in the order they are finished.
+
+    Args:
+        params(list): a list of (outdir, wav_path, reference) tuples
+        config(dict): Alex configuration file
+        num_workers(int): the number of worker processes
+    """
+    if num_workers > 1:
+        pool = multiprocessing.Pool(num_workers, init_worker, (config, ))
+        try:
+            for result in pool.imap_unordered(decode_wav, params):
+                yield result
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        init_worker(config)
+
+        for p in params:
+            yield decode_wav(p)
+
+
+def load_results(results_fname):
+    """ Loads the results of the wavs decoded so far.
+
+    A line which was not written completely, e.g. because of a crash, is ignored.
+
+    Returns:
+        A dictionary mapping wav paths to (best, dec_dur, fw_dur, wav_dur, worker) tuples.
+    """
+    results = {}
+    if not os.path.exists(results_fname):
+        return results
+
+    with open(results_fname, 'r') as f:
+        for line in f:
+            try:
+                wav_path, best, dec_dur, fw_dur, wav_dur, worker = json.loads(line)
+            except ValueError:
+                continue
+            results[wav_path] = best, dec_dur, fw_dur, wav_dur, worker
+
+    return results
+
+
 def compute_rt_factor(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict):
     """
     Prints RTF statistics for decoding and (decoding + ASR extraction)
@@ -208,123 +282,173 @@ def compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwle
     score(reference, hypothesis)
 
 
-def decode_with_reference(reference, outdir, num_workers):
+def compute_worker_stat(results, decoded, elapsed):
     """
-    Launch the decoding
+    Prints the RTF of every worker and the throughput of all of them.
 
     Args:
-        reference(str): Path to file with references in Alex reference format.
+        results(dict): (Wave name, (best, dec_dur, fw_dur, wav_dur, worker)) dictionary
+        decoded(list): names of the Waves decoded by this run
+        elapsed(float): the wall clock time of this run
+    """
+    workers = {}
+    for wav_path in decoded:
+        best, dec_dur, fw_dur, wav_dur, worker = results[wav_path]
+        n, d, w = workers.get(worker, (0, 0.0, 0.0))
+        workers[worker] = n + 1, d + dec_dur, w + wav_dur
+
+    print
+    for worker, (n, d, w) in sorted(workers.items()):
+        print """    %-20s # waws: %6d  RTF: %f""" % (worker, n, d / w if w else 0.0)
+
+    w_tot = sum(w for n, d, w in workers.values())
+    print """    Decoded %d waws (%.2f s of audio) in %.2f s: %.2f times faster than real time""" % (
+        len(decoded), w_tot, elapsed, w_tot / elapsed if elapsed else 0.0)
+
+
+def decode(work_list, outdir, config, num_workers, resume=False):
+    """
+    Decodes the wavs from the work list, streams the results to results.txt in outdir, and saves the statistics.
+
+    Args:
+        work_list(dict): (Wave path, reference transcription) dictionary
         outdir(str): Path to directory where to save log files.
-        cfg(dict): Alex configuration file
+        config(dict): Alex configuration file
+        num_workers(int): the number of worker processes
+        resume(bool): whether to keep the results decoded by a previous run
     """
-    trn_dict = load_wavaskey(reference, Utterance)
-    declen_dict, fwlen_dict, wavlen_dict, dec_dict = {}, {}, {}, {}
+    results_fname = os.path.join(outdir, 'results.txt')
+    results = load_results(results_fname) if resume else {}
 
-    params = [ (outdir, wav_path, reference) for wav_path, reference in trn_dict.items()]
-    random.shuffle(params)
+    params = [(outdir, wav_path, reference) for wav_path, reference in sorted(work_list.items())
+              if wav_path not in results]
 
-    if num_workers > 1:
-        p_decode_wavs = multiprocessing.Pool(num_workers)
-        decoded_wavs = p_decode_wavs.map(decode_info, params, 100)
-    else:
-        decoded_wavs = []
+    print 'Decoding %d waws, %d waws were decoded before' % (len(params), len(work_list) - len(params))
 
-        for p in params:
-            decoded_wavs.append(decode_info(p))
+    # a crash could leave a partially written line
+    incomplete_line = False
+    if resume and os.path.exists(results_fname) and os.path.getsize(results_fname) > 0:
+        with open(results_fname, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            incomplete_line = f.read(1) != b'\n'
 
-    for best, dec_dur, fw_dur, wav_dur, wav_path in decoded_wavs:
+    decoded = []
+    start = time.time()
+    with open(results_fname, 'a' if resume else 'w') as f:
+        if incomplete_line:
+            f.write('\n')
+
+        for best, dec_dur, fw_dur, wav_dur, wav_path, worker in decoded_wavs(params, config, num_workers):
+            results[wav_path] = best, dec_dur, fw_dur, wav_dur, worker
+            decoded.append(wav_path)
+
+            f.write(json.dumps([wav_path, best, dec_dur, fw_dur, wav_dur, worker]) + '\n')
+            f.flush()
+
+    compute_worker_stat(results, decoded, time.time() - start)
+
+    trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict = {}, {}, {}, {}, {}
+    for wav_path, reference in work_list.iteritems():
+        best, dec_dur, fw_dur, wav_dur, worker = results[wav_path]
+        trn_dict[wav_path] = reference
         dec_dict[wav_path] = best
         wavlen_dict[wav_path] = wav_dur
         declen_dict[wav_path] = dec_dur
         fwlen_dict[wav_path] = fw_dur
 
-    # compute_rt_factor(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
+    compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
 
-    # for wav_path, reference in sorted(trn_dict.items()):
-    #     best, dec_dur, fw_dur, wav_dur, wav_path = decode_info(asr, cfg, outdir, wav_path, reference)
-    #     dec_dict[wav_path] = best
-    #     wavlen_dict[wav_path] = wav_dur
-    #     declen_dict[wav_path] = dec_dur
-    #     fwlen_dict[wav_path] = fw_dur
-    #
-    #     compute_rt_factor(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
 
-    compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict, fwlen_dict)
+def load_work_list(outdir, resume):
+    """ Returns the work list saved in outdir if the decoding is resumed, None otherwise. """
+    work_list_fname = os.path.join(outdir, 'work_list.txt')
+    if resume and os.path.exists(work_list_fname):
+        return load_wavaskey(work_list_fname, unicode)
+
+    return None
+
+
+def save_work_list(outdir, work_list):
+    save_wavaskey(os.path.join(outdir, 'work_list.txt'), work_list)
+
 
+def decode_with_reference(reference, outdir, config, num_workers, resume=False):
+    """
+    Launch the decoding
 
-def extract_from_xml(indomain_data_dir, outdir, cfg):
+    Args:
+        reference(str): Path to file with references in Alex reference format.
+        outdir(str): Path to directory where to save log files.
+        config(dict): Alex configuration file
+        num_workers(int): the number of worker processes
+        resume(bool): whether to continue the decoding interrupted before
+    """
+    work_list = load_work_list(outdir, resume)
+    if work_list is None:
+        work_list = dict((wav_path, unicode(trn)) for wav_path, trn in load_wavaskey(reference, Utterance).items())
+        save_work_list(outdir, work_list)
+
+    decode(work_list, outdir, config, num_workers, resume)
+
+
+def extract_from_xml(indomain_data_dir, outdir, config, num_workers, resume=False, index_fname=None):
     """Extract transcription and Waves from xml
 
     Args:
         indomain_data_dir(path): path where the xml logs are stored
         outdir: directory to save the references and wave, Wav file names pairs
-        cfg: Alex configuration
+        config: Alex configuration
+        num_workers(int): the number of worker processes
+        resume(bool): whether to continue the decoding interrupted before
+        index_fname: the file name of the index of the call logs, see load_call_logs()
     """
+    work_list = load_work_list(outdir, resume)
+    if work_list is None:
+        work_list = extract_work_list(indomain_data_dir, num_workers, index_fname)
+        save_work_list(outdir, work_list)
 
-    glob = 'asr_transcribed.xml'
-    asr = asr_factory(cfg)
+    decode(work_list, outdir, config, num_workers, resume)
 
-    print 'Collecting files under %s with glob %s' % (indomain_data_dir, glob)
-    files = []
-    for root, dirnames, filenames in os.walk(indomain_data_dir, followlinks=True):
-        for filename in fnmatch.filter(filenames, glob):
-            files.append(os.path.join(root, filename))
 
-    # DEBUG example
-    # files = [
-    #     '/ha/projects/vystadial/data/call-logs/2013-05-30-alex-aotb-prototype/part1/2013-06-27-09-33-25.116055-CEST-00420221914256/asr_transcribed.xml']
+def extract_work_list(indomain_data_dir, num_workers=1, index_fname=None):
+    """Collects the Waves of the user turns and their normalised transcriptions from xml
 
-    try:
-        trn, dec, dec_len, wav_len = [], [], [], []
-        for fn in files:
-            doc = xml.dom.minidom.parse(fn)
-            turns = doc.getElementsByTagName("turn")
-            f_dir = os.path.dirname(fn)
-
-            for turn in turns:
-                if turn.getAttribute('speaker') != 'user':
-                    continue
-
-                recs = turn.getElementsByTagName("rec")
-                trans = turn.getElementsByTagName("asr_transcription")
-
-                if len(recs) != 1:
-                    print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=turn.getAttribute('turn_number'), fn=fn, recs=len(recs))
-                    continue
-
-                if len(trans) == 0:
-                    print "Skipping a turn in {fn} - trans: {trans}".format(fn=fn, trans=len(trans))
-                    continue
-
-                wav_file = recs[0].getAttribute('fname')
-                # FIXME: Check whether the last transcription is really the best! FJ
-                t = various.get_text_from_xml_node(trans[-1])
-                t = normalise_text(t)
-
-                if exclude_lm(t):
-                    continue
-
-                # TODO is it still valid? OP
-                # The silence does not have a label in the language model.
-                t = t.replace('_SIL_', '')
-                trn.append((wav_file, t))
-
-                wav_path = os.path.join(f_dir, wav_file)
-                best, dec_dur, fw_dur, wav_dur = decode_info(asr, cfg, outdir, wav_path, t)
-                dec.append((wav_file, best))
-                wav_len.append((wav_file, wav_dur))
-                dec_len.append((wav_file, dec_dur))
-
-    except Exception as e:
-        print 'PARTIAL RESULTS were saved to %s' % outdir
-        print e
-        raise e
-    finally:
-        trn_dict = dict(trn)
-        dec_dict = dict(dec)
-        wavlen_dict = dict(wav_len)
-        declen_dict = dict(dec_len)
-        compute_save_stat(outdir, trn_dict, dec_dict, wavlen_dict, declen_dict)
+    Args:
+        indomain_data_dir(path): path where the xml logs are stored
+        num_workers(int): the number of processes parsing the logs which are not indexed yet
+        index_fname: the file name of the index of the call logs, see load_call_logs()
+
+    Returns:
+        (Wave path, reference transcription) dictionary
+    """
+    call_logs = load_call_logs(indomain_data_dir, 'asr_transcribed.xml', index_fname, num_workers=num_workers)
+
+    work_list = {}
+    for fn, turn in call_logs.turns(indomain_data_dir, speaker='user'):
+        if len(turn.recs) != 1:
+            print "Skipping a turn {turn} in file: {fn} - recs: {recs}".format(turn=turn.number, fn=fn, recs=len(turn.recs))
+            continue
+
+        if len(turn.transcriptions) == 0:
+            print "Skipping a turn in {fn} - trans: {trans}".format(fn=fn, trans=len(turn.transcriptions))
+            continue
+
+        wav_file = turn.recs[0]
+        # FIXME: Check whether the last transcription is really the best! FJ
+        t = normalise_text(turn.transcriptions[-1])
+
+        if exclude_lm(t):
+            continue
+
+        # TODO is it still valid? OP
+        # The silence does not have a label in the language model.
+        t = t.replace('_SIL_', '')
+
+        work_list[os.path.join(os.path.dirname(fn), wav_file)] = t
+
+    call_logs.close()
+
+    return work_list
 
 
 if __name__ == '__main__':
@@ -340,6 +464,8 @@ if __name__ == '__main__':
                         help='If out-dir exists write the results there anyway')
     parser.add_argument('-n', '--num-workers', action="store", default=1, type=int,
                         help='number of workers used for ASR: default %d' % 1)
+    parser.add_argument('-r', '--resume', default=False, action='store_true',
+                        help='Continue the decoding interrupted before, the wavs decoded into out-dir are skipped')
 
     subparsers = parser.add_subparsers(dest='command',
                                        help='Either extract wav list from xml or expect reference and wavs')
@@ -348,6 +474,8 @@ if __name__ == '__main__':
         'extract', help='extract wav from all asr_transcribed.xml in directory')
     parser_a.add_argument('indomain_data_dir',
                           help='Directory which should contain symlinks or directories with transcribed ASR')
+    parser_a.add_argument('--index',
+                          help='The index of the call logs, by default it is stored in ~/.alex_call_log_index')
     parser_b = subparsers.add_parser(
         'load', help='Load wav transcriptions and reference with full paths to wavs')
     parser_b.add_argument(
@@ -356,7 +484,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     if os.path.exists(args.out_dir):
-        if not args.f:
+        if not args.f and not args.resume:
             print "\nThe directory '%s' already exists!\n" % args.out_dir
             parser.print_usage()
             parser.exit()
@@ -369,11 +497,10 @@ if __name__ == '__main__':
                 raise exc
 
     cfg = Config.load_configs(args.configs, use_default=True)
-    asr = asr_factory(cfg)
 
     if args.command == 'extract':
-        extract_from_xml(args.indomain_data_dir, args.out_dir, cfg)
+        extract_from_xml(args.indomain_data_dir, args.out_dir, cfg, args.num_workers, args.resume, args.index)
     elif args.command == 'load':
-        decode_with_reference(args.reference, args.out_dir, args.num_workers)
+        decode_with_reference(args.reference, args.out_dir, cfg, args.num_workers, args.resume)
     else:
         raise Exception('Argparse mechanism failed: Should never happen')
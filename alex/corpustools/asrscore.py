@@ -7,48 +7,83 @@ if __name__ == '__main__':
 
 import re
 import argparse
+import multiprocessing
 import sys
 
 from alex.corpustools.wavaskey import load_wavaskey
 from alex.components.asr.utterance import Utterance
-from alex.utils.text import min_edit_dist, min_edit_ops
+from alex.utils.text import min_edit_ops
 
-def score_file(reftext, testtext):
+_nonspeech_events_rx = re.compile(ur"\b_\w+_\b", flags=re.UNICODE)
+
+
+def _words(text):
+    """Returns the lowercased words of the text without the non-speech events."""
+    return _nonspeech_events_rx.sub(r"", text.lower()).split()
+
+
+def _utterance_edit_ops(texts):
+    reftext, testtext = texts
+    r = _words(reftext)
+    t = _words(testtext)
+    i, d, s = min_edit_ops(t, r)
+
+    return i, d, s, len(r)
+
+
+def edit_ops(reftext, testtext, num_workers=1):
+    """
+    Computes the edit operations between the reference and test word strings of every utterance.
+
+    :param reftext: a dictionary of the reference utterances
+    :param testtext: a dictionary of the test utterances with the same keys
+    :param num_workers: the number of processes computing the edit operations in parallel
+    :return: a dictionary mapping the keys to tuples (insertions, deletions, substitutions, number of reference words)
+    """
+    keys = sorted(reftext)
+    texts = [(unicode(reftext[utt_idx]), unicode(testtext[utt_idx])) for utt_idx in keys]
+
+    if num_workers > 1:
+        pool = multiprocessing.Pool(num_workers)
+        try:
+            ops = pool.map(_utterance_edit_ops, texts, max(1, len(texts) // (4 * num_workers)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        ops = [_utterance_edit_ops(t) for t in texts]
+
+    return dict(zip(keys, ops))
+
+
+def score_file(reftext, testtext, num_workers=1):
     """
     Computes ASR scores between reference and test word strings.
 
     :param reftext:
     :param testtext:
+    :param num_workers: the number of processes computing the edit operations in parallel
     :return: a tuple with percentages of correct, substitutions, deletions, insertions, error rate, and a number of reference words.
     """
     ii, dd, ss, nn = 0.0, 0.0, 0.0, 0.0
 
+    ops = edit_ops(reftext, testtext, num_workers)
     for utt_idx in sorted(reftext):
-        r = re.sub(ur"\b_\w+_\b",r"",unicode(reftext[utt_idx]).lower(),flags=re.UNICODE).split()
-        t = re.sub(ur"\b_\w+_\b",r"",unicode(testtext[utt_idx]).lower(),flags=re.UNICODE).split()
-#        r = unicode(reftext[utt_idx]).lower().split()
-#        t = unicode(testtext[utt_idx]).lower().split()
-        i, d, s = min_edit_ops(t, r)
+        i, d, s, n = ops[utt_idx]
 
         ii += i
         dd += d
         ss += s
 
-        nn += len(r)
-
-#        print "Ref:", unicode(r)
-#        print "Tst:", unicode(t)
-#        print i, d, s, len(r)
-#        print ii, dd, ss, nn
-#        print
+        nn += n
 
     return (nn-ss-dd)/nn*100, ss/nn*100, dd/nn*100, ii/nn*100, (ss+dd+ii)/nn*100, nn
 
-def score(fn_reftext, fn_testtext, outfile = sys.stdout):
+def score(fn_reftext, fn_testtext, outfile = sys.stdout, num_workers=1):
     reftext  = load_wavaskey(fn_reftext, Utterance)
     testtext = load_wavaskey(fn_testtext, Utterance)
 
-    corr, sub, dels, ins, wer, nwords = score_file(reftext, testtext)
+    corr, sub, dels, ins, wer, nwords = score_file(reftext, testtext, num_workers)
 
     m ="""
     Please note that the scoring is implicitly ignoring all non-speech events.
@@ -83,8 +118,10 @@ if __name__ == '__main__':
 
     parser.add_argument('refsem', action="store", help='a file with reference semantics')
     parser.add_argument('testsem', action="store", help='a file with tested semantics')
+    parser.add_argument('-n', '--num-workers', action="store", default=1, type=int,
+                        help='the number of processes computing the scores: default %(default)s')
 
     args = parser.parse_args()
 
-    score(args.refsem, args.testsem)
+    score(args.refsem, args.testsem, num_workers=args.num_workers)
                                         
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+An index of the turns in the call logs.
+
+The scripts preparing the data for the ASR, LM and SLU training walk the call log tree and parse every
+asr_transcribed.xml (or session.xml) only to pull out the recordings, the ASR hypotheses, and the transcriptions
+of the turns. The CallLogIndex parses each log once with a streaming parser and stores its turns in an SQLite
+database. When it is updated, only the logs which were added or modified since the last update are parsed again.
+
+Usage:
+
+    index = load_call_logs('indomain_data')
+    for fn, turns in index.call_logs('indomain_data'):
+        for turn in turns:
+            if turn.speaker == 'user' and turn.transcriptions:
+                print turn.recs, turn.transcriptions[-1]
+
+The index is stored in ~/.alex_call_log_index by default, one database per directory with the logs, because
+the directories with the logs are often read-only or shared over NFS, where the locking of SQLite is not reliable.
+"""
+
+import fnmatch
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+
+from collections import namedtuple
+
+try:
+    import xml.etree.cElementTree as etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+call_log_index_directory = '~/.alex_call_log_index'
+
+
+class Turn(namedtuple('Turn', ['number', 'speaker', 'recs', 'asrs', 'transcriptions'])):
+    """ A turn of a call log.
+
+    :param number: the turn_number attribute of the turn or None
+    :param speaker: the speaker attribute of the turn, e.g. 'user' or 'system'
+    :param recs: a list of the file names of the recordings in the turn, they are relative to the directory of the log
+    :param asrs: a list of the ASR outputs in the turn, each of them a list of the (probability, text) hypotheses
+    :param transcriptions: a list of the texts of the transcriptions of the turn
+    """
+    __slots__ = ()
+
+
+def element_text(elem):
+    """ Returns the text of the element without its children the same way as various.get_text_from_xml_node(). """
+    return ((elem.text or '') + ''.join(child.tail or '' for child in elem)).strip()
+
+
+def parse_call_log(fn):
+    """ Parses the turns of a call log.
+
+    The log is parsed incrementally and the parsed turns are discarded, so the memory used does not depend on
+    the length of the log.
+
+    :param fn: the file name of the log
+    :return: a list of the turns of the log
+    """
+    turns = []
+    turn = None
+    asr = None
+
+    for event, elem in etree.iterparse(fn, events=('start', 'end')):
+        tag = elem.tag
+
+        if event == 'start':
+            if tag == 'turn':
+                turn = Turn(elem.get('turn_number'), elem.get('speaker', ''), [], [], [])
+            elif tag == 'asr' and turn is not None:
+                asr = []
+                turn.asrs.append(asr)
+            continue
+
+        if turn is None:
+            continue
+
+        if tag == 'rec':
+            turn.recs.append(elem.get('fname', ''))
+        elif tag == 'hypothesis' and asr is not None:
+            p = elem.get('p')
+            asr.append((float(p) if p is not None else None, element_text(elem)))
+        elif tag == 'asr':
+            asr = None
+        elif tag == 'asr_transcription':
+            turn.transcriptions.append(element_text(elem))
+        elif tag == 'turn':
+            turns.append(turn)
+            turn = None
+            elem.clear()
+
+    return turns
+
+
+def _parse_call_log(fn):
+    """ Returns (fn, the turns, None) or (fn, [], an error message) if the log cannot be parsed. """
+    try:
+        return fn, parse_call_log(fn), None
+    except (etree.ParseError, IOError, ValueError) as e:
+        # the exceptions of cElementTree cannot be passed between processes
+        return fn, [], unicode(e)
+
+
+class CallLogIndex(object):
+    """ Stores the turns of the call logs in an SQLite database and updates them when the logs change. """
+
+    def __init__(self, index_fname):
+        """
+        :param index_fname: the file name of the database, it is created if it does not exist
+        """
+        self.index_fname = index_fname
+        self.db = sqlite3.connect(index_fname)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                path TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                number TEXT,
+                speaker TEXT NOT NULL,
+                recs TEXT NOT NULL,
+                asrs TEXT NOT NULL,
+                transcriptions TEXT NOT NULL,
+                PRIMARY KEY (path, idx)
+            );
+        """)
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def _abspath(path):
+        if isinstance(path, str):
+            path = path.decode('utf-8')
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _path_range(root_dir):
+        """ Returns the range of the paths of the files under the directory. """
+        root = os.path.join(CallLogIndex._abspath(root_dir), u'')
+        return root, root[:-1] + unichr(ord(os.sep) + 1)
+
+    @staticmethod
+    def find_files(root_dir, file_name='asr_transcribed.xml'):
+        """ Returns the absolute paths of the files of the given name under the directory. """
+        files = []
+        for root, dirnames, filenames in os.walk(CallLogIndex._abspath(root_dir), followlinks=True):
+            for filename in fnmatch.filter(filenames, file_name):
+                files.append(os.path.join(root, filename))
+        return sorted(files)
+
+    def update(self, root_dir, file_name='asr_transcribed.xml', num_workers=1, verbose=False):
+        """ Parses the logs under the directory which are not in the index or which were modified, and removes
+        the logs which do not exist any more from the index.
+
+        :param root_dir: the directory with the call logs
+        :param file_name: the file name (or a glob) of the logs
+        :param num_workers: the number of processes parsing the logs
+        :param verbose: whether to print the progress
+        :return: a tuple (the number of the parsed logs, the number of the removed logs)
+        """
+        files = self.find_files(root_dir, file_name)
+
+        indexed = dict((path, (mtime, size)) for path, mtime, size in self.db.execute(
+            "SELECT path, mtime, size FROM files WHERE path >= ? AND path < ?", self._path_range(root_dir)))
+
+        stats = {}
+        modified = []
+        for fn in files:
+            st = os.stat(fn)
+            stats[fn] = st.st_mtime, st.st_size
+            if indexed.get(fn) != stats[fn]:
+                modified.append(fn)
+
+        removed = [path for path in indexed if path not in stats and fnmatch.fnmatch(os.path.basename(path), file_name)]
+
+        if verbose:
+            print 'Indexing %d of %d call logs under %s' % (len(modified), len(files), root_dir)
+
+        with self.db:
+            for path in removed:
+                self._remove(path)
+
+        if num_workers > 1 and len(modified) > 1:
+            pool = multiprocessing.Pool(num_workers)
+            try:
+                parsed = pool.imap_unordered(_parse_call_log, modified, 16)
+                self._store(parsed, stats, verbose)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        else:
+            self._store((_parse_call_log(fn) for fn in modified), stats, verbose)
+
+        return len(modified), len(removed)
+
+    def _remove(self, path):
+        self.db.execute("DELETE FROM turns WHERE path = ?", (path, ))
+        self.db.execute("DELETE FROM files WHERE path = ?", (path, ))
+
+    def _store(self, parsed, stats, verbose):
+        count = 0
+        try:
+            for fn, turns, error in parsed:
+                if error:
+                    # a broken log is indexed without turns so that it is not parsed again until it changes
+                    print 'Cannot parse %s: %s' % (fn, error)
+
+                self._remove(fn)
+                self.db.execute("INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)", (fn, ) + stats[fn])
+                self.db.executemany(
+                    "INSERT INTO turns (path, idx, number, speaker, recs, asrs, transcriptions) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((fn, i, t.number, t.speaker, json.dumps(t.recs), json.dumps(t.asrs),
+                      json.dumps(t.transcriptions)) for i, t in enumerate(turns)))
+
+                count += 1
+                if count % 1000 == 0:
+                    # the logs parsed so far are kept if the update is interrupted
+                    self.db.commit()
+                    if verbose:
+                        print 'Indexed %d call logs' % count
+        finally:
+            self.db.commit()
+
+    @staticmethod
+    def _load_turn(number, speaker, recs, asrs, transcriptions):
+        return Turn(number, speaker, json.loads(recs), [[tuple(h) for h in asr] for asr in json.loads(asrs)],
+                    json.loads(transcriptions))
+
+    def call_logs(self, root_dir, file_name='asr_transcribed.xml'):
+        """ Generates the indexed logs under the directory sorted by their paths.
+
+        :param root_dir: the directory with the call logs
+        :param file_name: the file name (or a glob) of the logs
+        :return: an iterator over tuples (the absolute path of the log, a list of its turns)
+        """
+        rows = self.db.execute(
+            "SELECT files.path, turns.number, turns.speaker, turns.recs, turns.asrs, turns.transcriptions "
+            "FROM files LEFT JOIN turns ON files.path = turns.path "
+            "WHERE files.path >= ? AND files.path < ? ORDER BY files.path, turns.idx",
+            self._path_range(root_dir))
+
+        path, turns = None, []
+        for fn, number, speaker, recs, asrs, transcriptions in rows:
+            if fn != path:
+                if path is not None and fnmatch.fnmatch(os.path.basename(path), file_name):
+                    yield path, turns
+                path, turns = fn, []
+
+            if speaker is not None:
+                turns.append(self._load_turn(number, speaker, recs, asrs, transcriptions))
+
+        if path is not None and fnmatch.fnmatch(os.path.basename(path), file_name):
+            yield path, turns
+
+    def file_names(self, root_dir, file_name='asr_transcribed.xml'):
+        """ Returns the absolute paths of the indexed logs under the directory sorted by their paths. """
+        return [path for path, in self.db.execute(
+            "SELECT path FROM files WHERE path >= ? AND path < ? ORDER BY path", self._path_range(root_dir))
+            if fnmatch.fnmatch(os.path.basename(path), file_name)]
+
+    def call_log_turns(self, path):
+        """ Returns the list of the turns of the indexed log.
+
+        :param path: the absolute path of the log as returned by file_names() or call_logs()
+        :raise KeyError: if the log is not in the index
+        """
+        if self.db.execute("SELECT 1 FROM files WHERE path = ?", (path, )).fetchone() is None:
+            raise KeyError(path)
+
+        return [self._load_turn(*row) for row in self.db.execute(
+            "SELECT number, speaker, recs, asrs, transcriptions FROM turns WHERE path = ? ORDER BY idx", (path, ))]
+
+    def turns(self, root_dir, file_name='asr_transcribed.xml', speaker=None):
+        """ Generates the turns of the indexed logs under the directory.
+
+        :param root_dir: the directory with the call logs
+        :param file_name: the file name (or a glob) of the logs
+        :param speaker: if given, only the turns of this speaker are generated
+        :return: an iterator over tuples (the absolute path of the log, a turn)
+        """
+        for fn, turns in self.call_logs(root_dir, file_name):
+            for turn in turns:
+                if speaker is None or turn.speaker == speaker:
+                    yield fn, turn
+
+
+def default_index_fname(root_dir):
+    """ Returns the file name of the index of the call logs under the directory in call_log_index_directory.
+
+    The name is made of the name of the directory and a hash of its absolute path, so the indexes of different
+    directories with the same name do not collide.
+    """
+    root_dir = CallLogIndex._abspath(root_dir)
+    name = '%s-%s.sqlite' % (os.path.basename(root_dir), hashlib.sha1(root_dir.encode('utf-8')).hexdigest()[:16])
+
+    return os.path.join(os.path.expanduser(call_log_index_directory), name)
+
+
+def load_call_logs(root_dir, file_name='asr_transcribed.xml', index_fname=None, num_workers=1, verbose=True):
+    """ Updates the index of the call logs under the directory and returns it.
+
+    :param root_dir: the directory with the call logs
+    :param file_name: the file name (or a glob) of the logs
+    :param index_fname: the file name of the index, default_index_fname(root_dir) by default
+    :param num_workers: the number of processes parsing the logs
+    :param verbose: whether to print the progress
+    :return: an updated CallLogIndex
+    """
+    if index_fname is None:
+        index_fname = default_index_fname(root_dir)
+        if not os.path.isdir(os.path.dirname(index_fname)):
+            os.makedirs(os.path.dirname(index_fname))
+
+    index = CallLogIndex(index_fname)
+    index.update(root_dir, file_name, num_workers, verbose)
+
+    return index
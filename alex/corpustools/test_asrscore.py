@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+from alex.corpustools.asrscore import edit_ops, score_file
+
+
+class TestASRScore(unittest.TestCase):
+    reftext = {
+        '1.wav': 'I want Chinese food',
+        '2.wav': 'Give me the phone number _noise_',
+        '3.wav': 'Thank you goodbye',
+    }
+    testtext = {
+        '1.wav': 'I want a Chinese',
+        '2.wav': '_laugh_ give me phone number',
+        '3.wav': 'thank you goodbye',
+    }
+
+    def test_edit_ops(self):
+        self.assertEqual(edit_ops(self.reftext, self.testtext), {
+            '1.wav': (1, 1, 0, 4),
+            '2.wav': (0, 1, 0, 5),
+            '3.wav': (0, 0, 0, 3),
+        })
+
+    def test_score_file(self):
+        corr, sub, dels, ins, wer, nwords = score_file(self.reftext, self.testtext)
+        self.assertEqual(nwords, 12)
+        self.assertAlmostEqual(corr, 10.0 / 12 * 100)
+        self.assertAlmostEqual(ins, 1.0 / 12 * 100)
+        self.assertAlmostEqual(wer, 3.0 / 12 * 100)
+
+        self.assertEqual(score_file(self.reftext, self.testtext, num_workers=2), (corr, sub, dels, ins, wer, nwords))
+
+
+if __name__ == '__main__':
+    unittest.main()
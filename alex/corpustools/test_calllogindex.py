@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import codecs
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import xml.dom.minidom
+
+import alex.corpustools.calllogindex as calllogindex
+import alex.utils.various as various
+from alex.corpustools.calllogindex import CallLogIndex, Turn, load_call_logs, parse_call_log
+
+call_log = """<?xml version="1.0" encoding="utf-8"?>
+<dialogue>
+  <header><host>test</host></header>
+  <turn speaker="system" time="1.0" turn_number="1">
+    <dialogue_act time="1.0">hello()</dialogue_act>
+    <text time="1.0">Dobrý den.</text>
+  </turn>
+  <turn speaker="user" time="2.0" turn_number="2">
+    <rec endtime="3.0" fname="{name}-001.wav" starttime="2.0"/>
+    <asr>
+      <hypothesis p="0.7">z anděla</hypothesis>
+      <hypothesis p="0.3">z&amp;anděla</hypothesis>
+      <confnet><word_alternatives><word p="1.0">z</word></word_alternatives></confnet>
+    </asr>
+    <slu><interpretation p="1.0">inform(from_stop="Anděl")</interpretation></slu>
+    <asr_transcription author="a">Z ANDĚLA</asr_transcription>
+    <asr_transcription author="b"> z <b>x</b> anděla </asr_transcription>
+  </turn>
+  <turn speaker="user" time="4.0" turn_number="3">
+    <rec endtime="5.0" fname="{name}-002.wav" starttime="4.0"/>
+  </turn>
+</dialogue>
+"""
+
+
+class TestCallLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.logs = []
+        for name in ['a', 'b/c', 'b/d']:
+            self.logs.append(self.write_log(name))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_log(self, name, content=call_log):
+        fn = os.path.join(self.directory, name, 'asr_transcribed.xml')
+        if not os.path.exists(os.path.dirname(fn)):
+            os.makedirs(os.path.dirname(fn))
+        with codecs.open(fn, 'w', 'utf-8') as f:
+            f.write(content.format(name=os.path.basename(name)))
+        return fn
+
+    def test_parse_call_log(self):
+        turns = parse_call_log(self.logs[0])
+
+        self.assertEqual(turns, [
+            Turn('1', 'system', [], [], []),
+            Turn('2', 'user', ['a-001.wav'], [[(0.7, 'z anděla'), (0.3, 'z&anděla')]], ['Z ANDĚLA', 'z  anděla']),
+            Turn('3', 'user', ['a-002.wav'], [], []),
+        ])
+
+        # the same texts as from the DOM
+        doc = xml.dom.minidom.parse(self.logs[0])
+        dom_turns = doc.getElementsByTagName("turn")
+        self.assertEqual(turns[1].transcriptions,
+                         [various.get_text_from_xml_node(t)
+                          for t in dom_turns[1].getElementsByTagName("asr_transcription")])
+        self.assertEqual([t for p, t in turns[1].asrs[0]],
+                         [various.get_text_from_xml_node(h) for h in dom_turns[1].getElementsByTagName("hypothesis")])
+
+    def test_update(self):
+        index_fname = os.path.join(self.directory, 'index.sqlite')
+        index = CallLogIndex(index_fname)
+
+        self.assertEqual(index.update(self.directory), (3, 0))
+        self.assertEqual([fn for fn, turns in index.call_logs(self.directory)], sorted(self.logs))
+        self.assertEqual([fn for fn, turns in index.call_logs(os.path.join(self.directory, 'b'))], sorted(self.logs[1:]))
+        self.assertEqual(dict(index.call_logs(self.directory))[self.logs[0]], parse_call_log(self.logs[0]))
+        self.assertEqual(len(list(index.turns(self.directory, speaker='user'))), 6)
+
+        # nothing changed
+        self.assertEqual(index.update(self.directory), (0, 0))
+
+        # a modified, a removed, a new, and a broken log
+        time.sleep(0.01)
+        self.write_log('b/c', call_log.replace('z anděla', 'na anděl'))
+        os.remove(self.logs[2])
+        self.write_log('e')
+        self.write_log('f', '<dialogue><turn')
+        index.close()
+
+        index = load_call_logs(self.directory, index_fname=index_fname, num_workers=2, verbose=False)
+        logs = dict(index.call_logs(self.directory))
+        self.assertEqual(sorted(os.path.relpath(fn, self.directory) for fn in logs),
+                         ['a/asr_transcribed.xml', 'b/c/asr_transcribed.xml', 'e/asr_transcribed.xml',
+                          'f/asr_transcribed.xml'])
+        self.assertEqual(logs[self.logs[1]][1].asrs[0][0], (0.7, 'na anděl'))
+        self.assertEqual(logs[os.path.join(self.directory, 'f', 'asr_transcribed.xml')], [])
+        self.assertEqual(index.update(self.directory), (0, 0))
+
+    def test_call_log_turns(self):
+        index = CallLogIndex(os.path.join(self.directory, 'index.sqlite'))
+        index.update(self.directory)
+
+        self.assertEqual(index.file_names(self.directory), sorted(self.logs))
+        self.assertEqual(index.file_names(os.path.join(self.directory, 'b')), sorted(self.logs[1:]))
+        for fn in self.logs:
+            self.assertEqual(index.call_log_turns(fn), parse_call_log(fn))
+        self.assertRaises(KeyError, index.call_log_turns, os.path.join(self.directory, 'x', 'asr_transcribed.xml'))
+
+    def test_default_index_fname(self):
+        directory = calllogindex.call_log_index_directory
+        calllogindex.call_log_index_directory = os.path.join(self.directory, 'index')
+        self.addCleanup(setattr, calllogindex, 'call_log_index_directory', directory)
+
+        index = load_call_logs(os.path.join(self.directory, 'b'), verbose=False)
+        index.close()
+
+        # the index is not written into the directory with the logs
+        self.assertEqual(os.path.dirname(index.index_fname), os.path.join(self.directory, 'index'))
+        self.assertTrue(os.path.exists(index.index_fname))
+        self.assertEqual(calllogindex.default_index_fname(os.path.join(self.directory, 'b', '')), index.index_fname)
+        self.assertNotEqual(calllogindex.default_index_fname(os.path.join(self.directory, 'b', 'c', 'b')),
+                            index.index_fname)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import codecs
+import os
+import random
+import re
+import unittest
+
+import alex.corpustools.text_norm_cs as text_norm_cs
+import alex.corpustools.text_norm_en as text_norm_en
+import alex.corpustools.text_norm_es as text_norm_es
+from alex.corpustools.text_norm_base import SubstitutionCascade, normalise_iterable
+
+alex_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+corpora = {
+    text_norm_cs: ['applications/PublicTransportInfoCS/slu/bootstrap.trn',
+                   'applications/RepeatAfterMe/sentences_cs.txt'],
+    text_norm_en: ['applications/PublicTransportInfoEN/slu/bootstrap.trn',
+                   'applications/PublicTransportInfoEN/slu/bootstrap_orig.trn',
+                   'tests/resources/towninfo-train.trn'],
+    text_norm_es: [],
+}
+
+
+class SequentialCascade(SubstitutionCascade):
+    """Applies all the substitutions one by one as the normalisation did before the cascades were introduced."""
+
+    def apply(self, text):
+        for rx, sub in self.substitutions:
+            text = rx.sub(sub, text)
+        return text
+
+
+def read_corpus(file_name):
+    texts = []
+    with codecs.open(os.path.join(alex_dir, file_name), 'r', 'utf-8') as f:
+        for line in f:
+            texts.append(line.split('=>', 1)[-1].strip())
+    return texts
+
+
+def synthetic_texts(module, n=2000):
+    """Generates texts made of the words matched by the substitutions, the punctuation and the non-speech events."""
+    rng = random.Random(0)
+
+    words = []
+    for cascade in (module._subst_cascade, module._hesitation_cascade):
+        words.extend(cascade.word_index)
+        for rx, sub in cascade.substitutions:
+            words.append(rx.pattern[len(r'(^|\s)'):-len(r'($|\s)')])
+            words.append(sub.strip())
+    words = sorted(set(w for w in words if w))
+    words.extend(['(NOISE)', '<SIL>', '[LAUGH]', '_NOISE_', '_SIL_', '_EXCLUDE_', '/EHM/', 'ahoj', 'hello', 'Anděl'])
+    separators = [' ', ' ', ' ', '  ', ', ', '. ', '? ', '"', '\t', '-', '']
+
+    texts = []
+    for i in range(n):
+        text = ''
+        for j in range(rng.randint(1, 8)):
+            word = rng.choice(words)
+            text += (word.lower() if rng.random() < 0.3 else word) + rng.choice(separators)
+        texts.append(text)
+    return texts
+
+
+class TestTextNorm(unittest.TestCase):
+    def reference_normalise_text(self, module):
+        """Returns the normalisation of the module with the substitutions applied sequentially."""
+        subst_cascade, hesitation_cascade = module._subst_cascade, module._hesitation_cascade
+
+        def normalise_text(text):
+            module._subst_cascade = SequentialCascade(subst_cascade.substitutions)
+            module._hesitation_cascade = SequentialCascade(hesitation_cascade.substitutions)
+            try:
+                return module.normalise_text(text)
+            finally:
+                module._subst_cascade, module._hesitation_cascade = subst_cascade, hesitation_cascade
+
+        return normalise_text
+
+    def assert_same_normalisation(self, module, texts):
+        reference = self.reference_normalise_text(module)
+        for text in texts:
+            self.assertEqual(module.normalise_text(text), reference(text), 'Input: %s' % text)
+
+    def test_corpora(self):
+        for module, file_names in corpora.iteritems():
+            for file_name in file_names:
+                self.assert_same_normalisation(module, read_corpus(file_name))
+
+    def test_synthetic(self):
+        for module in corpora:
+            self.assert_same_normalisation(module, synthetic_texts(module))
+
+    def test_cascade_order(self):
+        # the replacement of an earlier substitution is rewritten by the later ones but not by the earlier ones
+        cascade = SubstitutionCascade([
+            (re.compile(r'(^|\s)B($|\s)'), r'\1C\2'),
+            (re.compile(r'(^|\s)A($|\s)'), r'\1B\2'),
+            (re.compile(r'(^|\s)B($|\s)'), r'\1D\2'),
+            (re.compile(r'(^|\s)X.($|\s)'), r'\1Y\2'),
+        ])
+        self.assertEqual(cascade.apply('A B XZ'), 'D C Y')
+        self.assertEqual(cascade.apply('E F'), 'E F')
+
+    def test_normalise_texts(self):
+        texts = read_corpus(corpora[text_norm_cs][0]) * 2
+        self.assertEqual(list(text_norm_cs.normalise_texts(texts)), [text_norm_cs.normalise_text(t) for t in texts])
+
+        calls = []
+
+        def normalise_text(text):
+            calls.append(text)
+            return text.upper()
+
+        self.assertEqual(list(normalise_iterable(normalise_text, ['a', 'b', 'a', 'c', 'a'], cache_size=2)),
+                         ['A', 'B', 'A', 'C', 'A'])
+        self.assertEqual(calls, ['a', 'b', 'c', 'a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+This module provides the machinery shared by the text normalisation modules text_norm_cs, text_norm_en and
+text_norm_es.
+
+The normalisation applies long lists of substitutions of the form ``(^|\s)PATTERN($|\s)``. Applying every one of them
+to every transcription is slow, while only a few of them match any given transcription. The SubstitutionCascade
+indexes the patterns by the words they match, so it applies only the substitutions which can match the transcription.
+The substitutions are still applied by the original regular expressions and in the original order, therefore the
+result is exactly the same as if all of them were applied.
+"""
+
+from __future__ import unicode_literals
+
+import heapq
+import re
+
+_prefix = r'(^|\s)'
+_suffix = r'($|\s)'
+_metachars = set('.^$*+?{}[]\\|()')
+# the patterns containing these can match without any of their literal parts
+_optional_metachars = set('*?{}[]\\|')
+_literal_parts_rx = re.compile(r'[.^$*+?{}\[\]\\|()]+')
+
+
+class SubstitutionCascade(object):
+    """
+    Applies a list of regular expression substitutions in order, each of them to the result of the previous one.
+
+    The patterns which match a single word, e.g. ``(^|\s)DĚKUJÚ($|\s)``, are looked up in a dictionary
+    by the words of the text. The other patterns are applied only if the text contains their longest literal part,
+    e.g. ``PROF`` for ``(^|\s)PROF.($|\s)``. After each substitution which changes the text, the following patterns
+    are looked up again, since the replacement could create new matches.
+    """
+
+    def __init__(self, substitutions):
+        """
+        :param substitutions: a list of (compiled regular expression, replacement) pairs
+        """
+        self.substitutions = list(substitutions)
+
+        self.word_index = {}
+        self.other_patterns = []
+        for i, (rx, sub) in enumerate(self.substitutions):
+            pattern = rx.pattern
+            if pattern.startswith(_prefix) and pattern.endswith(_suffix):
+                pattern = pattern[len(_prefix):-len(_suffix)]
+
+                if pattern and not _metachars.intersection(pattern) and len(pattern.split()) == 1 \
+                        and pattern == pattern.strip():
+                    self.word_index.setdefault(pattern, []).append(i)
+                    continue
+
+            self.other_patterns.append((i, self._literal_part(pattern)))
+
+    def _literal_part(self, pattern):
+        """Returns a string which must be in any text matching the pattern or '' if it is not known."""
+        if _optional_metachars.intersection(pattern):
+            return ''
+        return max(_literal_parts_rx.split(pattern), key=len)
+
+    def _candidates(self, text, start):
+        """Returns the indices of the substitutions from `start` on which can match the text."""
+        candidates = set()
+        for word in text.split():
+            if word in self.word_index:
+                candidates.update(i for i in self.word_index[word] if i >= start)
+        for i, literal_part in self.other_patterns:
+            if i >= start and literal_part in text:
+                candidates.add(i)
+        return candidates
+
+    def apply(self, text):
+        """Applies the substitutions to the text."""
+        candidates = self._candidates(text, 0)
+        heap = list(candidates)
+        heapq.heapify(heap)
+
+        while heap:
+            i = heapq.heappop(heap)
+            rx, sub = self.substitutions[i]
+            new_text = rx.sub(sub, text)
+
+            if new_text != text:
+                text = new_text
+                for j in self._candidates(text, i + 1):
+                    if j not in candidates:
+                        candidates.add(j)
+                        heapq.heappush(heap, j)
+
+        return text
+
+
+def normalise_iterable(normalise_text, texts, cache_size=100000):
+    """
+    Normalises the texts from an iterable by the normalise_text function and generates the results.
+
+    The corpora contain many repeated transcriptions, each of them is normalised only once. The results are cached
+    for at most `cache_size` distinct texts, the cache is emptied when it is full.
+    """
+    cache = {}
+    for text in texts:
+        try:
+            yield cache[text]
+        except KeyError:
+            if len(cache) >= cache_size:
+                cache.clear()
+            cache[text] = normalised = normalise_text(text)
+            yield normalised
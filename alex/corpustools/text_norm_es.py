@@ -9,7 +9,9 @@ from __future__ import unicode_literals
 
 import re
 
-__all__ = ['normalise_text', 'exclude', 'exclude_by_dict']
+from alex.corpustools.text_norm_base import SubstitutionCascade, normalise_iterable
+
+__all__ = ['normalise_text', 'normalise_texts', 'exclude', 'exclude_by_dict']
 
 _nonspeech_events = ['_SIL_', '_INHALE_', '_LAUGH_', '_EHM_HMM_', '_NOISE_', '_EXCLUDE_',]
 
@@ -128,6 +130,9 @@ _hesitation = ['AAAA', 'AAA', 'AA', 'AAH', 'A-', "-AH-", "AH-", "AH.", "AH",
 for idx, word in enumerate(_hesitation):
     _hesitation[idx] = re.compile(r'(^|\s){word}($|\s)'.format(word=word))
 
+_subst_cascade = SubstitutionCascade(_subst)
+_hesitation_cascade = SubstitutionCascade((word, ' (HESITATION) ') for word in _hesitation)
+
 _more_spaces = re.compile(r'\s{2,}')
 _sure_punct_rx = re.compile(r'[.?!",_\n]')
 _parenthesized_rx = re.compile(r'\(+([^)]*)\)+')
@@ -141,10 +146,8 @@ def normalise_text(text):
     text = text.strip().upper()
 
     # Do dictionary substitutions.
-    for pat, sub in _subst:
-        text = pat.sub(sub, text)
-    for word in _hesitation:
-        text = word.sub(' (HESITATION) ', text)
+    text = _subst_cascade.apply(text)
+    text = _hesitation_cascade.apply(text)
     text = _more_spaces.sub(' ', text).strip()
     
     # Handle non-speech events (separate them from words they might be
@@ -160,7 +163,8 @@ def normalise_text(text):
 
     # remove duplicate non-speech events
     for pat, sub in _nonspeech_events:
-        text = pat.sub(sub, text)
+        if sub.strip() in text:
+            text = pat.sub(sub, text)
     text = _more_spaces.sub(' ', text).strip()
 
     for char in '^':
@@ -168,6 +172,14 @@ def normalise_text(text):
 
     return text
 
+
+def normalise_texts(texts):
+    """
+    Normalises the transcriptions from an iterable and generates the results in the same order.
+    The repeated transcriptions are normalised only once.
+    """
+    return normalise_iterable(normalise_text, texts)
+
 _excluded_characters = set(['\n', '=', '-', '*', '+', '~', '(', ')', '[', ']', '{', '}', '<', '>',
                         '0', '1', '2', '3', '4', '5', '6', '7', '8', '9'])
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the speed of the factor operations used by the loopy belief propagation for slots of realistic sizes.
+
+A slot of a belief tracker is modelled by a transition factor over the values of the slot in the previous and in the
+current turn (hid_prev, hid) and by an observation factor over the values of the slot and of its observation
+(hid, obs). One update of the slot multiplies the belief of the previous turn by the transition factor,
+sums out the previous value, and multiplies the result by the observation. The slots like stops or cities have
+hundreds or thousands of values.
+
+To compare two implementations, run the script on both revisions of the code with the same parameters.
+
+Usage:
+
+    ./benchmark_factor.py [-c 10 100 1000] [-r repeats] [--linear]
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+
+import numpy as np
+
+from alex.ml.bn.factor import Factor, to_log
+
+
+def random_factor(variables, cardinalities, logarithmetic, rng):
+    values = {var: range(cardinalities[var]) for var in variables}
+    shape = [cardinalities[var] for var in variables]
+    table = rng.rand(*shape).astype(np.float32).ravel()
+    if logarithmetic:
+        table = to_log(table)
+    return Factor(variables, values, table, logarithmetic)
+
+
+def measure(f, repeats):
+    start = time.clock()
+    for i in range(repeats):
+        result = f()
+    return (time.clock() - start) / repeats, result
+
+
+def benchmark(cardinality, repeats, logarithmetic):
+    rng = np.random.RandomState(0)
+    cardinalities = {'hid': cardinality, 'hid_prev': cardinality, 'obs': cardinality}
+
+    belief = random_factor(['hid_prev'], cardinalities, logarithmetic, rng)
+    transition = random_factor(['hid', 'hid_prev'], cardinalities, logarithmetic, rng)
+    observation = random_factor(['hid', 'obs'], cardinalities, logarithmetic, rng)
+
+    t_product, joint = measure(lambda: transition * belief, repeats)
+    t_marginalize, prediction = measure(lambda: joint.marginalize(['hid']), repeats)
+    t_observation, posterior = measure(lambda: (observation * prediction).marginalize(['hid']), repeats)
+    t_normalize, _ = measure(lambda: transition.normalize(parents=['hid_prev']), repeats)
+
+    print "%11d %12.3f %12.3f %12.3f %12.3f" % (cardinality, 1000 * t_product, 1000 * t_marginalize,
+                                                1000 * t_observation, 1000 * t_normalize)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    parser.add_argument('-c', '--cardinalities', type=int, nargs='+', default=[10, 100, 1000],
+                        help='the numbers of values of the benchmarked slots: default %(default)s')
+    parser.add_argument('-r', '--repeats', type=int, default=3,
+                        help='the number of repetitions of each operation: default %(default)s')
+    parser.add_argument('--linear', action='store_true',
+                        help='use the linear instead of the log arithmetic')
+
+    args = parser.parse_args()
+
+    print "Times in ms per operation, %s arithmetic" % ("linear" if args.linear else "log")
+    print "%11s %12s %12s %12s %12s" % ("cardinality", "product", "marginalize", "observation", "normalize")
+    for cardinality in args.cardinalities:
+        benchmark(cardinality, args.repeats, not args.linear)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,6 @@ with probability distributions.
 import numpy as np
 import operator
 
-from collections import defaultdict
 from scipy.misc import logsumexp
 
 ZERO = 1e-20
@@ -235,6 +234,10 @@ class Factor(object):
         Apply an operation on two factors, which don't have the same sets
         of variables.
 
+        The factor tables are viewed as arrays with an axis for each variable
+        of the new factor, so the operation is broadcast over the variables
+        missing in one of the factors.
+
         :param other: The other factor.
         :type other: :class:`Factor`
         :param op: Binary function.
@@ -251,49 +254,12 @@ class Factor(object):
         new_variable_values = dict(self.variable_values)
         new_variable_values.update(other.variable_values)
 
-        # The cardinalities will stay the same, we just have to add
-        # cardinalities for variables from both factors.
-        new_cardinalities = dict(self.cardinalities)
-        new_cardinalities.update(other.cardinalities)
-
-        # Compute the length of new factor table.
-        new_factor_length = self._factor_table_length(new_cardinalities)
-
-        # Create a new factor table.
-        new_factor_table = np.empty(new_factor_length, np.float32)
-
-        assignment = defaultdict(int)
-        index_self = 0
-        index_other = 0
-        reversed_variables = new_variables[::-1]
-
-        for i in range(new_factor_length):
-            # Apply the operator.
-            new_factor_table[i] = op(self.factor_table[index_self],
-                                     other.factor_table[index_other])
-
-            # Update indexes, start with variable with smallest stride.
-            for var in reversed_variables:
-                # Move to next value of a variable.
-                assignment[var] += 1
-                # If we go past the last value of one variable, we need to
-                # move onto next variable.
-                if assignment[var] == new_cardinalities[var]:
-                    assignment[var] = 0
-                    index_self -= ((new_cardinalities[var] - 1) *
-                                   self.strides.get(var, 0))
-                    index_other -= ((new_cardinalities[var] - 1) *
-                                    other.strides.get(var, 0))
-                # Otherwise we just update this variable and don't have to do
-                # anything with other variables.
-                else:
-                    index_self += self.strides.get(var, 0)
-                    index_other += other.strides.get(var, 0)
-                    break
+        new_factor_table = op(self._get_aligned_table(new_variables),
+                              other._get_aligned_table(new_variables))
 
         return Factor(new_variables,
                       new_variable_values,
-                      new_factor_table,
+                      new_factor_table.astype(np.float32).ravel(),
                       self.logarithmetic)
 
     def _apply_op_same(self, other, op):
@@ -364,7 +330,25 @@ class Factor(object):
 
     def _factor_table_length(self, cardinalities):
         """Length of the factor table (number of assignments)."""
-        return reduce(operator.mul, cardinalities.values())
+        return reduce(operator.mul, cardinalities.values(), 1)
+
+    def _get_aligned_table(self, variables):
+        """Return the factor table as an array with an axis for each variable.
+
+        The axes are in the order of `variables`. The variables which are not
+        in this factor get an axis of length one, so the table can be
+        broadcast against tables of other factors aligned to the same
+        variables.
+
+        :param variables: Variables including all variables of this factor.
+        :type variables: list
+        :returns: View of the factor table (or its copy if the axes must be reordered).
+        :rtype: ndarray
+        """
+        table = self.factor_table.reshape([self.cardinalities[var] for var in self.variables])
+        table = table.transpose(sorted(range(len(self.variables)),
+                                       key=lambda i: variables.index(self.variables[i])))
+        return table.reshape([self.cardinalities.get(var, 1) for var in variables])
 
     def _get_assignment_from_index(self, index, chosen_vars=None):
         """Get assignment from a factor table at given index."""
@@ -417,39 +401,16 @@ class Factor(object):
         :rtype: :class:`Factor`
 
         """
-        # Assignment counter
-        assignment = defaultdict(int)
-        # New cardinalities and new factor table.
-        new_cardinalities = {x: self.cardinalities[x] for x in keep}
-        new_factor_length = self._factor_table_length(new_cardinalities)
-        new_factor_table = np.empty(new_factor_length, np.float32)
-        new_factor_table[:] = self._zero
-        # Strides for resulting variables in the new factor table.
-        new_strides = self._compute_strides(keep,
-                                            self.cardinalities,
-                                            new_factor_length)
-        # Index into the new factor table.
-        index = 0
+        # Move the summed out axes to the end and flatten them, so they can
+        # be summed out at once, and the kept axes are in the order of keep.
+        # The sums are computed in double precision.
+        table = self.factor_table.reshape([self.cardinalities[var] for var in self.variables])
+        axes = ([self.variables.index(var) for var in keep] +
+                [i for i, var in enumerate(self.variables) if var not in keep])
+        new_factor_length = self._factor_table_length({var: self.cardinalities[var] for var in keep})
+        table = table.transpose(axes).reshape(new_factor_length, -1).astype(np.float64)
 
-        # Iterate over every element in the old factor table and add them to
-        # the correct element in the new factor table.
-        for i in range(self.factor_length):
-            new_factor_table[index] = self._add(new_factor_table[index],
-                                                self.factor_table[i])
-
-            # Update the assignment and indexes.
-            for var in keep:
-                # The assignment of variable var changed, so we must add its
-                # stride to the index.
-                if (i + 1) % self.strides[var] == 0:
-                    assignment[var] += 1
-                    index += new_strides[var]
-                # The assignment of variable var overflowed to 0, we must
-                # subtract the cardinality from index.
-                if assignment[var] == self.cardinalities[var]:
-                    assignment[var] = 0
-                    index -= (self.cardinalities[var] *
-                              new_strides[var])
+        new_factor_table = self._add(self._zero, self._sum(table, axis=1)).astype(np.float32)
 
         # Return new factor with marginalized variables.
         new_variable_values = {v: self.variable_values[v] for v in keep}
@@ -504,16 +465,10 @@ class Factor(object):
         :type parents: list
         """
         if parents is not None:
-            sums = defaultdict(lambda: self._zero)
-            assignments = {}
-
-            for i in range(self.factor_length):
-                value = self.factor_table[i]
-                assignments[i] = self._get_assignment_from_index(i, parents)
-                sums[assignments[i]] = self._add(sums[assignments[i]], value)
+            sums = self.marginalize([var for var in self.variables if var in parents])
+            table = self.factor_table.reshape([self.cardinalities[var] for var in self.variables])
 
-            for i in range(self.factor_length):
-                self.factor_table[i] = self._div(self.factor_table[i], sums[assignments[i]])
+            self.factor_table[:] = self._div(table, sums._get_aligned_table(self.variables)).ravel()
         else:
             self.factor_table = self._div(self.factor_table, self._sum(self.factor_table))
 
@@ -7,6 +7,7 @@ import random
 import copy
 import numpy as np
 import numpy.random as rng
+import sys
 
 from exceptions import FFNNException
 
@@ -121,3 +122,156 @@ class FFNN(object):
         with open(file_name, "wb") as f:
             pickle.dump((self.weights, self.biases, self.input_m, self.input_std), f)
 
+
+
+class TheanoObject(object):
+    """ A placeholder for the Theano objects stored in the models saved by alex.ml.tffnn.TheanoFFNN.
+
+    It allows to load the models without importing Theano.
+    """
+    def __init__(self, *args, **kwargs):
+        self.args = args
+
+    def __setstate__(self, state):
+        self.state = state
+
+
+class TheanoFreeUnpickler(object):
+    """ Unpickles objects while replacing all references to Theano classes and functions by placeholders.
+    """
+    def __init__(self):
+        self.placeholders = {}
+
+    def find_global(self, module, name):
+        if module == 'theano' or module.startswith('theano.'):
+            if (module, name) not in self.placeholders:
+                self.placeholders[(module, name)] = type(name, (TheanoObject, ), {'theano_module': module})
+            return self.placeholders[(module, name)]
+
+        __import__(module)
+        return getattr(sys.modules[module], name)
+
+    def load(self, f):
+        unpickler = pickle.Unpickler(f)
+        unpickler.find_global = self.find_global
+        return unpickler.load()
+
+
+class TheanoFFNNPredictor(object):
+    """ Implements an inference only version of the alex.ml.tffnn.TheanoFFNN network in NumPy.
+
+    It loads the models saved by TheanoFFNN, however, it does not import Theano and it does not compile
+    any functions. The forward pass is computed in float32 for a whole batch of input vectors at once.
+    """
+    activations = {
+        'tanh': np.tanh,
+        'sigmoid': lambda y: 1 / (1 + np.exp(-y)),
+        'softplus': lambda y: np.logaddexp(0, y),
+    }
+
+    def __init__(self):
+        self.weights = []
+        self.biases = []
+        self.hidden_activation = 'tanh'
+
+    def __str__(self):
+        return unicode(self)
+
+    def __unicode__(self):
+        s = []
+        s.append("Network layers:")
+        for w, b in zip(self.weights, self.biases):
+            s.append(str(w.shape)+" : " + str(b.shape))
+
+        return "\n".join(s)
+
+    def get_activation_name(self, activation):
+        """ Returns the name of the activation function stored in a TheanoFFNN model.
+
+        The activation is stored as a pickled Theano Elemwise op, its scalar op identifies the function.
+        """
+        if isinstance(activation, basestring):
+            names = [activation.lower(), ]
+        else:
+            names = []
+            stack = [activation, ]
+            while stack:
+                obj = stack.pop()
+                if isinstance(obj, TheanoObject):
+                    names.append(type(obj).__name__.lower())
+                    stack.extend(getattr(obj, 'args', ()))
+                    stack.append(getattr(obj, 'state', None))
+                elif isinstance(obj, dict):
+                    stack.extend(obj.values())
+                elif isinstance(obj, (list, tuple)):
+                    stack.extend(obj)
+
+        for activation_name in self.activations:
+            for name in names:
+                if activation_name in name:
+                    return activation_name
+
+        raise FFNNException("Unsupported hidden layer activation function: %s" % ", ".join(names))
+
+    def load(self, file_name):
+        """ Loads a NN saved by TheanoFFNN.
+
+        :param file_name: file name of the saved NN
+        :return: None
+        """
+        with open(file_name, "rb") as f:
+            input_m, \
+            input_std, \
+            params, \
+            n_hidden, \
+            hidden_activation, \
+            self.n_inputs, \
+            self.n_outputs, \
+            weight_l2, \
+            self.prev_frames, \
+            self.next_frames, \
+            batch_size, \
+            self.amp, \
+            amp_vec = TheanoFreeUnpickler().load(f)
+
+        self.hidden_activation = self.get_activation_name(hidden_activation)
+
+        self.weights = [np.asarray(w, dtype=np.float32) for w in params[0::2]]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in params[1::2]]
+
+        self.input_m = np.asarray(input_m, dtype=np.float32)
+        self.input_std = np.asarray(input_std, dtype=np.float32)
+        self.amp_vec = np.asarray(amp_vec, dtype=np.float32)
+
+    def predict(self, input):
+        """ Returns the output of the last layer for each row of the input matrix.
+
+        :param input: a matrix of input vectors (one per row)
+        :return: a matrix of class probabilities (one row per input vector)
+        """
+        activation = self.activations[self.hidden_activation]
+
+        y = np.asarray(input, dtype=np.float32)
+        for w, b in zip(self.weights[:-1], self.biases[:-1]):
+            y = activation(np.dot(y, w) + b)
+
+        y = np.dot(y, self.weights[-1]) + self.biases[-1]
+
+        # softmax
+        y = np.exp(y - y.max(axis=1)[:, np.newaxis])
+        y /= y.sum(axis=1)[:, np.newaxis]
+
+        return y
+
+    def predict_normalise(self, input):
+        """ Normalises the input vectors in the same way as TheanoFFNN.predict_normalise and returns the output
+        of the last layer. Unlike TheanoFFNN, the input is not modified.
+
+        :param input: a matrix of input vectors (one per row)
+        :return: a matrix of class probabilities (one row per input vector)
+        """
+        input = np.asarray(input, dtype=np.float32) - self.input_m
+        input /= self.input_std
+        input *= self.amp_vec
+
+        return self.predict(input)
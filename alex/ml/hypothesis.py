@@ -7,6 +7,8 @@ value of a base type instance.
 """
 
 from __future__ import unicode_literals
+import heapq
+import math
 import operator
 
 from collections import namedtuple, OrderedDict
@@ -165,6 +167,55 @@ class NBList(Hypothesis):
         return self
 
 
+def kbest_hyp_indexes(alternatives):
+    """Enumerates the hypotheses of a confusion network in the order of
+    decreasing probability.
+
+    A hypothesis picks one alternative at each position of the network, its
+    probability is the product of the probabilities of the picked
+    alternatives. The hypotheses are generated lazily by a best-first search
+    over the alternatives ranked by their probability, so the caller can stop
+    after any number of hypotheses. Each hypothesis is generated exactly once.
+
+    :param alternatives: a list of lists of the probabilities of the
+        alternatives at each position of the network
+    :return: a generator of (log probability, hypothesis index) pairs, where
+        the hypothesis index is a tuple of the indexes of the picked
+        alternatives
+
+    """
+    ranked = []
+    for probs in alternatives:
+        if not probs:
+            return
+        # a stable sort, so the alternatives with the same probability keep
+        # their order
+        order = sorted(range(len(probs)), key=lambda i: -probs[i])
+        ranked.append((order, [math.log(probs[i]) if probs[i] > 0 else float('-inf') for i in order]))
+
+    # The heap entries are (-log prob, ranks, the last changed position). The
+    # hypotheses are derived from the best one by increasing the ranks. Only
+    # the positions from the last increased one onwards are increased, so
+    # every hypothesis has a single predecessor.
+    best_logprob = sum(logprobs[0] for order, logprobs in ranked)
+    heap = [(-best_logprob, (0, ) * len(ranked), 0)]
+    while heap:
+        neg_logprob, ranks, last = heapq.heappop(heap)
+
+        yield -neg_logprob, tuple(order[r] for r, (order, logprobs) in zip(ranks, ranked))
+
+        for i in xrange(last, len(ranks)):
+            order, logprobs = ranked[i]
+            r = ranks[i] + 1
+            if r < len(order):
+                if neg_logprob == float('inf') or logprobs[r] == float('-inf'):
+                    # a hypothesis with a zero probability alternative
+                    worse_neg_logprob = float('inf')
+                else:
+                    worse_neg_logprob = neg_logprob + logprobs[r - 1] - logprobs[r]
+                heapq.heappush(heap, (worse_neg_logprob, ranks[:i] + (r, ) + ranks[i + 1:], i))
+
+
 class ConfusionNetworkException(Exception):
     pass
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cPickle as pickle
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+if __name__ == '__main__':
+    import autopath
+from alex.ml.ffnn import TheanoFFNNPredictor
+
+
+class Elemwise(object):
+    def __init__(self, scalar_op):
+        self.scalar_op = scalar_op
+
+
+class Tanh(object):
+    pass
+
+
+class TestTheanoFFNNPredictor(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.n_inputs = 6
+        self.params = [rng.randn(6, 4).astype(np.float32), rng.randn(4).astype(np.float32),
+                       rng.randn(4, 2).astype(np.float32), rng.randn(2).astype(np.float32)]
+        self.input_m = rng.randn(6).astype(np.float32)
+        self.input_std = rng.rand(6).astype(np.float32) + 0.5
+        self.amp_vec = np.ones(6, dtype=np.float32)
+
+        # save the model in the same format as TheanoFFNN, the activation function is a Theano object
+        model = (self.input_m, self.input_std, self.params, [4, ], Elemwise(Tanh()), 6, 2, 1e-6, 0, 0, 1000,
+                 [1.0, ], self.amp_vec)
+        data = pickle.dumps(model, 0)
+        data = data.replace('c%s\nElemwise\n' % __name__, 'ctheano.tensor.elemwise\nElemwise\n')
+        data = data.replace('c%s\nTanh\n' % __name__, 'ctheano.scalar.basic\nTanh\n')
+
+        fd, self.model_file_name = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+    def tearDown(self):
+        os.remove(self.model_file_name)
+
+    def test_predict_normalise(self):
+        theano_imported = 'theano' in sys.modules
+
+        nn = TheanoFFNNPredictor()
+        nn.load(self.model_file_name)
+
+        self.assertEqual(nn.hidden_activation, 'tanh')
+        self.assertEqual('theano' in sys.modules, theano_imported)
+
+        x = np.random.RandomState(1).randn(10, self.n_inputs).astype(np.float32)
+        x_copy = x.copy()
+
+        y = (x - self.input_m) / self.input_std * self.amp_vec
+        y = np.tanh(np.dot(y, self.params[0]) + self.params[1])
+        y = np.exp(np.dot(y, self.params[2]) + self.params[3])
+        y /= y.sum(axis=1)[:, np.newaxis]
+
+        p = nn.predict_normalise(x)
+
+        self.assertEqual(p.shape, (10, 2))
+        self.assertEqual(p.dtype, np.float32)
+        self.assertTrue(np.allclose(p, y, atol=1e-6))
+        # the input must not be modified
+        self.assertTrue((x == x_copy).all())
+        # a batch gives the same results as the individual rows
+        for i in range(len(x)):
+            self.assertTrue(np.allclose(nn.predict_normalise(x[i:i + 1])[0], p[i], atol=1e-6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import math
+import random
+
+from itertools import islice, product
 from unittest import TestCase
 
-from alex.ml.hypothesis import ConfusionNetwork
+from alex.ml.hypothesis import ConfusionNetwork, kbest_hyp_indexes
 
 class TestConfusionNetwork(TestCase):
     def test_iter(self):
@@ -29,4 +33,39 @@ class TestConfusionNetwork(TestCase):
         dacn.remove(3)
 
         self.assertTrue(2 in dacn)
-        self.assertTrue(len(dacn) == 1)
\ No newline at end of file
+        self.assertTrue(len(dacn) == 1)
+
+
+class TestKBestHypIndexes(TestCase):
+    def test_kbest(self):
+        random.seed(0)
+        for i in range(20):
+            alternatives = [[random.random() for j in range(random.randint(1, 4))]
+                            for k in range(random.randint(1, 5))]
+            alternatives[0].append(0.0)
+
+            kbest = list(kbest_hyp_indexes(alternatives))
+
+            # all the hypotheses, each of them once
+            all_hyps = set(product(*[range(len(a)) for a in alternatives]))
+            self.assertEqual(len(kbest), len(all_hyps))
+            self.assertEqual(set(hyp_index for logprob, hyp_index in kbest), all_hyps)
+
+            # in the order of decreasing probability
+            probs = [math.exp(logprob) for logprob, hyp_index in kbest]
+            self.assertEqual(probs, sorted(probs, reverse=True))
+            for logprob, hyp_index in kbest:
+                prob = 1.0
+                for a, j in zip(alternatives, hyp_index):
+                    prob *= a[j]
+                self.assertAlmostEqual(math.exp(logprob), prob)
+
+    def test_kbest_lazy(self):
+        alternatives = [[0.1, 0.6, 0.3]] + [[0.05, 0.95]] * 100
+
+        self.assertEqual([hyp_index for logprob, hyp_index in islice(kbest_hyp_indexes(alternatives), 3)],
+                         [(1, ) * 101, (2, ) + (1, ) * 100, (0, ) + (1, ) * 100])
+
+    def test_kbest_empty(self):
+        self.assertEqual(list(kbest_hyp_indexes([])), [(0.0, ())])
+        self.assertEqual(list(kbest_hyp_indexes([[0.5], []])), [])
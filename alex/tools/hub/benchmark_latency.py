@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the latency between the end of the user speech and the first frame of the system prompt.
+
+It has two modes:
+
+  sessions  - reads the session.xml files of recorded sessions (call logs) and for each user turn computes the time
+              between the end of the user recording (logged by VAD at speech_end) and the start of the next system
+              recording (logged by VoipIO when the first TTS frame is played). Use it to compare the logs collected
+              with two versions of the system.
+
+  pipeline  - replays the speech_end messages through a chain of processes connected by pipes in the same way as
+              the VAD, ASR, SLU, DM, NLG and TTS components. Each stage forwards the message without any processing,
+              so the result is the latency added by the main loops themselves. The stages either sleep and poll
+              (the old main loop) or wait for their input (the new main loop). The CPU time burned by the stages
+              while idle is reported as well.
+
+Usage:
+
+    ./benchmark_latency.py sessions call_logs_dir [call_logs_dir ...]
+    ./benchmark_latency.py pipeline [-l sleep|wait] [-n messages] [-s sleep_time] [-t wait_timeout]
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+import xml.dom.minidom
+
+from alex.utils.fs import find
+from alex.utils.mproc import wait_for_input
+
+STAGES = ['VAD', 'ASR', 'SLU', 'DM', 'NLG', 'TTS']
+
+
+def print_stats(latencies):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    if not n:
+        print "No latencies measured."
+        return
+
+    print "Measured turns:        %d" % n
+    print "Mean latency:          %.2f ms" % (1000.0 * sum(latencies) / n)
+    print "Median latency:        %.2f ms" % (1000.0 * latencies[n / 2])
+    print "95th percentile:       %.2f ms" % (1000.0 * latencies[min(n - 1, int(0.95 * n))])
+    print "Max latency:           %.2f ms" % (1000.0 * latencies[-1])
+
+
+def session_latencies(session_fname):
+    """Returns the end-of-speech to first-system-frame latencies of all user turns of one session."""
+    doc = xml.dom.minidom.parse(session_fname)
+
+    events = []
+    for rec in doc.getElementsByTagName("rec"):
+        speaker = rec.parentNode.getAttribute("speaker")
+        if speaker == "user" and rec.hasAttribute("endtime"):
+            events.append((float(rec.getAttribute("endtime")), speaker))
+        elif speaker == "system" and rec.hasAttribute("starttime"):
+            events.append((float(rec.getAttribute("starttime")), speaker))
+    events.sort()
+
+    latencies = []
+    speech_end = None
+    for t, speaker in events:
+        if speaker == "user":
+            speech_end = t
+        elif speech_end is not None:
+            latencies.append(t - speech_end)
+            speech_end = None
+
+    return latencies
+
+
+def benchmark_sessions(dirs):
+    latencies = []
+    for d in dirs:
+        for session_fname in find(d, 'session.xml', mindepth=1):
+            try:
+                latencies.extend(session_latencies(session_fname))
+            except Exception as e:
+                print "Skipping %s: %s" % (session_fname, e)
+
+    print_stats(latencies)
+
+
+def stage(loop, conn_in, conn_out, sleep_time, wait_timeout, close_event):
+    while not close_event.is_set():
+        if loop == 'sleep':
+            time.sleep(sleep_time)
+        else:
+            wait_for_input([conn_in], wait_timeout)
+
+        while conn_in.poll():
+            conn_out.send(conn_in.recv())
+
+
+def benchmark_pipeline(loop, n_messages, sleep_time, wait_timeout):
+    close_event = multiprocessing.Event()
+
+    first_out, conn_in = multiprocessing.Pipe()
+    # keep all the ends open until the stages stop
+    connections = [first_out, conn_in]
+    processes = []
+    for s in STAGES:
+        conn_out, next_in = multiprocessing.Pipe()
+        connections.extend([conn_out, next_in])
+        p = multiprocessing.Process(target=stage, name=s,
+                                    args=(loop, conn_in, conn_out, sleep_time, wait_timeout, close_event))
+        p.start()
+        processes.append(p)
+        conn_in = next_in
+    last_in = conn_in
+
+    # let the stages start
+    time.sleep(0.5)
+
+    start = time.time()
+    latencies = []
+    for i in range(n_messages):
+        # the speech_end commands do not come at a regular pace
+        time.sleep(random.uniform(0.01, 0.05))
+
+        first_out.send(('speech_end', time.time()))
+        name, t = last_in.recv()
+        latencies.append(time.time() - t)
+    wall_time = time.time() - start
+
+    close_event.set()
+    for p in processes:
+        p.join()
+
+    cpu = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    print "Main loop:             %s" % loop
+    print_stats(latencies)
+    print "CPU time of stages:    %.3f s in %.3f s of wall time" % (cpu.ru_utime + cpu.ru_stime, wall_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    subparsers = parser.add_subparsers(dest='mode')
+
+    sessions_parser = subparsers.add_parser('sessions', help='analyse the logs of recorded sessions')
+    sessions_parser.add_argument('dirs', nargs='+',
+                                 help='directories with the call logs')
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='measure the latency of the component main loops')
+    pipeline_parser.add_argument('-l', '--loop', choices=['sleep', 'wait'], default='wait',
+                                 help='the type of the main loop: default %(default)s')
+    pipeline_parser.add_argument('-n', '--messages', type=int, default=500,
+                                 help='the number of the replayed speech_end messages: default %(default)s')
+    pipeline_parser.add_argument('-s', '--sleep-time', type=float, default=0.001,
+                                 help='the sleep time of the sleeping main loop: default %(default)s')
+    pipeline_parser.add_argument('-t', '--wait-timeout', type=float, default=0.1,
+                                 help='the timeout of the waiting main loop: default %(default)s')
+
+    args = parser.parse_args()
+
+    if args.mode == 'sessions':
+        benchmark_sessions(args.dirs)
+    else:
+        benchmark_pipeline(args.loop, args.messages, args.sleep_time, args.wait_timeout)
+
+
+if __name__ == '__main__':
+    main()
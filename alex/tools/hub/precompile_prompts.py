@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Renders the prompts of all the concrete dialogue acts of the NLG templates, i.e. of those without any slot values to
+fill in, with all their alternatives, and synthesizes them into the persistent TTS cache (see TTS['cache']).
+
+Run it after a deploy with the configuration of the hub, so that the first call does not wait for the synthesis of
+the common prompts. The hub does the same when it starts if TTS['precompile'] is set.
+
+Usage:
+
+    ./precompile_prompts.py -c config [config ...] [--no-tts] [-o prompts.txt]
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import codecs
+
+from alex.components.hub.tts import TTS, precompile_prompts
+from alex.components.nlg.common import nlg_factory, get_nlg_type
+from alex.utils.config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    parser.add_argument('-c', '--configs', nargs='+', help='additional configuration files')
+    parser.add_argument('-o', '--output', help='write the rendered prompts (dialogue act <TAB> text) to this file')
+    parser.add_argument('--no-tts', action='store_true', help='only render the prompts, do not synthesize them')
+
+    args = parser.parse_args()
+
+    cfg = Config.load_configs(args.configs)
+
+    nlg = nlg_factory(get_nlg_type(cfg), cfg)
+
+    if args.no_tts:
+        utterances = nlg.precompile()
+    else:
+        utterances = precompile_prompts(cfg, nlg, TTS(cfg, None, None, None, None))
+
+    print "Precompiled %d prompts" % len(utterances)
+
+    if args.output:
+        with codecs.open(args.output, 'w', 'utf-8') as f:
+            for da, text in utterances:
+                f.write('%s\t%s\n' % (da, text))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rebuilds the session.xml files of the call logs from their event journals (session.journal).
+
+The session logger writes session.xml periodically and when the session ends. If the hub crashes, the events logged
+after the last write are only in the journal. Run this script on the call logs before they are processed, e.g. by
+the call log index or the transcription jobs. By default, only the sessions whose journal was modified after their
+session.xml are rebuilt.
+
+Usage:
+
+    ./rebuild_session_xml.py [-a] [-n] call_logs_dir [call_logs_dir ...]
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import os
+
+from alex.utils.sessionlogger import JOURNAL_FNAME, rebuild_session_xml, session_xml_is_stale
+
+
+def find_session_dirs(root_dir):
+    """Returns the sorted list of the directories with an event journal under the directory."""
+    session_dirs = []
+    for root, dirnames, filenames in os.walk(root_dir, followlinks=True):
+        if JOURNAL_FNAME in filenames:
+            session_dirs.append(root)
+    return sorted(session_dirs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    parser.add_argument('dirs', nargs='+', help='directories with the call logs')
+    parser.add_argument('-a', '--all', action='store_true', help='rebuild all the sessions, not only the stale ones')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only print the sessions to be rebuilt')
+
+    args = parser.parse_args()
+
+    count = 0
+    for root_dir in args.dirs:
+        for session_dir in find_session_dirs(root_dir):
+            if args.all or session_xml_is_stale(session_dir):
+                print session_dir
+                if not args.dry_run:
+                    rebuild_session_xml(session_dir)
+                count += 1
+
+    print "Rebuilt %d sessions" % count if not args.dry_run else "%d sessions to be rebuilt" % count
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput of the FFNN VAD in frames per second on a single core.
+
+The audio is fed to FFNNVAD.decide in payloads of a fixed length as it is done by the VAD hub component.
+The reported time is the CPU time of the process, so the result corresponds to the throughput of one core.
+To compare two implementations, run the script on both revisions of the code with the same parameters.
+
+Usage:
+
+    ./benchmark_vad.py [-c config.cfg ...] [-w file.wav] [-s seconds] [-p payload_ms]
+
+If no wav file is given, random noise is used. The content of the audio does not influence the speed of the VAD.
+"""
+
+if __name__ == '__main__':
+    import autopath
+
+import argparse
+import time
+import wave
+
+import numpy as np
+
+from alex.components.vad.ffnn import FFNNVAD
+from alex.utils.config import Config
+
+
+def load_audio(wav_file, sample_rate, seconds):
+    if wav_file:
+        wav = wave.open(wav_file, 'r')
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != sample_rate:
+            raise Exception('The input wave must be 16bit mono at %d Hz' % sample_rate)
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        wav.close()
+
+        n_repeat = int(np.ceil(float(seconds * sample_rate) / len(audio)))
+        audio = np.tile(audio, n_repeat)
+    else:
+        rng = np.random.RandomState(0)
+        audio = (rng.randn(seconds * sample_rate) * 2000).astype(np.int16)
+
+    return audio[:seconds * sample_rate]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__)
+
+    parser.add_argument('-c', '--configs', nargs='+', default=[],
+                        help='additional configuration files')
+    parser.add_argument('-w', '--wav', default=None,
+                        help='a 16bit mono wav file with the audio to be processed')
+    parser.add_argument('-s', '--seconds', type=int, default=60,
+                        help='the length of the processed audio in seconds: default %(default)s')
+    parser.add_argument('-p', '--payload-ms', type=int, default=10,
+                        help='the length of one payload passed to decide() in ms: default %(default)s')
+
+    args = parser.parse_args()
+
+    cfg = Config.load_configs(args.configs, log=False)
+    sample_rate = cfg['Audio']['sample_rate']
+    framesize = cfg['VAD']['ffnn']['framesize']
+    frameshift = cfg['VAD']['ffnn']['frameshift']
+
+    start = time.time()
+    vad = FFNNVAD(cfg)
+    print "VAD start-up time:     %.3f s" % (time.time() - start)
+
+    data = load_audio(args.wav, sample_rate, args.seconds).tostring()
+    payload = 2 * sample_rate * args.payload_ms / 1000
+
+    start = time.clock()
+    for i in range(0, len(data), payload):
+        vad.decide(data[i:i + payload])
+    cpu_time = time.clock() - start
+
+    n_frames = (len(data) / 2 - framesize) / frameshift
+    print "Processed frames:      %d" % n_frames
+    print "CPU time:              %.3f s" % cpu_time
+    print "Frames per second:     %.0f" % (n_frames / cpu_time)
+    print "Real time factor:      %.4f" % (cpu_time / args.seconds)
+
+
+if __name__ == '__main__':
+    main()
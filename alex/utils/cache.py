@@ -9,14 +9,17 @@ import functools
 import os
 import os.path
 import cPickle as pickle
-import fcntl
 import hashlib
+import mmap
+import tempfile
+import time
 
 from itertools import ifilterfalse
 from heapq import nsmallest
 from operator import itemgetter
 
 persistent_cache_directory = '~/.alex_persistent_cache'
+persistent_cache_max_size = 512 * 1024 ** 2
 
 
 class Counter(dict):
@@ -154,46 +157,222 @@ def lfu_cache(maxsize=100):
     return decorator
 
 
-def get_persitent_cache_content(key):
-    key_name = os.path.join(persistent_cache_directory, '_'.join([str(i) for i in key]).replace(' ', '_'))
-    
-    try:
-        # you cannot have exlusive lock if you don't ask for writing permissions
-        # therefor use "r+" mode
-        f = open(key_name, 'r+b')
-        fcntl.lockf(f, fcntl.LOCK_EX)
-    except IOError:
-        raise KeyError
+class PersistentCache(object):
+    """Size bounded cache of strings and picklable objects on the disk.
 
-    data = pickle.load(f)
+    The entries are addressed by the SHA1 hash of their keys and stored in 256 subdirectories named after the first
+    two digits of the hash. Strings, e.g. the synthesized audio, are stored as they are in *.raw files, so they can
+    be read or memory mapped without any decoding, other objects are pickled into *.pkl files. A new entry is written
+    into a temporary file first and then renamed, so that a concurrent reader never sees an incomplete entry.
 
-    fcntl.lockf(f, fcntl.LOCK_UN)
-    f.close()
+    The modification time of an entry is updated on every hit. When the total size of the entries exceeds max_size,
+    the least recently used entries are removed until the size drops below 90 % of max_size. The size is counted
+    by every process using the cache separately from the files it writes, and it is corrected by scanning
+    the directory whenever the entries are evicted.
 
-    return data
+    Statistics: hits, misses, bytes_read, bytes_written and evictions, see stats().
+    """
+    raw_suffix = '.raw'
+    pickle_suffix = '.pkl'
+    tmp_prefix = '.tmp_'
+    # the age in seconds after which a temporary file is considered to be left behind by a crashed writer
+    stale_tmp_age = 3600
 
+    def __init__(self, directory, max_size):
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
 
-def set_persitent_cache_content(key, value):
-    key_name = os.path.join(persistent_cache_directory,'_'.join([str(i) for i in key]).replace(' ', '_'))
-    
-    f = open(key_name, 'wb')
-    fcntl.lockf(f, fcntl.LOCK_EX)
+        self.size = None
+        self.hits = self.misses = self.bytes_read = self.bytes_written = self.evictions = 0
 
-    data = pickle.dump(value, f)
+    def path(self, key):
+        h = hashlib.sha1(key).hexdigest()
+        return os.path.join(self.directory, h[:2], h[2:])
 
-    fcntl.lockf(f, fcntl.LOCK_UN)
-    f.close()
+    def get(self, key, mapped=False):
+        """Returns the cached value of the key.
+
+        The strings are read through a memory map of their file. If mapped is set, the read-only map itself is
+        returned instead of a copy of the string, it supports len(), slicing and the buffer interface, e.g.
+        numpy.frombuffer(), and it stays valid even if the entry is evicted in the meantime.
+
+        :raise KeyError: if the key is not in the cache
+        """
+        path = self.path(key)
+        for suffix in [self.raw_suffix, self.pickle_suffix]:
+            try:
+                with open(path + suffix, 'rb') as f:
+                    if suffix == self.raw_suffix:
+                        data = self._map(f)
+                        if not mapped:
+                            data = data[:]
+                    else:
+                        data = f.read()
+            except IOError:
+                continue
+
+            try:
+                # mark the entry as recently used
+                os.utime(path + suffix, None)
+            except OSError:
+                pass
+
+            self.hits += 1
+            self.bytes_read += len(data)
+            return data if suffix == self.raw_suffix else pickle.loads(data)
+
+        self.misses += 1
+        raise KeyError(key)
+
+    @staticmethod
+    def _map(f):
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # an empty file cannot be mapped
+            return b''
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+    def set(self, key, value):
+        if isinstance(value, str):
+            path, data = self.path(key) + self.raw_suffix, value
+        else:
+            path, data = self.path(key) + self.pickle_suffix, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(dirname):
+                    raise
+
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=self.tmp_prefix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+        self.bytes_written += len(data)
+
+        if self.size is None:
+            self.size = sum(size for path, size, mtime in self.entries())
+        else:
+            self.size += len(data)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def files(self):
+        """Yields tuples (path, size, modification time) of all files in the shards, including the temporary ones."""
+        if not os.path.isdir(self.directory):
+            return
+
+        for shard in os.listdir(self.directory):
+            shard = os.path.join(self.directory, shard)
+            if len(os.path.basename(shard)) != 2 or not os.path.isdir(shard):
+                continue
+
+            for name in os.listdir(shard):
+                path = os.path.join(shard, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    # evicted by another process
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def entries(self):
+        """Yields tuples (path, size, modification time) of all entries."""
+        for path, size, mtime in self.files():
+            if path.endswith((self.raw_suffix, self.pickle_suffix)):
+                yield path, size, mtime
+
+    def evict(self):
+        """Removes the least recently used entries until the size of the cache drops below 90 % of max_size.
+
+        The temporary files older than stale_tmp_age, left behind by the writers which crashed before renaming them,
+        are removed as well.
+        """
+        entries = []
+        stale_mtime = time.time() - self.stale_tmp_age
+        for path, size, mtime in self.files():
+            if path.endswith((self.raw_suffix, self.pickle_suffix)):
+                entries.append((path, size, mtime))
+            elif os.path.basename(path).startswith(self.tmp_prefix) and mtime < stale_mtime:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        entries.sort(key=itemgetter(2))
+        self.size = sum(size for path, size, mtime in entries)
+
+        for path, size, mtime in entries:
+            if self.size <= 0.9 * self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+            self.size -= size
+
+    def clear(self):
+        for path, size, mtime in list(self.entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'evictions': self.evictions,
+            'size': self.size,
+        }
+
+
+_persistent_cache = None
+
+
+def get_persistent_cache():
+    """Returns the cache shared by all the functions decorated with persistent_cache."""
+    global _persistent_cache
+
+    if _persistent_cache is None:
+        _persistent_cache = PersistentCache(persistent_cache_directory, persistent_cache_max_size)
+
+    return _persistent_cache
+
+
+def configure_persistent_cache(directory=None, max_size=None):
+    """Sets the directory and the maximum size in bytes of the cache used by persistent_cache."""
+    global persistent_cache_directory, persistent_cache_max_size, _persistent_cache
+
+    if directory is not None:
+        persistent_cache_directory = directory
+    if max_size is not None:
+        persistent_cache_max_size = max_size
+
+    _persistent_cache = None
 
 
 def persistent_cache(method=False, file_prefix='', file_suffix=''):
     '''Persistent cache decorator.
 
-    It grows indefinitely.
+    The results are stored in the cache returned by get_persistent_cache(), its size is limited and the least
+    recently used results are evicted.
     Arguments to the cached function must be hashable.
     Cache performance statistics stored in f.hits and f.misses.
 
     '''
-    sha = hashlib.sha1()
     def decorator(user_function):
         @functools.wraps(user_function)
         def wrapper(*args, **kwds):
@@ -209,17 +388,18 @@ def persistent_cache(method=False, file_prefix='', file_suffix=''):
 
             key += (file_suffix,)
 
-            key = (hashlib.sha224(str(key)).hexdigest(),)
+            key = repr(key)
 
+            cache = get_persistent_cache()
             try:
-                result = get_persitent_cache_content(key)
+                result = cache.get(key)
                 wrapper.hits += 1
             except KeyError:
                 result = user_function(*args, **kwds)
                 wrapper.misses += 1
 
                 # record this key
-                set_persitent_cache_content(key, result)         
+                cache.set(key, result)
 
             return result
 
@@ -229,10 +409,6 @@ def persistent_cache(method=False, file_prefix='', file_suffix=''):
 
     return decorator
 
-persistent_cache_directory = os.path.expanduser(persistent_cache_directory)
-if not os.path.exists(persistent_cache_directory):
-    os.makedirs(persistent_cache_directory)
-
 if __name__ == '__main__':
     # pylint: disable-msg=E1101
 
@@ -373,6 +373,8 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
 
     The experience suggests that our MFFC features are worse than the features generated by HCopy.
 
+    The features for all frames of a wav file are computed at once when the file is first accessed.
+
     """
 
     def __init__(self, windowsize=250000, targetrate=100000, filter=None,
@@ -410,17 +412,17 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
 
             # open the param file
             try:
-                self.last_param_file_features = wave.open(param_file_name, 'r')
+                wav = wave.open(param_file_name, 'r')
             except AttributeError:
                 print "Error opening file:", param_file_name
 
-            if self.last_param_file_features.getnchannels() != 1:
+            if wav.getnchannels() != 1:
                 raise Exception('Input wave is not in mono')
 
-            if self.last_param_file_features.getsampwidth() != 2:
+            if wav.getsampwidth() != 2:
                 raise Exception('Input wave is not in 16bit')
 
-            sample_rate = self.last_param_file_features.getframerate()
+            sample_rate = wav.getframerate()
             self.frame_size = int(sample_rate * self.windowsize / 10000000)
             if self.frame_size > 1024:
                 self.frame_size = 2048
@@ -438,17 +440,26 @@ class MLFMFCCOnlineAlignedArray(MLFFeaturesAlignedArray):
                                                usedelta=self.usedelta, useacc=self.useacc,
                                                n_last_frames=self.n_last_frames, mel_banks_only = self.mel_banks_only)
 
+            samples = numpy.frombuffer(wav.readframes(wav.getnframes()), dtype=numpy.int16)
+            wav.close()
+
+            # Compute the features for all frames of the file at once. The frame i is centered at the sample
+            # i * frame_shift, the initial frames which would start before the first sample start at the first sample.
+            half_frame = int(self.frame_size / 2)
+            n_clamped = -(-half_frame / self.frame_shift)
+            if len(samples) >= self.frame_size:
+                clamped_frames = numpy.tile(samples[:self.frame_size], (n_clamped, 1))
+            else:
+                clamped_frames = numpy.zeros((0, self.frame_size), dtype=numpy.int16)
+
+            self.last_param_file_features = numpy.vstack(
+                [self.mfcc_front_end.param_frames(clamped_frames),
+                 self.mfcc_front_end.param_batch(samples[n_clamped * self.frame_shift - half_frame:],
+                                                 self.frame_shift)])
+
         # print "FS", self.frame_size
-        self.last_param_file_features.setpos(max(frame_id * self.frame_shift - int(self.frame_size / 2), 0))
-        frame = self.last_param_file_features.readframes(self.frame_size)
-        # print "LN", len(frame)
-
-        frame = numpy.frombuffer(frame, dtype=numpy.int16)
-
-        try:
-            mfcc_params = self.mfcc_front_end.param(frame)
-        except ValueError:
-            print file_name, frame_id, len(frame)
-            raise
-            
-        return mfcc_params
+        if frame_id >= len(self.last_param_file_features):
+            print file_name, frame_id, len(self.last_param_file_features)
+            raise ValueError("MLFMFCCOnlineAlignedArray: the frame %d is beyond the end of the file" % frame_id)
+
+        return self.last_param_file_features[frame_id]
@@ -3,8 +3,8 @@
 
 import numpy as np
 
+from numpy.lib.stride_tricks import as_strided
 from scipy.fftpack import dct
-from collections import deque
 
 
 class MFCCKaldi:
@@ -83,8 +83,11 @@ class MFCCFrontEnd:
         self.prior = 0.0
 
         self.n_last_frames = n_last_frames
-        self.mfcc_queue = deque(maxlen=4 + n_last_frames)
-        self.mfcc_delta_queue = deque(maxlen=4 + n_last_frames)
+        # the last MFCC and delta coefficients (one frame per row) used to compute the delta, acceleration
+        # and last frames coefficients of the following frames
+        self.history_length = 4 + n_last_frames
+        self.mfcc_history = np.zeros((0, self.get_base_dim()))
+        self.mfcc_delta_history = np.zeros((0, self.get_base_dim()))
 
         self.init_hamming()
         self.init_mel_filter_bank()
@@ -136,6 +139,20 @@ class MFCCFrontEnd:
         self.mel_filter_bank = filterMatrix.transpose()
 #    print "SMFB", self.mel_filter_bank.shape
 
+        # the indexes and weights of the non-zero bands of all filters concatenated, and the offsets
+        # of the individual bands
+        n_bins = self.mel_filter_bank.shape[0]
+        bands = [np.arange(min(start, n_bins), min(end, n_bins))
+                 for start, end in zip(centerIndex[:-2], centerIndex[2:])]
+        band_lengths = np.array([len(band) for band in bands])
+
+        self.mel_band_index = np.concatenate(bands)
+        self.mel_band_weights = np.concatenate(
+            [self.mel_filter_bank[band, i] for i, band in enumerate(bands)])
+        self.mel_band_offsets = np.minimum(np.cumsum(band_lengths) - band_lengths,
+                                           max(len(self.mel_band_index) - 1, 0))
+        self.mel_band_empty = band_lengths == 0
+
     def init_cep_liftering_weights(self):
         cep_lift_weights = np.zeros((self.numceps, ))
         a = np.pi / self.ceplifter
@@ -145,94 +162,176 @@ class MFCCFrontEnd:
 
         self.cep_lift_weights = cep_lift_weights
 
-    def preemphasis(self, frame):
-        out_frame = np.zeros_like(frame)
-        out_frame[0] = frame[0] - self.preemcoef * self.prior
-        for i in range(1, len(frame)):
-            out_frame[i] = frame[i] - self.preemcoef * frame[i - 1]
+    def preemphasis(self, frames):
+        """Apply the pre-emphasis filter to consecutive frames stored as rows of a matrix.
+
+        As in the original per-frame implementation, the first sample of each frame is filtered
+        with the last sample of the previous frame.
+        """
+        priors = np.empty(frames.shape[0])
+        priors[0] = self.prior
+        priors[1:] = frames[:-1, -1]
+
+        out_frames = np.empty_like(frames)
+        out_frames[:, 0] = frames[:, 0] - self.preemcoef * priors
+        out_frames[:, 1:] = frames[:, 1:] - self.preemcoef * frames[:, :-1]
+
+        self.prior = frames[-1, -1]
+
+        return out_frames
+
+    def mel_spectrum(self, power_spectrum):
+        """Apply the mel filter bank to the rows of the power spectrum matrix.
+
+        Each triangular filter is applied only to its non-zero band and the bands are summed
+        sequentially. Unlike a BLAS dot product, the result for a row does not depend on the number
+        of rows, therefore the results for a single frame and for a batch of frames are identical.
+        """
+        weighted = power_spectrum[:, self.mel_band_index] * self.mel_band_weights
+        mel_spectrum = np.add.reduceat(weighted, self.mel_band_offsets, axis=1)
+        mel_spectrum[:, self.mel_band_empty] = 0.0
 
-        self.prior = frame[-1]
+        return mel_spectrum
 
-        return out_frame
+    def get_base_dim(self):
+        """Returns the number of the MFCC (or mel filter bank) coefficients of one frame."""
+        if self.mel_banks_only:
+            return self.numchans
+        return min(self.numceps, self.numchans - 1) + (1 if self.usec0 else 0)
+
+    def get_dim(self):
+        """Returns the length of the feature vectors computed by the front-end."""
+        n_streams = 1
+        if not self.mel_banks_only:
+            n_streams += (1 if self.usedelta else 0) + (1 if self.useacc else 0)
+
+        return self.get_base_dim() * (n_streams + self.n_last_frames)
 
     def param(self, frame):
         """Compute the MFCC coefficients in a way similar to the HTK."""
+        return self.param_frames(np.asarray(frame)[np.newaxis, :])[0]
+
+    def param_batch(self, samples, frameshift=None):
+        """Compute the MFCC coefficients for all frames in a buffer of samples.
+
+        The frames of length framesize are taken every frameshift samples (10 ms by default)
+        as strided views of the buffer. Incomplete frames at the end of the buffer are ignored.
+
+        The result is a (n_frames x dim) matrix which is identical to calling param() on each frame
+        in turn, including the state (pre-emphasis prior, delta and acceleration history) carried
+        over between consecutive calls.
+        """
+        samples = np.ascontiguousarray(samples)
+        if frameshift is None:
+            frameshift = int(self.sourcerate / 100)
+
+        if len(samples) < self.framesize:
+            return np.zeros((0, self.get_dim()), dtype=np.float32)
+
+        n_frames = (len(samples) - self.framesize) / frameshift + 1
+        frames = as_strided(samples,
+                            shape=(n_frames, self.framesize),
+                            strides=(samples.strides[0] * frameshift, samples.strides[0]))
+
+        return self.param_frames(frames)
+
+    def param_frames(self, frames):
+        """Compute the MFCC coefficients for consecutive frames stored as rows of a matrix."""
+        frames = np.asarray(frames)
+        n_frames = frames.shape[0]
+        if n_frames == 0:
+            return np.zeros((0, self.get_dim()), dtype=np.float32)
+
         # zero mean
         if self.zmeansource:
-            frame = frame - np.mean(frame)
+            frames = frames - np.mean(frames, axis=1)[:, np.newaxis]
         # preemphasis
-        frame = self.preemphasis(frame)
+        frames = self.preemphasis(frames)
         # apply hamming window
         if self.usehamming:
-            frame = self.hamming * frame
+            frames = self.hamming * frames
 
-        complex_spectrum = np.fft.rfft(frame)
-#    print "LCS", len(complex_spectrum)
+        complex_spectrum = np.fft.rfft(frames, axis=1)
         power_spectrum = complex_spectrum.real * complex_spectrum.real + \
             complex_spectrum.imag * complex_spectrum.imag
         # compute only power spectrum if required
         if not self.usepower:
             power_spectrum = np.sqrt(power_spectrum)
 
-#    print "SPS",power_spectrum.shape
-        mel_spectrum = np.dot(power_spectrum, self.mel_filter_bank)
+        mel_spectrum = self.mel_spectrum(power_spectrum)
         # apply mel floor
-        for i in range(len(mel_spectrum)):
-            if mel_spectrum[i] < 1.0:
-                mel_spectrum[i] = 1.0
-        mel_spectrum = np.log(mel_spectrum)
-        
+        mel_spectrum = np.log(np.maximum(mel_spectrum, 1.0))
+
+        n_hist = len(self.mfcc_history)
+        ends = np.arange(n_hist, n_hist + n_frames)
+
         if self.mel_banks_only:
-            mfcc = mel_spectrum
-            self.mfcc_queue.append(mel_spectrum)
+            mfccs = mel_spectrum
         else:
             cepstrum = dct(mel_spectrum, type=2, norm='ortho')
-            c0 = cepstrum[0]
-            htk_cepstrum = cepstrum[1:self.numceps + 1]
+            c0 = cepstrum[:, 0:1]
+            htk_cepstrum = cepstrum[:, 1:self.numceps + 1]
             # cepstral liftering
-            cep_lift_mfcc = self.cep_lift_weights * htk_cepstrum
+            mfccs = self.cep_lift_weights * htk_cepstrum
 
             if self.usec0:
-                mfcc = np.append(cep_lift_mfcc, c0)
-            else:
-                mfcc = cep_lift_mfcc
-
-            # compute delta and acceleration coefficients if requested
-            self.mfcc_queue.append(mfcc)
+                mfccs = np.hstack((mfccs, c0))
 
-#        print len(self.mfcc_queue)
+        features = [mfccs]
+        mfcc_all = np.vstack((self.mfcc_history, mfccs))
 
+        if not self.mel_banks_only:
+            # compute delta and acceleration coefficients if requested
             if self.usedelta:
-#      print "LMQ", len(self.mfcc_queue)
-                if len(self.mfcc_queue) >= 2:
-                    delta = np.zeros_like(mfcc)
-                    for i in range(1, len(self.mfcc_queue)):
-                        delta += self.mfcc_queue[i] - self.mfcc_queue[i - 1]
-                    delta /= len(self.mfcc_queue) - 1
-
-                    self.mfcc_delta_queue.append(delta)
-                else:
-                    delta = np.zeros_like(mfcc)
+                deltas, has_delta = self._window_delta(mfcc_all, ends, self.history_length)
+                features.append(deltas)
 
-            if self.useacc:
-                if len(self.mfcc_delta_queue) >= 2:
-                    acc = np.zeros_like(mfcc)
-                    for i in range(1, len(self.mfcc_delta_queue)):
-                        acc += self.mfcc_delta_queue[i] - \
-                            self.mfcc_delta_queue[i - 1]
-                    acc /= len(self.mfcc_delta_queue) - 1
-                else:
-                    acc = np.zeros_like(mfcc)
+                delta_ends = len(self.mfcc_delta_history) - 1 + np.cumsum(has_delta)
+                delta_all = np.vstack((self.mfcc_delta_history, deltas[has_delta]))
+                self.mfcc_delta_history = delta_all[-self.history_length:].copy()
 
-            if self.usedelta:
-                mfcc = np.append(mfcc, delta)
             if self.useacc:
-                mfcc = np.append(mfcc, acc)
-
-        for i in range(self.n_last_frames):
-            if len(self.mfcc_queue) > i + 1 :
-                mfcc = np.append(mfcc, self.mfcc_queue[-1-i-1])
-            else:
-                mfcc = np.append(mfcc, np.zeros_like(self.mfcc_queue[-1]))
-
-        return mfcc.astype(np.float32)
+                if self.usedelta:
+                    accs, _ = self._window_delta(delta_all, delta_ends, self.history_length)
+                else:
+                    accs = np.zeros_like(mfccs)
+                features.append(accs)
+
+        if self.n_last_frames:
+            prev = ends[:, np.newaxis] - 1 - np.arange(self.n_last_frames)
+            last = mfcc_all[np.maximum(prev, 0)]
+            last[prev < 0] = 0.0
+            features.append(last.reshape(n_frames, -1))
+
+        self.mfcc_history = mfcc_all[-self.history_length:].copy()
+
+        return np.hstack(features).astype(np.float32)
+
+    @staticmethod
+    def _window_delta(seq, ends, maxlen):
+        """Compute the delta coefficients for the rows of seq at the ends indexes.
+
+        The delta for the row at index end is the mean of the differences of the consecutive rows
+        in the window of at most maxlen rows ending at end. This corresponds to the deque based
+        computation of the per-frame implementation and the differences are accumulated in the same
+        order to give identical results.
+
+        Returns the delta coefficients and a boolean mask of the rows for which the window had
+        at least two rows, i.e. for which the delta was defined.
+        """
+        lengths = np.minimum(ends + 1, maxlen)
+        has_delta = lengths >= 2
+
+        delta = np.zeros((len(ends), seq.shape[1]))
+        for k in range(1, maxlen):
+            i = ends - maxlen + 1 + k
+            valid = i >= 1
+            if not valid.any():
+                continue
+            i = np.maximum(i, 1)
+            delta += np.where(valid[:, np.newaxis], seq[i] - seq[i - 1], 0.0)
+
+        delta /= np.maximum(lengths - 1, 1)[:, np.newaxis]
+        delta[~has_delta] = 0.0
+
+        return delta, has_delta
@@ -8,8 +8,10 @@ Implements useful classes for handling multiprocessing implementation of
 the Alex system.
 """
 
+import errno
 import functools
 import multiprocessing
+import select
 import threading
 import fcntl
 import time
@@ -127,6 +129,26 @@ def etime(name="Time",min_t=0.300):
 
     return decorator
 
+def wait_for_input(connections, timeout):
+    """Blocks until some of the connections have data to be received or until the timeout (in seconds) expires.
+
+    The connections can be any objects with the fileno() method, e.g. the ends of multiprocessing pipes. This
+    replaces sleeping and polling in the main loops of the components so that they wake up as soon as a message
+    arrives. The timeout only bounds the time before the caller checks its close event or its timers.
+
+    Returns the list of the connections which are ready to be read.
+    """
+    try:
+        ready, _, _ = select.select(connections, [], [], timeout)
+    except select.error as e:
+        # a signal interrupted the wait
+        if e.args[0] == errno.EINTR:
+            return []
+        raise
+
+    return ready
+
+
 class InstanceID(object):
     """
     This class provides unique ids to all instances of objects inheriting
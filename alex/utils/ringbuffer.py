@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+class RingBuffer(object):
+    """A preallocated ring buffer of samples stored in a NumPy array.
+
+    The buffer is mirrored: every sample is stored twice, at the position i and at the position i + size.
+    As a result, the unread samples always form a contiguous region of the array and they can be
+    accessed as a view without any copying, e.g. to cut them into overlapping frames.
+
+    If more samples than the size of the buffer are written, the buffer grows.
+    """
+
+    def __init__(self, size, dtype=np.int16):
+        self.size = size
+        self.dtype = dtype
+
+        self.buffer = np.zeros((2 * size, ), dtype=dtype)
+        self.read_pos = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self, size):
+        samples = self.peek()
+
+        self.buffer = np.zeros((2 * size, ), dtype=self.dtype)
+        self.buffer[:self.length] = samples
+        self.buffer[size:size + self.length] = samples
+        self.size = size
+        self.read_pos = 0
+
+    def write(self, data):
+        """Appends the samples at the end of the buffer."""
+        n = len(data)
+        if self.length + n > self.size:
+            self._grow(max(2 * self.size, self.length + n))
+
+        start = (self.read_pos + self.length) % self.size
+        head = min(n, self.size - start)
+
+        self.buffer[start:start + head] = data[:head]
+        self.buffer[start + self.size:start + self.size + head] = data[:head]
+        self.buffer[:n - head] = data[head:]
+        self.buffer[self.size:self.size + n - head] = data[head:]
+
+        self.length += n
+
+    def peek(self, n=None):
+        """Returns a view of the first n unread samples (all unread samples by default)."""
+        if n is None or n > self.length:
+            n = self.length
+
+        return self.buffer[self.read_pos:self.read_pos + n]
+
+    def consume(self, n):
+        """Drops the first n unread samples."""
+        n = min(n, self.length)
+
+        self.read_pos = (self.read_pos + n) % self.size
+        self.length -= n
+
+    def clear(self):
+        self.read_pos = 0
+        self.length = 0
@@ -3,7 +3,9 @@
 # This code is mostly PEP8-compliant. See
 # http://www.python.org/dev/peps/pep-0008.
 
+import json
 import multiprocessing
+import Queue
 import time
 import os
 import os.path
@@ -20,6 +22,12 @@ from alex.utils.exdec import catch_ioerror
 from alex.utils.exceptions import SessionLoggerException, SessionClosedException
 from alex.utils.procname import set_proc_name
 
+SESSION_XML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<dialogue>
+</dialogue>
+"""
+JOURNAL_FNAME = 'session.journal'
+
 
 class SessionLogger(multiprocessing.Process):
     """
@@ -30,7 +38,21 @@ class SessionLogger(multiprocessing.Process):
 
     Times should be in seconds from the beginning of the dialogue.
 
+    The events are appended to a journal (session.journal) in the session directory as they come. The session.xml
+    file is written at most once per session_xml_write_interval seconds while the session goes on and when it ends.
+    If the logger does not end the session properly, e.g. because it crashes, the events logged after the last write
+    are missing in session.xml, it can be rebuilt from the journal by rebuild_session_xml() or by
+    alex/tools/hub/rebuild_session_xml.py.
+
     """
+    # the longest time in seconds between syncing the journal to the disk
+    journal_sync_interval = 1.0
+    # the longest time in seconds between writing the events logged during the session into session.xml
+    session_xml_write_interval = 10.0
+    # the time in seconds between the reports of the statistics of the logger
+    stats_interval = 60.0
+    # the statistics are reported as a warning if a command waited longer than this (in seconds)
+    lag_warning_threshold = 1.0
 
     def __init__(self):
         multiprocessing.Process.__init__(self)
@@ -39,6 +61,9 @@ class SessionLogger(multiprocessing.Process):
         self._session_start_time = time.time()
         self._is_open = False   # whether the session is started
         self._doc = None
+        self._journal = None
+        # whether there are events which are not written into session.xml yet
+        self._session_xml_dirty = False
 
         # filename of the started recording
         self._rec_started = {}
@@ -46,6 +71,11 @@ class SessionLogger(multiprocessing.Process):
         self.queue = multiprocessing.Queue()
         self._queue = deque()
 
+        # command name -> [count, total latency, max latency]
+        self._command_stats = {}
+        self._backlog_max = 0
+        self._latency_max = 0.0
+
     def set_close_event(self, close_event):
         self.close_event = close_event
 
@@ -90,22 +120,26 @@ class SessionLogger(multiprocessing.Process):
 
     @etime('seslog_session_start')
     def _session_start(self, output_dir):
-        """ Records the target directory and creates the template call log.
+        """ Records the target directory and creates the template call log and an empty event journal.
+
+        The session.xml of the previous session is written first.
         """
+        if self._is_open:
+            self._finalize()
 
         self._session_dir_name = output_dir
 
         f = open(os.path.join(self._session_dir_name, 'session.xml'), "w", 0)
-        f.write("""<?xml version="1.0" encoding="UTF-8"?>
-<dialogue>
-</dialogue>
-""")
+        f.write(SESSION_XML_TEMPLATE)
         f.write('\n')
         f.close()
 
         self._session_start_time = time.time()
         self._read_session_xml()
+        self._open_journal()
         self._is_open = True
+        self._session_xml_dirty = False
+        self._session_xml_time = time.time()
 
     def _flush(self):
         # close all opened rec_started files
@@ -114,6 +148,22 @@ class SessionLogger(multiprocessing.Process):
             if self._rec_started[f]:
                 self._rec_end(f)
 
+    def _close_session(self):
+        """ Writes the session xml file of the open session, if any, when the logger exits.
+        """
+        if self._is_open:
+            try:
+                self._flush()
+                self._finalize()
+            except (IOError, OSError) as e:
+                print "Exception when writing the session log:", e
+
+    def _finalize(self):
+        """ Writes the session xml file and closes the journal of the current session.
+        """
+        self._write_session_xml()
+        self._close_journal()
+
     @etime('seslog_session_end')
     def _session_end(self):
         """
@@ -126,7 +176,7 @@ class SessionLogger(multiprocessing.Process):
         """
 
         self._flush()
-        self._write_session_xml()
+        self._finalize()
         self._session_dir_name = ''
         self._doc = None
         self._is_open = False
@@ -149,9 +199,29 @@ class SessionLogger(multiprocessing.Process):
             self._doc = xml.dom.minidom.parse(f)
             # fcntl.lockf(f, fcntl.LOCK_UN)
 
+        self._index_session_xml()
+
+    def _index_session_xml(self):
+        """Indexes the elements of self._doc looked up by the logged events so that the document is not searched.
+        """
+        self._turns = list(self._doc.getElementsByTagName("turn"))
+        self._turn_counts = {}
+        for turn in self._turns:
+            speaker = turn.getAttribute("speaker")
+            self._turn_counts[speaker] = self._turn_counts.get(speaker, 0) + 1
+        self._recs = dict((el.getAttribute("fname"), el) for el in self._doc.getElementsByTagName("rec"))
+        self._dialogue_recs = dict((el.getAttribute("fname"), el)
+                                   for el in self._doc.getElementsByTagName("dialogue_rec"))
+
     def _write_session_xml(self):
         """Saves the self._doc self._document into the session xml file.
+
+        It is called when the session ends and periodically during the session, see _update_session_xml(). It can be
+        also requested at any time by calling write_session_xml().
         """
+        self._session_xml_dirty = False
+        self._session_xml_time = time.time()
+
         with open(os.path.join(self._session_dir_name, 'session.xml'), "r+", 0) as f:
             # fcntl.lockf(self._f, fcntl.LOCK_EX)
             f.seek(0)
@@ -169,21 +239,100 @@ class SessionLogger(multiprocessing.Process):
             f.write(x)
             # fcntl.lockf(f, fcntl.LOCK_UN)
 
-    @etime('seslog_config')
-    @catch_ioerror
-    def _config(self, cfg):
-        """ Adds the config tag to the session log.
+    def _update_session_xml(self):
+        """Writes the session xml file if some events were logged since it was written session_xml_write_interval
+        seconds ago, so that the readers of the call logs see the session even if the logger crashes.
+        """
+        if self._is_open and self._session_xml_dirty and \
+                time.time() - self._session_xml_time > self.session_xml_write_interval:
+            try:
+                self._write_session_xml()
+            except (IOError, OSError) as e:
+                print "Exception when writing the session log:", e
+
+    ########################################################################
+    ## The event journal.                                                 ##
+    ##                                                                    ##
+    ## Every logged event is converted into a record of plain data which  ##
+    ## is applied to self._doc by the corresponding _apply_* method and   ##
+    ## appended to the journal as a line of JSON. The journal is flushed  ##
+    ## after every event and synced to the disk at most once per          ##
+    ## journal_sync_interval seconds. session.xml is written at the end   ##
+    ## of the session and at most once per session_xml_write_interval     ##
+    ## seconds during it, it can be rebuilt from the journal after        ##
+    ## a crash with rebuild_session_xml().                                ##
+    ########################################################################
+
+    def _open_journal(self):
+        self._journal = open(os.path.join(self._session_dir_name, JOURNAL_FNAME), "w")
+        self._journal_sync_time = time.time()
+
+    def _close_journal(self):
+        if self._journal:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._journal = None
+
+    def _sync_journal(self, force=False):
+        """Syncs the journal to the disk if the last sync was longer than journal_sync_interval ago."""
+        if self._journal and (force or time.time() - self._journal_sync_time > self.journal_sync_interval):
+            os.fsync(self._journal.fileno())
+            self._journal_sync_time = time.time()
+
+    def _event(self, event, **record):
+        """Applies the event record to the session xml document and appends it to the journal.
+        """
+        SessionLogger.__dict__['_apply_' + event](self, **record)
+        self._session_xml_dirty = True
+
+        if self._journal:
+            record['event'] = event
+            self._journal.write(json.dumps(record) + '\n')
+            self._journal.flush()
+
+    def _replay_journal(self, journal_fname):
+        """Applies all the events recorded in the journal to the session xml document.
         """
-        els = self._doc.getElementsByTagName("dialogue")
+        with open(journal_fname) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last record can be incomplete after a crash
+                    break
+                event = record.pop('event')
+                SessionLogger.__dict__['_apply_' + event](self, **dict((str(k), v) for k, v in record.iteritems()))
+
+    ########################################################################
+    ## The logged events.                                                 ##
+    ########################################################################
+
+    def _apply_config(self, comment):
+        els = [self._doc.documentElement]
 
         if els:
             if els[0].firstChild:
                 config = els[0].insertBefore(self._doc.createElement("config"), els[0].firstChild)
             else:
                 config = els[0].appendChild(self._doc.createElement("config"))
-            config.appendChild(self._doc.createComment(self._cfg_formatter(cfg)))
+            config.appendChild(self._doc.createComment(comment))
 
-        self._write_session_xml()
+    @etime('seslog_config')
+    @catch_ioerror
+    def _config(self, cfg):
+        """ Adds the config tag to the session log.
+        """
+        self._event('config', comment=self._cfg_formatter(cfg))
+
+    def _apply_header(self, host, date, system, version):
+        els = [self._doc.documentElement]
+
+        if els:
+            header = els[0].appendChild(self._doc.createElement("header"))
+            for name, text in [("host", host), ("date", date), ("system", system), ("version", version)]:
+                el = header.appendChild(self._doc.createElement(name))
+                el.appendChild(self._doc.createTextNode(text))
 
     @etime('seslog_header')
     @catch_ioerror
@@ -191,33 +340,30 @@ class SessionLogger(multiprocessing.Process):
         """ Adds host, date, system, and version info into the header element.
         The host and date will be derived automatically.
         """
-        els = self._doc.getElementsByTagName("dialogue")
+        self._event('header', host=socket.gethostname(), date=self._get_date_str(),
+                    system=system_txt, version=version_txt)
 
-        if els:
-            header = els[0].appendChild(self._doc.createElement("header"))
-            host = header.appendChild(self._doc.createElement("host"))
-            host.appendChild(self._doc.createTextNode(socket.gethostname()))
-            date = header.appendChild(self._doc.createElement("date"))
-            date.appendChild(self._doc.createTextNode(self._get_date_str()))
-
-            system = header.appendChild(self._doc.createElement("system"))
-            system.appendChild(self._doc.createTextNode(system_txt))
-            version = header.appendChild(self._doc.createElement("version"))
-            version.appendChild(self._doc.createTextNode(version_txt))
+    def _apply_input_source(self, input_source):
+        els = self._doc.getElementsByTagName("header")
 
-        self._write_session_xml()
+        if els:
+            i_s = els[0].appendChild(self._doc.createElement("input_source"))
+            i_s.setAttribute("type", input_source)
 
     @etime('seslog_input_source')
     @catch_ioerror
     def _input_source(self, input_source):
         """Adds the input_source optional tag to the header."""
-        els = self._doc.getElementsByTagName("header")
+        self._event('input_source', input_source=input_source)
 
-        if els:
-            i_s = els[0].appendChild(self._doc.createElement("input_source"))
-            i_s.setAttribute("type", input_source)
+    def _apply_dialogue_rec_start(self, speaker, fname, starttime):
+        da = self._doc.documentElement.appendChild(self._doc.createElement("dialogue_rec"))
+        if speaker:
+            da.setAttribute("speaker", speaker)
+        da.setAttribute("fname", fname)
+        da.setAttribute("starttime", starttime)
 
-        self._write_session_xml()
+        self._dialogue_recs[fname] = da
 
     @etime('seslog_dialogue_rec_start')
     # @catch_ioerror - do not add! VIO catches the IOError
@@ -229,36 +375,20 @@ class SessionLogger(multiprocessing.Process):
         function is called.
 
         """
-        els = self._doc.getElementsByTagName("dialogue")
+        self._event('dialogue_rec_start', speaker=speaker, fname=fname, starttime=self._get_time_str())
 
-        if els:
-            da = els[0].appendChild(self._doc.createElement("dialogue_rec"))
-            if speaker:
-                da.setAttribute("speaker", speaker)
-            da.setAttribute("fname", fname)
-            da.setAttribute("starttime", self._get_time_str())
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing dialogue element for %s speaker") % speaker)
-
-        self._write_session_xml()
+    def _apply_dialogue_rec_end(self, fname, endtime):
+        try:
+            self._dialogue_recs[fname].setAttribute("endtime", endtime)
+        except KeyError:
+            raise SessionLoggerException("Missing dialogue_rec element for %s fname" % fname)
 
     @etime('seslog_dialogue_rec_end')
     # @catch_ioerror - do not add! VIO catches the IOError
     def _dialogue_rec_end(self, fname):
         """ Stores the end time in the dialogue_rec element with fname file.
         """
-        els = self._doc.getElementsByTagName("dialogue_rec")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("fname") == fname:
-                els[i].setAttribute("endtime", self._get_time_str())
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException("Missing dialogue_rec element for %s fname" % fname)
-
-        self._write_session_xml()
+        self._event('dialogue_rec_end', fname=fname, endtime=self._get_time_str())
 
     @etime('seslog_evaluation')
     @catch_ioerror
@@ -267,17 +397,16 @@ class SessionLogger(multiprocessing.Process):
         raise SessionLoggerException("Not implemented")
 
     def _turn_count(self, speaker):
-        trns = self._doc.getElementsByTagName("turn")
-        counter = 0
-
-        if trns:
-            for i in range(trns.length):
-                if trns[i].getAttribute("speaker") == speaker:
-                    counter += 1
+        return self._turn_counts.get(speaker, 0)
 
-            return counter
+    def _apply_turn(self, speaker, turn_number, time):
+        turn = self._doc.documentElement.appendChild(self._doc.createElement("turn"))
+        turn.setAttribute("speaker", speaker)
+        turn.setAttribute("turn_number", turn_number)
+        turn.setAttribute("time", time)
 
-        return 0
+        self._turns.append(turn)
+        self._turn_counts[speaker] = self._turn_count(speaker) + 1
 
     @etime('seslog_turn')
     @catch_ioerror
@@ -286,56 +415,48 @@ class SessionLogger(multiprocessing.Process):
 
         The turn_number for the speaker is automatically computed.
         """
-        els = self._doc.getElementsByTagName("dialogue")
-        turn_number = self._turn_count(speaker) + 1
+        self._event('turn', speaker=speaker, turn_number=unicode(self._turn_count(speaker) + 1),
+                    time=self._get_time_str())
 
-        if els:
-            turn = els[0].appendChild(self._doc.createElement("turn"))
-            turn.setAttribute("speaker", speaker)
-            turn.setAttribute("turn_number", unicode(turn_number))
-            turn.setAttribute("time", self._get_time_str())
+    def _apply_dialogue_act(self, speaker, time, dialogue_act):
+        turn = self._last_turn_element(speaker)
 
-        self._write_session_xml()
+        da = turn.appendChild(self._doc.createElement("dialogue_act"))
+        da.setAttribute("time", time)
+        da.appendChild(self._doc.createTextNode(dialogue_act))
 
     @etime('seslog_dialogue_act')
     @catch_ioerror
     def _dialogue_act(self, speaker, dialogue_act):
         """ Adds the dialogue_act element to the last "speaker" turn.
         """
-        els = self._doc.getElementsByTagName("turn")
+        self._event('dialogue_act', speaker=speaker, time=self._get_time_str(), dialogue_act=unicode(dialogue_act))
 
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                da = els[i].appendChild(self._doc.createElement("dialogue_act"))
-                da.setAttribute("time", self._get_time_str())
-                da.appendChild(self._doc.createTextNode(unicode(dialogue_act)))
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
+    def _apply_text(self, speaker, time, text, cost=None):
+        turn = self._last_turn_element(speaker)
 
-        self._write_session_xml()
+        da = turn.appendChild(self._doc.createElement("text"))
+        da.setAttribute("time", time)
+        if cost:
+            da.setAttribute("cost", cost)
+        da.appendChild(self._doc.createTextNode(text))
 
     @etime('seslog_text')
     @catch_ioerror
     def _text(self, speaker, text, cost=None):
         """ Adds the text (prompt) element to the last "speaker" turn.
         """
-        els = self._doc.getElementsByTagName("turn")
+        self._event('text', speaker=speaker, time=self._get_time_str(), text=unicode(text),
+                    cost=unicode(cost) if cost else None)
 
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                da = els[i].appendChild(self._doc.createElement("text"))
-                da.setAttribute("time", self._get_time_str())
-                if cost:
-                    da.setAttribute("cost", unicode(cost))
-                da.appendChild(self._doc.createTextNode(unicode(text)))
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException("Missing turn element for {spkr} speaker".format(spkr=speaker))
+    def _apply_rec_start(self, speaker, fname, starttime):
+        turn = self._last_turn_element(speaker)
 
-        self._write_session_xml()
+        da = turn.appendChild(self._doc.createElement("rec"))
+        da.setAttribute("fname", fname)
+        da.setAttribute("starttime", starttime)
+
+        self._recs[fname] = da
 
     @etime('seslog_rec_start')
     @catch_ioerror
@@ -344,19 +465,7 @@ class SessionLogger(multiprocessing.Process):
         "speaker" turn.
 
         """
-        els = self._doc.getElementsByTagName("turn")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                da = els[i].appendChild(self._doc.createElement("rec"))
-                da.setAttribute("fname", fname)
-                da.setAttribute("starttime", self._get_time_str())
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing turn element for the {spkr} speaker".format(spkr=speaker)))
-
-        self._write_session_xml()
+        self._event('rec_start', speaker=speaker, fname=fname, starttime=self._get_time_str())
 
         self._rec_started[fname] = wave.open(os.path.join(self._session_dir_name, fname), 'w')
         self._rec_started[fname].setnchannels(1)
@@ -373,22 +482,20 @@ class SessionLogger(multiprocessing.Process):
         except KeyError:
             raise SessionLoggerException("rec_write: missing rec element %s" % fname)
 
+    def _apply_rec_end(self, fname, endtime):
+        try:
+            self._recs[fname].setAttribute("endtime", endtime)
+        except KeyError:
+            raise SessionLoggerException(("Missing rec element for the {fname} fname.".format(fname=fname)))
+
     @etime('seslog_rec_end')
     @catch_ioerror
     def _rec_end(self, fname):
         """ Stores the end time in the rec element with fname file.
         """
         try:
-            els = self._doc.getElementsByTagName("rec")
-
-            for i in range(els.length - 1, -1, -1):
-                if els[i].getAttribute("fname") == fname:
-                    els[i].setAttribute("endtime", self._get_time_str())
-                    break
-            else:
-                raise SessionLoggerException(("Missing rec element for the {fname} fname.".format(fname=fname)))
+            self._event('rec_end', fname=fname, endtime=self._get_time_str())
 
-            self._write_session_xml()
             self._rec_started[fname].close()
             self._rec_started[fname] = None
         except KeyError:
@@ -406,6 +513,33 @@ class SessionLogger(multiprocessing.Process):
 
         return False
 
+    def _last_turn_element_with_rec(self, speaker, fname):
+        for turn in reversed(self._turns):
+            if turn.getAttribute("speaker") == speaker and self._include_rec(turn, fname):
+                return turn
+        else:
+            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
+
+    def _apply_asr(self, speaker, fname, nblist, confnet=None):
+        turn = self._last_turn_element_with_rec(speaker, fname)
+        asr = turn.appendChild(self._doc.createElement("asr"))
+
+        for prob, hyp in nblist:
+            hyp_el = asr.appendChild(self._doc.createElement("hypothesis"))
+            hyp_el.setAttribute("p", prob)
+            hyp_el.appendChild(self._doc.createTextNode(hyp))
+
+        if confnet:
+            cn = asr.appendChild(self._doc.createElement("confnet"))
+
+            for alts in confnet:
+                was = cn.appendChild(self._doc.createElement("word_alternatives"))
+
+                for prob, word in alts:
+                    wa = was.appendChild(self._doc.createElement("word"))
+                    wa.setAttribute("p", prob)
+                    wa.appendChild(self._doc.createTextNode(word))
+
     @etime('seslog_asr')
     @catch_ioerror
     def _asr(self, speaker, fname, nblist, confnet=None):
@@ -413,35 +547,36 @@ class SessionLogger(multiprocessing.Process):
 
         alex Extension: It can also store the confusion network representation.
         """
-        els = self._doc.getElementsByTagName("turn")
+        nblist = [("{0:.3f}".format(prob), unicode(hyp)) for prob, hyp in nblist]
+        if confnet:
+            confnet = [[("{0:.3f}".format(prob), unicode(word)) for prob, word in alts] for alts in confnet]
+        else:
+            confnet = None
 
-        for el_idx in range(els.length - 1, -1, -1):
-            if els[el_idx].getAttribute("speaker") == speaker and self._include_rec(els[el_idx], fname):
-                asr = els[el_idx].appendChild(self._doc.createElement("asr"))
+        self._event('asr', speaker=speaker, fname=fname, nblist=nblist, confnet=confnet)
 
-                for prob, hyp in nblist:
-                    hyp_el = asr.appendChild(self._doc.createElement("hypothesis"))
-                    hyp_el.setAttribute("p", "{0:.3f}".format(prob))
-                    hyp_el.appendChild(self._doc.createTextNode(unicode(hyp)))
+    def _apply_slu(self, speaker, fname, nblist, confnet=None):
+        turn = self._last_turn_element_with_rec(speaker, fname)
+        asr = turn.appendChild(self._doc.createElement("slu"))
 
-                if confnet:
-                    cn = asr.appendChild(self._doc.createElement("confnet"))
+        for p, h in nblist:
+            hyp = asr.appendChild(self._doc.createElement("interpretation"))
+            hyp.setAttribute("p", p)
+            hyp.appendChild(self._doc.createTextNode(h))
 
-                    for alts in confnet:
-                        was = cn.appendChild(
-                            self._doc.createElement("word_alternatives"))
+        if confnet:
+            cn = asr.appendChild(self._doc.createElement("confnet"))
 
-                        for prob, word in alts:
-                            wa = was.appendChild(self._doc.createElement("word"))
-                            wa.setAttribute("p", "{0:.3f}".format(prob))
-                            wa.appendChild(self._doc.createTextNode(unicode(word)))
+            for p, p_null, dai in confnet:
+                sas = cn.appendChild(self._doc.createElement("dai_alternatives"))
 
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
+                daia = sas.appendChild(self._doc.createElement("dai"))
+                daia.setAttribute("p", p)
+                daia.appendChild(self._doc.createTextNode(dai))
 
-        self._write_session_xml()
+                daia = sas.appendChild(self._doc.createElement("dai"))
+                daia.setAttribute("p", p_null)
+                daia.appendChild(self._doc.createTextNode("null()"))
 
     @etime('seslog_slu')
     @catch_ioerror
@@ -452,74 +587,42 @@ class SessionLogger(multiprocessing.Process):
         The confnet must be an instance of DialogueActConfusionNetwork.
 
         """
-        els = self._doc.getElementsByTagName("turn")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker and self._include_rec(els[i], fname):
-                asr = els[i].appendChild(self._doc.createElement("slu"))
-
-                for p, h in nblist:
-                    hyp = asr.appendChild(self._doc.createElement("interpretation"))
-                    hyp.setAttribute("p", "%.3f" % p)
-                    hyp.appendChild(self._doc.createTextNode(unicode(h)))
-
-                if confnet:
-                    cn = asr.appendChild(self._doc.createElement("confnet"))
-
-                    for p, dai in confnet:
-                        sas = cn.appendChild(self._doc.createElement("dai_alternatives"))
-
-                        daia = sas.appendChild(self._doc.createElement("dai"))
-                        daia.setAttribute("p", "%.3f" % p)
-                        daia.appendChild(self._doc.createTextNode(unicode(dai)))
+        nblist = [("%.3f" % p, unicode(h)) for p, h in nblist]
+        if confnet:
+            confnet = [("%.3f" % p, "%.3f" % (1 - p), unicode(dai)) for p, dai in confnet]
+        else:
+            confnet = None
 
-                        daia = sas.appendChild(self._doc.createElement("dai"))
-                        daia.setAttribute("p", "%.3f" % (1 - p))
-                        daia.appendChild(self._doc.createTextNode("null()"))
+        self._event('slu', speaker=speaker, fname=fname, nblist=nblist, confnet=confnet)
 
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
+    def _apply_barge_in(self, speaker, time, tts_time=None, asr_time=None):
+        turn = self._last_turn_element(speaker)
 
-        self._write_session_xml()
+        da = turn.appendChild(self._doc.createElement("barge-in"))
+        da.setAttribute("time", time)
+        if tts_time:
+            da.setAttribute("tts_time", tts_time)
+        if asr_time:
+            da.setAttribute("asr_time", asr_time)
 
     @etime('seslog_barge_in')
     @catch_ioerror
     def _barge_in(self, speaker, tts_time=False, asr_time=False):
         """Add the optional barge-in element to the last speaker turn."""
-        els = self._doc.getElementsByTagName("turn")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                da = els[i].appendChild(self._doc.createElement("barge-in"))
-                da.setAttribute("time", self._get_time_str())
-                if tts_time:
-                    da.setAttribute("tts_time", self._get_time_str())
-                if asr_time:
-                    da.setAttribute("asr_time", self._get_time_str())
-                break
-        else:
-            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
+        self._event('barge_in', speaker=speaker, time=self._get_time_str(),
+                    tts_time=self._get_time_str() if tts_time else None,
+                    asr_time=self._get_time_str() if asr_time else None)
 
-        self._write_session_xml()
+    def _apply_hangup(self, speaker):
+        turn = self._last_turn_element(speaker)
+        turn.appendChild(self._doc.createElement("hangup"))
 
     @etime('seslog_hangup')
     @catch_ioerror
     def _hangup(self, speaker):
         """ Adds the user hangup element to the last user turn.
         """
-        els = self._doc.getElementsByTagName("turn")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                els[i].appendChild(self._doc.createElement("hangup"))
-                break
-        else:
-            self._write_session_xml()
-            raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
-
-        self._write_session_xml()
+        self._event('hangup', speaker=speaker)
 
     ########################################################################
     ## The following functions define functionality above what was set in ##
@@ -530,17 +633,25 @@ class SessionLogger(multiprocessing.Process):
         """ Finds the XML element in the given open XML session
         which corresponds to the last turn for the given speaker.
 
-        Closes the XML and throws an exception if the element cannot be found.
+        Throws an exception if the element cannot be found.
         """
-        els = self._doc.getElementsByTagName("turn")
-
-        for i in range(els.length - 1, -1, -1):
-            if els[i].getAttribute("speaker") == speaker:
-                return els[i]
+        for turn in reversed(self._turns):
+            if turn.getAttribute("speaker") == speaker:
+                return turn
         else:
-            self._write_session_xml()
             raise SessionLoggerException(("Missing turn element for %s speaker") % speaker)
 
+    def _apply_dialogue_state(self, speaker, dstate):
+        turn = self._last_turn_element(speaker)
+
+        for state in dstate:
+            ds = turn.appendChild(self._doc.createElement("dialogue_state"))
+
+            for slot_name, slot_value in state:
+                sl = ds.appendChild(self._doc.createElement("slot"))
+                sl.setAttribute("name", slot_name)
+                sl.appendChild(self._doc.createTextNode(slot_value))
+
     @etime('seslog_dialogue_state')
     @catch_ioerror
     def _dialogue_state(self, speaker, dstate):
@@ -555,17 +666,15 @@ class SessionLogger(multiprocessing.Process):
         [ (slot_name1, slot_value1), (slot_name2, slot_value2), ...)
 
         """
-        turn = self._last_turn_element(speaker)
+        dstate = [[("%s" % slot_name, unicode(slot_value)) for slot_name, slot_value in state] for state in dstate]
 
-        for state in dstate:
-            ds = turn.appendChild(self._doc.createElement("dialogue_state"))
+        self._event('dialogue_state', speaker=speaker, dstate=dstate)
 
-            for slot_name, slot_value in state:
-                sl = ds.appendChild(self._doc.createElement("slot"))
-                sl.setAttribute("name", "%s" % slot_name)
-                sl.appendChild(self._doc.createTextNode(unicode(slot_value)))
-
-        self._write_session_xml()
+    def _apply_external_data_file(self, ftype, fname):
+        turn = self._last_turn_element("system")
+        el = turn.appendChild(self._doc.createElement("external"))
+        el.setAttribute("type", ftype)
+        el.setAttribute("fname", fname)
 
     @etime('seslog_external_data_file')
     @catch_ioerror
@@ -578,92 +687,182 @@ class SessionLogger(multiprocessing.Process):
         This is an alex extension.
         """
         # create the file link
-        turn = self._last_turn_element("system")
-        el = turn.appendChild(self._doc.createElement("external"))
-        el.setAttribute("type", ftype)
-        el.setAttribute("fname", os.path.basename(fname))
-        self._write_session_xml()
+        self._event('external_data_file', ftype=ftype, fname=os.path.basename(fname))
         # write the file data
         if data is not None:
             with open(fname, 'w') as fh:
                 fh.write(data)
 
+    def _read_queue(self, timeout=None):
+        """Moves all the commands from the multiprocessing queue to self._queue.
+
+        If the queue is empty, it waits at most timeout seconds for the first command.
+        """
+        try:
+            if timeout:
+                self._queue.append(self.queue.get(timeout=timeout))
+            while True:
+                self._queue.append(self.queue.get_nowait())
+        except Queue.Empty:
+            pass
+
+        self._backlog_max = max(self._backlog_max, len(self._queue))
+
+    def _coalesce_rec_writes(self, fname, data_rec):
+        """Joins the data of the rec_write commands for the same file queued right after the current one.
+
+        Returns the joined data and the queue times of the joined commands.
+        """
+        cmd_times = []
+
+        if self._queue and self._queue[0][0] == 'rec_write' and self._queue[0][1][:1] == (fname, ):
+            data = bytearray(getattr(data_rec, 'payload', data_rec))
+            while self._queue and self._queue[0][0] == 'rec_write' and self._queue[0][1][:1] == (fname, ):
+                cmd, args, kw, cmd_time = self._queue.popleft()
+                data += getattr(args[1], 'payload', args[1])
+                cmd_times.append(cmd_time)
+            data_rec = data
+
+        return data_rec, cmd_times
+
+    def _update_stats(self, cmd, cmd_times):
+        """Records the latencies of the executed commands, i.e. the time from queueing to the end of execution."""
+        now = time.time()
+        stats = self._command_stats.setdefault(cmd, [0, 0.0, 0.0])
+
+        for cmd_time in cmd_times:
+            latency = now - cmd_time
+            stats[0] += 1
+            stats[1] += latency
+            stats[2] = max(stats[2], latency)
+            self._latency_max = max(self._latency_max, latency)
+
+    def get_stats(self):
+        """Returns the statistics of the logger.
+
+        commands     - a dictionary mapping the command names to (count, mean latency, max latency)
+        backlog      - the number of the queued commands
+        backlog_max  - the maximum number of the queued commands since the last report
+        latency_max  - the maximum latency of a command since the last report
+        """
+        return {
+            'commands': dict((cmd, (n, total / n, max_latency))
+                             for cmd, (n, total, max_latency) in self._command_stats.iteritems()),
+            'backlog': len(self._queue),
+            'backlog_max': self._backlog_max,
+            'latency_max': self._latency_max,
+        }
+
+    def _report_stats(self):
+        """Logs the statistics once per stats_interval seconds, as a warning if the logger lags behind."""
+        if time.time() - self._stats_time < self.stats_interval:
+            return
+
+        stats = self.get_stats()
+        message = 'SessionLogger: backlog %d (max %d), max latency %.3f s, commands: %s' % (
+            stats['backlog'], stats['backlog_max'], stats['latency_max'],
+            ', '.join('%s %d/%.3f/%.3f s' % ((cmd, ) + cmd_stats)
+                      for cmd, cmd_stats in sorted(stats['commands'].iteritems())))
+
+        if stats['latency_max'] > self.lag_warning_threshold:
+            self.cfg['Logging']['system_logger'].warning(message)
+        else:
+            self.cfg['Logging']['system_logger'].info(message)
+
+        self._stats_time = time.time()
+        self._backlog_max = len(self._queue)
+        self._latency_max = 0.0
+
+    def _process_command(self, cmd, args, kw, cmd_time):
+        attr = '_'+cmd
+        cmd_times = [cmd_time]
+        try:
+            if cmd == 'session_start':
+                self._last_session_start_time = time.time()
+            elif cmd == 'session_end':
+                self._last_session_start_time = time.time()
+
+
+            if not self._is_open and cmd != 'session_start':
+                session_start_found = False
+                while time.time() - cmd_time < 3.0 and not session_start_found:
+                    # these are probably commands for the new un-opened session
+                    for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
+                        if _cmd == 'session_start':
+                            print "SessionLogger: finally found session start"
+                            self._session_start(*_args,**_kw)
+                            del self._queue[i]
+                            session_start_found = True
+                            break
+                    else:
+                        self._read_queue(self.cfg['Hub']['main_loop_wait_timeout'])
+
+                if not session_start_found and (self._last_session_end_time - cmd_time < 2.0):
+                    # just silently ignore because these are likely the be commands for the already
+                    # closed session
+
+                    # print "SessionLogger: should be silent"
+                    # print "SessionLogger: calling method", cmd, "when the session is not open"
+                    # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                    return
+
+
+                if not session_start_found:
+                    print "SessionLogger: no session start found"
+                    print "SessionLogger: calling method", cmd, "when the session is not open"
+                    print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
+                    return
+
+            if cmd == 'rec_write' and not kw:
+                data_rec, coalesced = self._coalesce_rec_writes(*args)
+                args = (args[0], data_rec)
+                cmd_times.extend(coalesced)
+
+            cf = SessionLogger.__dict__[attr]
+            cf(self, *args, **kw)
+        except AttributeError:
+            print "SessionLogger: unknown method", cmd
+            self.close_event.set()
+            raise
+        except SessionLoggerException as e:
+            if cmd == 'rec_write':
+                print "Exception when logging:", cmd
+                print e
+            else:
+                print "Exception when logging:", cmd, args, kw
+                print e
+        except SessionClosedException as e:
+            print "Exception when logging:", cmd, args, kw
+            print e
+        finally:
+            self._update_stats(cmd, cmd_times)
+
     def run(self):
         try:
             set_proc_name("Alex_SessionLogger")
-            last_session_start_time = 0
-            last_session_end_time = 0
+            self._last_session_start_time = 0
+            self._last_session_end_time = 0
+            self._stats_time = time.time()
 
             while 1:
                 # Check the close event.
                 if self.close_event.is_set():
                     print 'Received close event in: %s' % multiprocessing.current_process().name
+                    self._close_session()
                     return
 
-                time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
+                # Wait for the commands, check the close event at least once per the timeout.
+                self._read_queue(self.cfg['Hub']['main_loop_wait_timeout'])
 
                 s = (time.time(), time.clock())
 
-                while not self.queue.empty():
-                    self._queue.append(self.queue.get())
-
-                if len(self._queue):
-                    cmd, args, kw, cmd_time = self._queue.popleft()
-
-                    attr = '_'+cmd
-                    try:
-                        if cmd == 'session_start':
-                            last_session_start_time = time.time()
-                        elif cmd == 'session_end':
-                            last_session_start_time = time.time()
-
-
-                        if not self._is_open and cmd != 'session_start':
-                            session_start_found = False
-                            while time.time() - cmd_time < 3.0 and not session_start_found:
-                                # these are probably commands for the new un-opened session
-                                for i, (_cmd, _args, _kw, _cmd_time) in enumerate(self._queue):
-                                    if _cmd == 'session_start':
-                                        print "SessionLogger: finally found session start"
-                                        self._session_start(*_args,**_kw)
-                                        del self._queue[i]
-                                        session_start_found = True
-                                        break
-                                else:
-                                    time.sleep(self.cfg['Hub']['main_loop_sleep_time'])
-
-                            if not session_start_found and (last_session_end_time - cmd_time < 2.0):
-                                # just silently ignore because these are likely the be commands for the already
-                                # closed session
-
-                                # print "SessionLogger: should be silent"
-                                # print "SessionLogger: calling method", cmd, "when the session is not open"
-                                # print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-
-                            if not session_start_found:
-                                print "SessionLogger: no session start found"
-                                print "SessionLogger: calling method", cmd, "when the session is not open"
-                                print '             ', [a for a in args if isinstance(a, basestring) and len(a) < 80]
-                                continue
-
-                        cf = SessionLogger.__dict__[attr]
-                        cf(self, *args, **kw)
-                    except AttributeError:
-                        print "SessionLogger: unknown method", cmd
-                        self.close_event.set()
-                        raise
-                    except SessionLoggerException as e:
-                        if cmd == 'rec_write':
-                            print "Exception when logging:", cmd
-                            print e
-                        else:
-                            print "Exception when logging:", cmd, args, kw
-                            print e
-                    except SessionClosedException:
-                        print "Exception when logging:", cmd, args, kw
-                        print e
+                # Execute all the pending commands, the consecutive rec_write commands for one file are joined.
+                while self._queue:
+                    self._process_command(*self._queue.popleft())
+
+                self._sync_journal()
+                self._update_session_xml()
+                self._report_stats()
 
                 d = (time.time() - s[0], time.clock() - s[1])
                 if d[0] > 0.200:
@@ -671,12 +870,45 @@ class SessionLogger(multiprocessing.Process):
 
         except KeyboardInterrupt:
             print 'KeyboardInterrupt exception in: %s' % multiprocessing.current_process().name
+            self._close_session()
             self.close_event.set()
             return
         except:
             print 'Uncaught exception in the SessionLogger process.'
+            self._close_session()
             self.close_event.set()
             raise
 
         print 'Exiting: %s. Setting close event' % multiprocessing.current_process().name
         self.close_event.set()
+
+
+def session_xml_is_stale(session_dir):
+    """ Returns whether the session directory has an event journal with events which are not in its session.xml,
+    i.e. whether the journal was modified after session.xml was written.
+    """
+    journal_fname = os.path.join(session_dir, JOURNAL_FNAME)
+    session_xml_fname = os.path.join(session_dir, 'session.xml')
+
+    if not os.path.exists(journal_fname):
+        return False
+    if not os.path.exists(session_xml_fname):
+        return True
+
+    return os.path.getmtime(journal_fname) > os.path.getmtime(session_xml_fname)
+
+
+def rebuild_session_xml(session_dir):
+    """ Rebuilds the session.xml file in the session directory from the event journal.
+
+    Use it for the sessions whose logger did not end properly, e.g. because it crashed, see session_xml_is_stale().
+    """
+    sl = SessionLogger()
+    sl._session_dir_name = session_dir
+    sl._doc = xml.dom.minidom.parseString(SESSION_XML_TEMPLATE)
+    sl._index_session_xml()
+    sl._replay_journal(os.path.join(session_dir, JOURNAL_FNAME))
+
+    with open(os.path.join(session_dir, 'session.xml'), 'w') as f:
+        f.write(SESSION_XML_TEMPLATE)
+    sl._write_session_xml()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import alex.utils.cache as cache
+from alex.utils.cache import PersistentCache
+
+
+class TestPersistentCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_set(self):
+        c = PersistentCache(self.directory, 1024)
+
+        self.assertRaises(KeyError, c.get, 'a')
+
+        c.set('a', b'\x00\x01' * 10)
+        c.set('b', {'x': [1, 2]})
+
+        self.assertEqual(c.get('a'), b'\x00\x01' * 10)
+        self.assertEqual(c.get('b'), {'x': [1, 2]})
+
+        # the strings are stored as they are
+        self.assertTrue(os.path.exists(c.path('a') + '.raw'))
+        with open(c.path('a') + '.raw', 'rb') as f:
+            self.assertEqual(f.read(), b'\x00\x01' * 10)
+
+        # the other processes see the entries
+        self.assertEqual(PersistentCache(self.directory, 1024).get('a'), b'\x00\x01' * 10)
+
+        stats = c.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['bytes_read'], 20 + len(cache.pickle.dumps({'x': [1, 2]}, cache.pickle.HIGHEST_PROTOCOL)))
+
+    def test_get_mapped(self):
+        c = PersistentCache(self.directory, 1024)
+
+        c.set('a', b'\x00\x01' * 10)
+        c.set('empty', b'')
+
+        data = c.get('a', mapped=True)
+        self.assertIsInstance(data, cache.mmap.mmap)
+        self.assertEqual(len(data), 20)
+        self.assertEqual(data[2:4], b'\x00\x01')
+
+        # the map stays valid when the entry is removed
+        c.clear()
+        self.assertEqual(data[:], b'\x00\x01' * 10)
+
+        c.set('empty', b'')
+        self.assertEqual(c.get('empty'), b'')
+        self.assertEqual(c.get('empty', mapped=True), b'')
+
+    def test_eviction(self):
+        c = PersistentCache(self.directory, 1000)
+
+        for i in range(5):
+            c.set(str(i), b'x' * 200)
+            # the modification times must differ
+            time.sleep(0.01)
+
+        # the entry 0 is used recently
+        c.get('0')
+        time.sleep(0.01)
+
+        c.set('5', b'x' * 200)
+
+        self.assertEqual(c.stats()['evictions'], 2)
+        self.assertLessEqual(c.size, 900)
+        self.assertEqual(sum(size for path, size, mtime in c.entries()), c.size)
+
+        self.assertEqual(c.get('0'), b'x' * 200)
+        self.assertRaises(KeyError, c.get, '1')
+        self.assertRaises(KeyError, c.get, '2')
+        self.assertEqual(c.get('3'), b'x' * 200)
+
+    def test_eviction_of_stale_temporary_files(self):
+        c = PersistentCache(self.directory, 1000)
+        c.set('0', b'x' * 200)
+
+        shard = os.path.dirname(c.path('0'))
+        stale = os.path.join(shard, '.tmp_stale')
+        fresh = os.path.join(shard, '.tmp_fresh')
+        for path in [stale, fresh]:
+            with open(path, 'wb') as f:
+                f.write(b'x' * 200)
+        old = time.time() - c.stale_tmp_age - 10
+        os.utime(stale, (old, old))
+
+        c.evict()
+
+        self.assertFalse(os.path.exists(stale))
+        # a temporary file may still be written by another process
+        self.assertTrue(os.path.exists(fresh))
+        self.assertEqual(c.get('0'), b'x' * 200)
+
+    def test_decorator(self):
+        directory, max_size = cache.persistent_cache_directory, cache.persistent_cache_max_size
+        cache.configure_persistent_cache(self.directory, 1024)
+        self.addCleanup(cache.configure_persistent_cache, directory, max_size)
+        calls = []
+
+        @cache.persistent_cache(False, 'f.')
+        def f(x, y):
+            calls.append((x, y))
+            return b'%d' % (3 * x + y)
+
+        for i in range(3):
+            self.assertEqual(f(1, 2), b'5')
+            self.assertEqual(f(2, 1), b'7')
+
+        self.assertEqual(calls, [(1, 2), (2, 1)])
+        self.assertEqual((f.hits, f.misses), (4, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.utils.mfcc import MFCCFrontEnd
+
+
+class TestMFCCFrontEnd(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.samples = (rng.randn(8000) * 3000).astype(np.int16)
+
+    def param_frame_by_frame(self, front_end, frameshift):
+        return np.array([front_end.param(self.samples[i:i + front_end.framesize])
+                         for i in range(0, len(self.samples) - front_end.framesize + 1, frameshift)])
+
+    def test_param_batch(self):
+        # make sure the batch computation gives the same features as the frame by frame computation
+        for kwargs in [dict(usec0=True, usedelta=True, useacc=True, n_last_frames=2),
+                       dict(usec0=False, usedelta=True, useacc=False),
+                       dict(mel_banks_only=True, n_last_frames=3)]:
+            mfccs = self.param_frame_by_frame(MFCCFrontEnd(8000, 256, **kwargs), 80)
+
+            front_end = MFCCFrontEnd(8000, 256, **kwargs)
+            mfccs_batch = front_end.param_batch(self.samples, 80)
+
+            self.assertEqual(mfccs_batch.shape, (mfccs.shape[0], front_end.get_dim()))
+            self.assertTrue((mfccs_batch == mfccs).all())
+
+    def test_param_batch_chunks(self):
+        # the state must be carried over between consecutive calls
+        mfccs = self.param_frame_by_frame(MFCCFrontEnd(8000, 256, n_last_frames=2), 80)
+
+        front_end = MFCCFrontEnd(8000, 256, n_last_frames=2)
+        chunks = []
+        start = 0
+        for n_frames in [1, 1, 3, 10, 0, 40]:
+            chunk = front_end.param_batch(self.samples[start:start + (n_frames - 1) * 80 + 256], 80)
+            self.assertEqual(len(chunk), n_frames)
+            chunks.append(chunk)
+            start += n_frames * 80
+        chunks.append(front_end.param_batch(self.samples[start:], 80))
+
+        self.assertTrue((np.vstack(chunks) == mfccs).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
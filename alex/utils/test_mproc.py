@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import multiprocessing
+import time
+import unittest
+
+from alex.utils.mproc import wait_for_input
+
+
+class TestWaitForInput(unittest.TestCase):
+    def test_timeout(self):
+        a_in, a_out = multiprocessing.Pipe(duplex=False)
+
+        start = time.time()
+        self.assertEqual(wait_for_input([a_in], 0.05), [])
+        self.assertGreaterEqual(time.time() - start, 0.04)
+
+    def test_ready(self):
+        a_in, a_out = multiprocessing.Pipe(duplex=False)
+        b_in, b_out = multiprocessing.Pipe(duplex=False)
+
+        b_out.send('frame')
+        self.assertEqual(wait_for_input([a_in, b_in], 10.0), [b_in])
+
+        a_out.send('command')
+        self.assertEqual(wait_for_input([a_in, b_in], 10.0), [a_in, b_in])
+
+        b_in.recv()
+        self.assertEqual(wait_for_input([a_in, b_in], 10.0), [a_in])
+
+
+if __name__ == '__main__':
+    unittest.main()
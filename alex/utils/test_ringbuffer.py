@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+if __name__ == "__main__":
+    import autopath
+
+import unittest
+
+import numpy as np
+
+from alex.utils.ringbuffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_write_consume(self):
+        # make sure the unread samples are always returned in order and in one piece
+        rb = RingBuffer(8)
+        data = np.arange(1000, dtype=np.int16)
+
+        written = 0
+        read = 0
+        for n_write, n_read in [(5, 3), (6, 4), (7, 7), (3, 0), (2, 5), (8, 6)] * 10:
+            rb.write(data[written:written + n_write])
+            written += n_write
+
+            self.assertEqual(len(rb), written - read)
+            self.assertTrue((rb.peek() == data[read:written]).all())
+
+            rb.consume(n_read)
+            read = min(read + n_read, written)
+
+        self.assertTrue((rb.peek(3) == data[read:read + 3]).all())
+
+    def test_grow(self):
+        rb = RingBuffer(4)
+        rb.write(np.arange(3, dtype=np.int16))
+        rb.consume(2)
+        rb.write(np.arange(3, 13, dtype=np.int16))
+
+        self.assertEqual(len(rb), 11)
+        self.assertTrue((rb.peek() == np.arange(2, 13)).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
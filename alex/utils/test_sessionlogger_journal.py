@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+if __name__ == "__main__":
+    import autopath
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import wave
+import xml.dom.minidom
+
+from alex.utils.sessionlogger import SessionLogger, rebuild_session_xml, session_xml_is_stale
+
+
+class TestSessionLoggerJournal(unittest.TestCase):
+    """Runs the logging methods directly, i.e. as they are run in the logger process."""
+
+    def setUp(self):
+        self.sess_dir = tempfile.mkdtemp()
+
+        self.sl = SessionLogger()
+        self.sl.set_cfg({'Audio': {'sample_rate': 8000}})
+
+    def tearDown(self):
+        shutil.rmtree(self.sess_dir)
+
+    def read(self, fname):
+        with open(os.path.join(self.sess_dir, fname)) as f:
+            return f.read()
+
+    def log_session(self):
+        sl = self.sl
+        sl._session_start(self.sess_dir)
+        sl._config('config = {\n  "a": 1\n}')
+        sl._header("Default alex", "1.0")
+        sl._input_source("voip")
+        sl._dialogue_rec_start(None, "both_complete_dialogue.wav")
+
+        sl._turn("system")
+        sl._dialogue_act("system", "hello()")
+        sl._text("system", "Dobrý den.", cost=1.0)
+        sl._rec_start("system", "system1.wav")
+        sl._rec_write("system1.wav", b'\x00\x01' * 80)
+        sl._rec_end("system1.wav")
+        sl._external_data_file("ext-data", "/tmp/data.txt")
+
+        sl._turn("user")
+        sl._rec_start("user", "user1.wav")
+        sl._rec_end("user1.wav")
+        sl._asr("user", "user1.wav", [(0.8, "dobrý den"), (0.2, "dobrej den")],
+                [[(0.8, "dobrý"), (0.2, "dobrej")], [(1.0, "den")]])
+        sl._slu("user", "user1.wav", [(0.9, "hello()"), (0.1, "null()")], [(0.9, "hello()")])
+        sl._dialogue_state("system", [[("task", "find_connection"), ("from_stop", "Anděl")]])
+        sl._barge_in("system", tts_time=True)
+        sl._hangup("user")
+
+    def test_session_xml(self):
+        self.log_session()
+
+        # only the journal is written after every event
+        self.assertEqual(self.read('session.xml').strip(), '<?xml version="1.0" encoding="UTF-8"?>\n<dialogue>\n</dialogue>')
+        self.assertEqual(len(self.read('session.journal').splitlines()), 18)
+
+        # session.xml is written once per session_xml_write_interval during the session
+        self.sl._update_session_xml()
+        self.assertEqual(len(xml.dom.minidom.parseString(self.read('session.xml')).getElementsByTagName("turn")), 0)
+        self.sl._session_xml_time -= self.sl.session_xml_write_interval + 1.0
+        self.sl._update_session_xml()
+        self.assertEqual(len(xml.dom.minidom.parseString(self.read('session.xml')).getElementsByTagName("turn")), 2)
+
+        self.sl._session_end()
+
+        doc = xml.dom.minidom.parseString(self.read('session.xml'))
+        turns = doc.getElementsByTagName("turn")
+        self.assertEqual([t.getAttribute("speaker") for t in turns], ["system", "user"])
+        self.assertEqual([n.tagName for n in doc.documentElement.childNodes if n.nodeType == n.ELEMENT_NODE],
+                         ["config", "header", "dialogue_rec", "turn", "turn"])
+        self.assertEqual(turns[0].getElementsByTagName("text")[0].getAttribute("cost"), "1.0")
+        self.assertEqual(turns[0].getElementsByTagName("text")[0].firstChild.data, "Dobrý den.")
+        self.assertEqual(turns[0].getElementsByTagName("rec")[0].getAttribute("fname"), "system1.wav")
+        self.assertTrue(turns[0].getElementsByTagName("rec")[0].hasAttribute("endtime"))
+        self.assertEqual([h.getAttribute("p") for h in turns[1].getElementsByTagName("hypothesis")], ["0.800", "0.200"])
+        self.assertEqual([d.getAttribute("p") for d in turns[1].getElementsByTagName("dai")], ["0.900", "0.100"])
+        self.assertEqual(turns[0].getElementsByTagName("slot")[1].firstChild.data, "Anděl")
+        self.assertEqual(len(turns[1].getElementsByTagName("hangup")), 1)
+
+    def test_rebuild_session_xml(self):
+        self.log_session()
+        self.sl._session_end()
+        session_xml = self.read('session.xml')
+
+        os.remove(os.path.join(self.sess_dir, 'session.xml'))
+        rebuild_session_xml(self.sess_dir)
+        self.assertEqual(self.read('session.xml'), session_xml)
+
+        # a crash while writing the last record
+        with open(os.path.join(self.sess_dir, 'session.journal'), 'a') as f:
+            f.write('{"event": "turn", "speak')
+        rebuild_session_xml(self.sess_dir)
+        self.assertEqual(self.read('session.xml'), session_xml)
+
+    def test_session_xml_is_stale(self):
+        self.assertFalse(session_xml_is_stale(self.sess_dir))
+
+        self.log_session()
+        self.sl._session_end()
+        self.assertFalse(session_xml_is_stale(self.sess_dir))
+
+        # the logger crashed after logging more events
+        time.sleep(0.01)
+        with open(os.path.join(self.sess_dir, 'session.journal'), 'a') as f:
+            f.write('{"event": "turn", "speaker": "system", "turn_number": "3", "time": "10.000"}\n')
+        self.assertTrue(session_xml_is_stale(self.sess_dir))
+
+        rebuild_session_xml(self.sess_dir)
+        self.assertFalse(session_xml_is_stale(self.sess_dir))
+        self.assertEqual(len(xml.dom.minidom.parseString(self.read('session.xml')).getElementsByTagName("turn")), 3)
+
+    def test_next_session(self):
+        self.log_session()
+
+        next_sess_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, next_sess_dir)
+        self.sl._session_start(next_sess_dir)
+
+        # the session.xml of the previous session is written when the next one starts
+        self.assertEqual(len(xml.dom.minidom.parseString(self.read('session.xml')).getElementsByTagName("turn")), 2)
+
+    def test_process_commands(self):
+        sl = self.sl
+        sl.set_cfg({'Audio': {'sample_rate': 8000}, 'Hub': {'main_loop_wait_timeout': 0.1}})
+        sl.set_close_event(None)
+
+        sl.session_start(self.sess_dir)
+        sl.turn("user")
+        sl.rec_start("user", "user1.wav")
+        for i in range(100):
+            sl.rec_write("user1.wav", b'%c\x00' % i * 80)
+        sl.rec_end("user1.wav")
+
+        sl._read_queue(1.0)
+        while len(sl._queue) < 104:
+            sl._read_queue(1.0)
+        self.assertEqual(sl.get_stats()['backlog'], 104)
+
+        while sl._queue:
+            sl._process_command(*sl._queue.popleft())
+
+        wav = wave.open(os.path.join(self.sess_dir, "user1.wav"))
+        self.assertEqual(wav.readframes(wav.getnframes()), b''.join(b'%c\x00' % i * 80 for i in range(100)))
+        wav.close()
+
+        stats = sl.get_stats()
+        self.assertEqual(stats['backlog'], 0)
+        self.assertEqual(stats['backlog_max'], 104)
+        self.assertEqual(stats['commands']['rec_write'][0], 100)
+        self.assertEqual(stats['commands']['turn'][0], 1)
+        self.assertGreaterEqual(stats['latency_max'], stats['commands']['rec_end'][2])
+
+    def test_coalesce_rec_writes(self):
+        sl = self.sl
+        sl._queue.extend([('rec_write', ('user1.wav', b'b'), {}, 1.0),
+                          ('rec_write', ('user1.wav', bytearray(b'c')), {}, 2.0),
+                          ('rec_write', ('system1.wav', b'd'), {}, 3.0),
+                          ('rec_write', ('user1.wav', b'e'), {}, 4.0)])
+
+        self.assertEqual(sl._coalesce_rec_writes('user1.wav', b'a'), (b'abc', [1.0, 2.0]))
+        self.assertEqual(len(sl._queue), 2)
+        # the next command is for another file
+        self.assertEqual(sl._coalesce_rec_writes('user1.wav', b'x'), (b'x', []))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
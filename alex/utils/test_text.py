@@ -4,6 +4,7 @@
 if __name__ == "__main__":
     import autopath
 
+import random
 import unittest
 
 import alex.utils.text
@@ -31,5 +32,31 @@ class TestString(unittest.TestCase):
         r = alex.utils.text.parse_command('call(destination="1245",opt="X")')
         self.assertEqual(r, {"__name__": "call", "destination": "1245", "opt": "X"})
 
+    def test_min_edit_ops(self):
+        target = 'i want to go to the main station from the airport'.split()
+        source = 'i want to go from main station to airport'.split()
+        self.assertEqual(alex.utils.text.min_edit_ops(target, source), (2, 0, 2))
+        self.assertEqual(alex.utils.text.min_edit_ops(target, target), (0, 0, 0))
+        self.assertEqual(alex.utils.text.min_edit_ops([], source), (0, 9, 0))
+        self.assertEqual(alex.utils.text.min_edit_ops(target, []), (11, 0, 0))
+
+        # the fast algorithm for the default cost breaks the ties as the generic algorithm
+        cost = lambda insertions, deletions, substitutions: insertions + deletions + 2.0 * substitutions
+        rng = random.Random(0)
+        for i in range(2000):
+            target = [rng.choice('abcd') for j in range(rng.randint(0, 8))]
+            source = [rng.choice('abcd') for j in range(rng.randint(0, 8))]
+            self.assertEqual(alex.utils.text.min_edit_ops(target, source),
+                             alex.utils.text.min_edit_ops(target, source, cost))
+
+    def test_min_edit_alignment(self):
+        ops, alignment = alex.utils.text.min_edit_alignment('a b c d'.split(), 'a x c e d f'.split())
+        self.assertEqual(ops, (0, 2, 1))
+        self.assertEqual(alignment, [('a', 'a'), ('b', 'x'), ('c', 'c'), (None, 'e'), ('d', 'd'), (None, 'f')])
+
+        ops, alignment = alex.utils.text.min_edit_alignment('a b'.split(), [])
+        self.assertEqual(ops, (2, 0, 0))
+        self.assertEqual(alignment, [('a', None), ('b', None)])
+
 if __name__ == '__main__':
     unittest.main()
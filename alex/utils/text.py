@@ -164,15 +164,21 @@ def min_edit_dist(target, source):
     return distance[n-1][m-1]
 
 
-def min_edit_ops(target, source, cost=lambda insertions, deletions, substitutions: insertions + deletions + 2.0 * substitutions):
+def min_edit_ops(target, source, cost=None):
     """ Computes the min edit operations from target to source.
 
+    The default cost of the edit operations is insertions + deletions + 2 * substitutions. It is computed
+    by a fast dynamic programming over two rows of integers, any other cost is computed by the generic algorithm.
+
     :param target: a target sequence
     :param source: a source sequence
     :param cost: an expression for computing cost of the edit operations
     :return: a tuple of (insertions, deletions, substitutions)
 
     """
+    if cost is None:
+        return _min_edit_ops(target, source)
+
     n = len(target)
     m = len(source)
     ops = [[(0, 0, 0) for i in range(m + 1)] for j in range(n + 1)]
@@ -202,6 +208,113 @@ def min_edit_ops(target, source, cost=lambda insertions, deletions, substitution
                 raise Exception("min_edit_ops unexpected state")
     return ops[n][m]
 
+
+def min_edit_alignment(target, source):
+    """ Computes the min edit operations from target to source and the alignment they induce.
+
+    The operations are the same as those returned by min_edit_ops() with the default cost.
+
+    :param target: a target sequence
+    :param source: a source sequence
+    :return: a tuple of ((insertions, deletions, substitutions), alignment), where the alignment is a list of pairs
+             (target item, source item); the target item is None for a deletion and the source item is None
+             for an insertion
+
+    """
+    ops = []
+    insertions, deletions, substitutions = _min_edit_ops(target, source, ops)
+
+    alignment = []
+    i, j = len(target), len(source)
+    while i > 0 or j > 0:
+        op = ops[i][j] if i > 0 and j > 0 else (_INSERTION if i > 0 else _DELETION)
+        if op == _DIAGONAL:
+            i -= 1
+            j -= 1
+            alignment.append((target[i], source[j]))
+        elif op == _INSERTION:
+            i -= 1
+            alignment.append((target[i], None))
+        else:
+            j -= 1
+            alignment.append((None, source[j]))
+    alignment.reverse()
+
+    return (insertions, deletions, substitutions), alignment
+
+
+_DIAGONAL, _INSERTION, _DELETION = 0, 1, 2
+
+
+def _min_edit_ops(target, source, ops=None):
+    """ Computes min_edit_ops() with the default cost.
+
+    Since every path through the table consumes the whole target and source, the cost of a path equals
+    len(target) + len(source) - 2 * matches. Therefore, it is enough to keep the cost and the number of substitutions
+    of the best path into every cell, the insertions and deletions follow from them. The ties are broken as in
+    the generic algorithm: a substitution or a match is preferred to an insertion, which is preferred to a deletion.
+
+    The common prefix and suffix of the sequences are matched without filling the table, which does not change
+    the result.
+
+    :param ops: if it is a list, the chosen operations of all the cells are appended to it row by row
+    """
+    if ops is None:
+        n = min(len(target), len(source))
+        prefix = 0
+        while prefix < n and target[prefix] == source[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < n - prefix and target[-1 - suffix] == source[-1 - suffix]:
+            suffix += 1
+        target = target[prefix:len(target) - suffix]
+        source = source[prefix:len(source) - suffix]
+
+    n = len(target)
+    m = len(source)
+
+    costs = range(m + 1)
+    subs = [0] * (m + 1)
+    if ops is not None:
+        ops.append([_DELETION] * (m + 1))
+
+    for i in xrange(1, n + 1):
+        t = target[i - 1]
+        prev_costs, prev_subs = costs, subs
+        costs = [i] * (m + 1)
+        subs = [0] * (m + 1)
+        if ops is not None:
+            row_ops = [_INSERTION] * (m + 1)
+            ops.append(row_ops)
+
+        cost, sub = i, 0
+        for j in xrange(1, m + 1):
+            if source[j - 1] == t:
+                diagonal, diagonal_sub = prev_costs[j - 1], prev_subs[j - 1]
+            else:
+                diagonal, diagonal_sub = prev_costs[j - 1] + 2, prev_subs[j - 1] + 1
+            insertion = prev_costs[j] + 1
+            # the deletion extends the previous cell of this row
+            cost += 1
+
+            if diagonal <= insertion and diagonal <= cost:
+                cost, sub = diagonal, diagonal_sub
+                op = _DIAGONAL
+            elif insertion <= cost:
+                cost, sub = insertion, prev_subs[j]
+                op = _INSERTION
+            else:
+                op = _DELETION
+
+            costs[j] = cost
+            subs[j] = sub
+            if ops is not None:
+                row_ops[j] = op
+
+    matches = (n + m - costs[m]) // 2
+    substitutions = subs[m]
+    return n - matches - substitutions, m - matches - substitutions, substitutions
+
 class Escaper(object):
     """
     Creates a customised escaper for strings.  The characters that need